@@ -0,0 +1,145 @@
+# aggregates.py
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from engine import SIMILARITY_FEATURES
+from sketches import AreaStatisticsSketch
+from taxonomy import get_taxonomy
+
+# 计算部分聚合量需要读取的专利字段
+AGGREGATE_COLUMNS = ['tech_area', 'year', 'applicant', 'tech_maturity'] + SIMILARITY_FEATURES
+
+
+def iter_patent_chunks(paths, chunk_size=100_000, columns=None):
+    """分块流式读取专利文件（Parquet/CSV/XML，可为目录），每次产出一个DataFrame"""
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    for path in map(str, paths):
+        if os.path.isdir(path):
+            files = sorted(glob.glob(os.path.join(path, '*.parquet')) + glob.glob(os.path.join(path, '*.csv'))
+                           + glob.glob(os.path.join(path, '*.xml')) + glob.glob(os.path.join(path, '*.xml.gz')))
+            yield from iter_patent_chunks(files, chunk_size, columns)
+        elif path.endswith(('.xml', '.xml.gz')):
+            # 批量专利XML用 iterparse 流式解析，不构建整棵树
+            from stream_parser import iter_record_batches
+            yield from iter_record_batches(path, columns=columns, batch_size=chunk_size)
+        elif path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            parquet_file = pq.ParquetFile(path)
+            if columns is not None:
+                columns = [c for c in columns if c in parquet_file.schema_arrow.names]
+            for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+                yield batch.to_pandas()
+        else:
+            usecols = None if columns is None else (lambda c: c in columns)
+            yield from pd.read_csv(path, chunksize=chunk_size, usecols=usecols)
+
+
+class PatentAggregates:
+    """可合并的专利部分聚合量：(领域, 年份) 的计数和求和、成熟度计数、申请人去重草图
+
+    只保存与领域数 × 年份数相关的汇总量，明细数据可以分块流过后丢弃
+    """
+
+    SUM_COLUMNS = SIMILARITY_FEATURES
+
+    def __init__(self, precision=12, k=200):
+        self.rows = 0
+        self.area_order = {}
+        self.year_stats = None
+        self.maturity_counts = None
+        self.sketches = AreaStatisticsSketch(precision, k)
+        self._area_totals = None
+
+    @classmethod
+    def from_chunks(cls, chunks, **kwargs):
+        aggregates = cls(**kwargs)
+        for chunk in chunks:
+            aggregates.update(chunk)
+        return aggregates
+
+    @staticmethod
+    def _add(left, right):
+        return right if left is None else left.add(right, fill_value=0)
+
+    def update(self, df_patents):
+        """累加一个分块的聚合量"""
+        if len(df_patents) == 0:
+            return self
+        df_patents = get_taxonomy().canonicalize_patents(df_patents)
+        for area in pd.unique(df_patents['tech_area']):
+            self.area_order.setdefault(area, len(self.area_order))
+
+        grouped = df_patents.groupby(['tech_area', 'year'], sort=False)
+        columns = [c for c in self.SUM_COLUMNS if c in df_patents]
+        sums = grouped[columns].sum().add_suffix('_sum')
+        counts = grouped[columns].count().add_suffix('_n')
+        stats = pd.concat([grouped.size().rename('count'), sums, counts], axis=1).astype(np.float64)
+        self.year_stats = self._add(self.year_stats, stats)
+
+        if 'tech_maturity' in df_patents:
+            maturity = df_patents.groupby(['tech_area', 'tech_maturity'], sort=False).size().astype(np.int64)
+            self.maturity_counts = self._add(self.maturity_counts, maturity)
+
+        self.sketches.update(df_patents)
+        self.rows += len(df_patents)
+        self._area_totals = None
+        return self
+
+    def merge(self, other):
+        """合并另一个分片的聚合量"""
+        for area in other.area_order:
+            self.area_order.setdefault(area, len(self.area_order))
+        if other.year_stats is not None:
+            self.year_stats = self._add(self.year_stats, other.year_stats)
+        if other.maturity_counts is not None:
+            self.maturity_counts = self._add(self.maturity_counts, other.maturity_counts)
+        self.sketches.merge(other.sketches)
+        self.rows += other.rows
+        self._area_totals = None
+        return self
+
+    @property
+    def tech_areas(self):
+        """按首次出现顺序排列的技术领域"""
+        return list(self.area_order)
+
+    @property
+    def area_totals(self):
+        if self._area_totals is None:
+            self._area_totals = self.year_stats.groupby(level=0).sum()
+        return self._area_totals
+
+    def yearly_counts(self, area):
+        """领域的年度专利数（按年份排序）"""
+        counts = self.year_stats.loc[area, 'count'].sort_index()
+        return counts[counts > 0].astype(np.int64)
+
+    def patent_count(self, area):
+        return int(self.area_totals.loc[area, 'count']) if area in self.area_totals.index else 0
+
+    def area_means(self, area, columns=None):
+        """领域内各字段的均值（忽略缺失值，与 DataFrame.mean 一致）"""
+        columns = self.SUM_COLUMNS if columns is None else columns
+        totals = self.area_totals.loc[area]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.Series(
+                [totals[f'{c}_sum'] / totals[f'{c}_n'] if f'{c}_n' in totals and totals[f'{c}_n'] > 0 else np.nan for c in columns],
+                index=columns
+            )
+
+    def distinct_applicants(self, area):
+        return self.sketches.distinct_applicants(area)
+
+    def dominant_maturity(self, area, default='Growth'):
+        """最常见的技术成熟度；并列时取名称最小者，与 Series.mode()[0] 一致"""
+        if self.maturity_counts is None or area not in self.maturity_counts.index.get_level_values(0):
+            return default
+        counts = self.maturity_counts.loc[area]
+        counts = counts[counts > 0]
+        if len(counts) == 0:
+            return default
+        return min(counts.index[counts == counts.max()])
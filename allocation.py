@@ -0,0 +1,229 @@
+# allocation.py
+"""投资者-技术领域资金分配：在投资者容量（由 investment_size 解析）和领域资金需求的约束下，
+最大化总匹配分数
+
+匹配分数与 PatentAnalyzer.recommend_investors 的规则一致，按投资者分块向量化计算，
+每个投资者只保留分数最高的 top_l 个领域作为候选边；分配采用按边权降序的贪心 b-matching，
+其总匹配分数不低于最优分配的 1/2。
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+# 与 recommend_investors 相同的匹配条件权重（以0.5分为单位，便于用uint8累加）
+FOCUS_POINTS = 4
+QUALITY_POINTS = 3
+STAGE_POINTS = 2
+MARKET_POINTS = 2
+MAX_POINTS = FOCUS_POINTS + QUALITY_POINTS + STAGE_POINTS + MARKET_POINTS
+MARKET_YEAR = 2024
+
+_AMOUNT_PATTERN = re.compile(r'(\d+(?:\.\d+)?)')
+
+
+def parse_investment_capacity(size):
+    """把 investment_size 文本解析为单个投资者的资金容量（百万）
+
+    区间取上限（'10-50M HKD' -> 50），'<5M' 取 5，'>20M'/'100M+' 取下限，无法解析时为 NaN
+    """
+    if isinstance(size, (int, float, np.integer, np.floating)):
+        return float(size)
+    amounts = [float(value) for value in _AMOUNT_PATTERN.findall(str(size))]
+    return max(amounts) if amounts else np.nan
+
+
+def investor_capacities(df_investors, default=None):
+    """各投资者的资金容量；不同的 investment_size 文本只解析一次，无法解析的使用 default（默认取中位数）"""
+    sizes = df_investors['investment_size']
+    parsed = {size: parse_investment_capacity(size) for size in pd.unique(sizes)}
+    capacities = sizes.map(parsed).to_numpy(dtype=np.float64)
+    if np.isnan(capacities).any():
+        fallback = default if default is not None else np.nanmedian(capacities) if (~np.isnan(capacities)).any() else 1.0
+        capacities = np.where(np.isnan(capacities), fallback, capacities)
+    return capacities
+
+
+class InvestorAllocator:
+    """投资者-领域分配求解器
+
+    领域按机会分数降序编号，候选选择和贪心分配在同分时都优先机会分数高的领域
+    """
+
+    def __init__(self, analyzer, df_investors=None, chunk_size=8192):
+        self.analyzer = analyzer
+        self.df_investors = analyzer.df_investors if df_investors is None else df_investors
+        self.chunk_size = chunk_size
+
+        opportunities = analyzer.rank_opportunities().set_index('tech_area')['opportunity_score']
+        areas = np.asarray(analyzer.tech_areas, dtype=object)
+        opportunity = opportunities.reindex(areas).fillna(0).clip(lower=0).to_numpy(dtype=np.float64)
+        order = np.argsort(-opportunity, kind='stable')
+        self.areas = areas[order]
+        self.opportunity = opportunity[order]
+        self.area_index = {area: i for i, area in enumerate(self.areas)}
+
+        profiles = analyzer._area_investor_profiles(self.areas)
+        self.has_profile = np.array([profile is not None for profile in profiles], dtype=bool)
+        self.area_quality = np.array([p[0] if p is not None else np.nan for p in profiles], dtype=np.float64)
+        self.area_maturity = [p[2].lower() if p is not None else '' for p in profiles]
+
+        # 有市场数据的领域多一个市场规模条件；与 recommend_investors 一样以2024年的规模为准
+        market = analyzer.df_market
+        self.has_market = np.isin(self.areas, market['tech_area'].unique())
+        current = market[market['year'] == MARKET_YEAR].drop_duplicates('tech_area').set_index('tech_area')['market_size']
+        self.area_market_size = current.reindex(self.areas).to_numpy(dtype=np.float64)
+
+        # 匹配等级编码：0..MAX_POINTS 为无市场条件的领域得分，再加 MAX_POINTS+1 为有市场条件的领域，
+        # 最后一个编码表示没有专利的领域；LEVEL_SCORES 把编码换算为百分制分数
+        self.level_scores = np.concatenate([
+            np.arange(MAX_POINTS + 1) / (MAX_POINTS - MARKET_POINTS) * 100,
+            np.arange(MAX_POINTS + 1) / MAX_POINTS * 100,
+            [0.0]
+        ]).astype(np.float32)
+        self._level_offset = np.where(self.has_profile, np.where(self.has_market, MAX_POINTS + 1, 0),
+                                      2 * (MAX_POINTS + 1)).astype(np.uint8)
+        self._points_mask = np.where(self.has_profile, 0xFF, 0).astype(np.uint8)
+        # 编码按分数从高到低的名次，用于稳定的基数排序
+        self._level_rank = np.argsort(np.argsort(-self.level_scores, kind='stable')).astype(np.uint8)
+        self._inputs = None
+
+    def _focus_pairs(self):
+        """(投资者行号, 领域编号) 的关注领域对"""
+        focus = self.df_investors['focus_areas'].reset_index(drop=True).explode()
+        area_ids = focus.map(self.area_index)
+        valid = area_ids.notna().to_numpy()
+        return focus.index.to_numpy()[valid], area_ids.to_numpy()[valid].astype(np.int64)
+
+    def _stage_matches(self):
+        """(投资者行号 -> 阶段编号, 阶段编号 × 领域) 的成熟度匹配表；不同的阶段文本只比较一次"""
+        stage_codes, stages = pd.factorize(self.df_investors['preferred_stage'].fillna('').str.lower())
+        maturity_codes, maturities = pd.factorize(pd.Series(self.area_maturity, dtype=object))
+        table = np.array([[bool(m) and m in stage for m in maturities] for stage in stages],
+                         dtype=bool).reshape(len(stages), len(maturities))
+        return stage_codes, table[:, maturity_codes]
+
+    def _get_inputs(self):
+        if self._inputs is None:
+            focus_rows, focus_areas = self._focus_pairs()
+            stage_codes, stage_table = self._stage_matches()
+            missing = pd.Series(np.inf, index=self.df_investors.index)
+            self._inputs = (
+                focus_rows, focus_areas, stage_codes, stage_table,
+                self.df_investors.get('min_quality_score', missing).to_numpy(dtype=np.float64),
+                self.df_investors.get('min_market_size', missing).to_numpy(dtype=np.float64)
+            )
+        return self._inputs
+
+    def match_levels(self, start=0, stop=None):
+        """投资者 [start, stop) 对所有领域的匹配等级编码（uint8），分数为 level_scores[编码]"""
+        stop = len(self.df_investors) if stop is None else stop
+        focus_rows, focus_areas, stage_codes, stage_table, min_quality, min_market = self._get_inputs()
+
+        # 以0.5分为单位用uint8累加，比浮点数组少3/4的内存带宽
+        points = (self.area_quality[None, :] >= min_quality[start:stop, None]).view(np.uint8) * np.uint8(QUALITY_POINTS)
+        points += (self.area_market_size[None, :] >= min_market[start:stop, None]).view(np.uint8) * np.uint8(MARKET_POINTS)
+        points += stage_table[stage_codes[start:stop]].view(np.uint8) * np.uint8(STAGE_POINTS)
+        in_chunk = (focus_rows >= start) & (focus_rows < stop)
+        points[focus_rows[in_chunk] - start, focus_areas[in_chunk]] += np.uint8(FOCUS_POINTS)
+        points &= self._points_mask
+        points += self._level_offset
+        return points
+
+    def match_scores(self, start=0, stop=None):
+        """投资者 [start, stop) 对所有领域的匹配分数（0-100，无专利的领域为0），形状 (投资者数, 领域数)"""
+        return self.level_scores[self.match_levels(start, stop)]
+
+    def candidate_edges(self, top_l=20, min_match=40):
+        """每个投资者分数最高的 top_l 个领域（分数不低于 min_match）：(投资者行号, 领域编号, 分数)"""
+        investors, areas, scores = [], [], []
+        top_l = min(top_l, len(self.areas))
+        for start in range(0, len(self.df_investors), self.chunk_size):
+            stop = min(start + self.chunk_size, len(self.df_investors))
+            levels = self.match_levels(start, stop)
+            # uint8 上的稳定排序为基数排序；同分时保持领域编号（机会分数）顺序
+            top = np.argsort(self._level_rank[levels], axis=1, kind='stable')[:, :top_l]
+            top_scores = self.level_scores[np.take_along_axis(levels, top, axis=1)]
+            keep = top_scores >= min_match
+            investors.append(np.nonzero(keep)[0] + start)
+            areas.append(top[keep])
+            scores.append(top_scores[keep])
+        if not investors:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return np.concatenate(investors), np.concatenate(areas).astype(np.int64), np.concatenate(scores)
+
+    def default_needs(self, total_capacity, demand_ratio=1.0):
+        """默认的领域资金需求：总容量 × demand_ratio，按机会分数比例分配到各领域"""
+        weights = self.opportunity if self.opportunity.sum() > 0 else self.has_profile.astype(np.float64)
+        return total_capacity * demand_ratio * weights / max(weights.sum(), 1e-12)
+
+    def allocate(self, needs=None, capacities=None, top_l=20, min_match=40, max_areas_per_investor=None,
+                 demand_ratio=1.0):
+        """求解分配，返回 {'allocations', 'areas', 'investors', 'total_score'}
+
+        needs: {领域: 资金需求}，默认见 default_needs；capacities: 各投资者容量，默认由 investment_size 解析
+        目标为 Σ 匹配分数 × 分配金额；每个投资者最多投 max_areas_per_investor 个领域
+        """
+        initial_capacity = (investor_capacities(self.df_investors) if capacities is None
+                            else np.asarray(capacities, dtype=np.float64))
+        if needs is None:
+            initial_need = self.default_needs(initial_capacity.sum(), demand_ratio)
+        else:
+            initial_need = pd.Series(needs, dtype=np.float64).reindex(self.areas).fillna(0).to_numpy()
+
+        edge_investors, edge_areas, edge_scores = self.candidate_edges(top_l, min_match)
+        # 分数降序；同分时按领域编号（机会分数降序）、投资者行号，保证结果确定
+        order = np.lexsort((edge_investors, edge_areas, -edge_scores))
+
+        # 逐边贪心：Python 列表上的标量运算比逐个访问numpy元素快得多
+        capacity = initial_capacity.tolist()
+        need = initial_need.tolist()
+        slots = [len(self.areas) if max_areas_per_investor is None else max_areas_per_investor] * len(capacity)
+        chosen, amounts = [], []
+        open_areas = sum(1 for value in need if value > 0)
+        for edge, i, j in zip(order.tolist(), edge_investors[order].tolist(), edge_areas[order].tolist()):
+            if capacity[i] <= 0 or need[j] <= 0 or slots[i] <= 0:
+                continue
+            amount = min(capacity[i], need[j])
+            capacity[i] -= amount
+            need[j] -= amount
+            slots[i] -= 1
+            chosen.append(edge)
+            amounts.append(amount)
+            if need[j] <= 0:
+                open_areas -= 1
+                if open_areas == 0:
+                    break
+
+        chosen = np.asarray(chosen, dtype=np.int64)
+        investors = self.df_investors.reset_index(drop=True)
+        chosen_investors, chosen_areas = edge_investors[chosen], edge_areas[chosen]
+        allocations = pd.DataFrame({
+            'investor_id': investors['investor_id'].to_numpy()[chosen_investors],
+            'investor_name': investors['name'].to_numpy()[chosen_investors] if 'name' in investors else None,
+            'tech_area': self.areas[chosen_areas],
+            'match_score': np.round(edge_scores[chosen].astype(np.float64), 1),
+            'amount': np.asarray(amounts, dtype=np.float64)
+        })
+
+        allocated = initial_need - np.asarray(need)
+        areas = pd.DataFrame({
+            'tech_area': self.areas,
+            'opportunity_score': self.opportunity,
+            'need': initial_need,
+            'allocated': allocated,
+            'fill_rate': np.divide(allocated, initial_need, out=np.zeros_like(allocated), where=initial_need > 0),
+            'investors': np.bincount(chosen_areas, minlength=len(self.areas))
+        })
+        investor_summary = pd.DataFrame({
+            'investor_id': investors['investor_id'].to_numpy(),
+            'capacity': initial_capacity,
+            'allocated': initial_capacity - np.asarray(capacity),
+            'areas': np.bincount(chosen_investors, minlength=len(investors))
+        })
+        return {
+            'allocations': allocations,
+            'areas': areas,
+            'investors': investor_summary,
+            'total_score': float((allocations['match_score'] * allocations['amount']).sum())
+        }
@@ -0,0 +1,329 @@
+# api_server.py
+"""本地JSON HTTP API：共享一个 PatentAnalyzer，按数据集版本缓存响应并支持ETag
+
+示例（投资者编号形如 VC_Firm_1_1，见 df_investors['investor_id']；领域参数接受 'AI'、'人工智能' 等别名，
+中文参数需要URL编码，可以用 curl -G --data-urlencode）:
+    python api_server.py --source generated --num-patents 15000 --port 8765
+    curl "http://127.0.0.1:8765/opportunities?top_k=5&risk_levels=Low,Medium"
+    curl "http://127.0.0.1:8765/recommendations?investor_id=VC_Firm_1_1&top_k=10"
+    curl "http://127.0.0.1:8765/investors?tech_area=AI&max_investors=8"
+    curl -G "http://127.0.0.1:8765/market-insights" --data-urlencode "tech_area=人工智能"
+    curl "http://127.0.0.1:8765/memory"
+"""
+import argparse
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from batch_scoring import add_dataset_arguments, load_dataset
+from engine import PatentAnalyzer, compute_dataset_version
+from memory_profile import MemoryMonitor
+
+
+class ApiError(Exception):
+    """请求参数错误，转换为对应的HTTP状态码"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_default(value):
+    """把numpy/pandas类型转换为JSON可序列化的值"""
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value) if np.isfinite(value) else None
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (pd.Timestamp, datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"无法序列化类型: {type(value).__name__}")
+
+
+def _replace_nan(value):
+    """把嵌套结构中的 Python float NaN/inf 换成 None（json.dumps 不会对 float 调用 default，
+    否则会写出不合法的 NaN 记号）"""
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _replace_nan(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_replace_nan(item) for item in value]
+    return value
+
+
+def _int_param(params, name, default, minimum=1, maximum=1000):
+    if name not in params:
+        return default
+    try:
+        value = int(params[name])
+    except ValueError:
+        raise ApiError(f"参数 {name} 必须是整数")
+    if not minimum <= value <= maximum:
+        raise ApiError(f"参数 {name} 必须在 {minimum}-{maximum} 之间")
+    return value
+
+
+def _required_param(params, name):
+    if not params.get(name):
+        raise ApiError(f"缺少参数 {name}")
+    return params[name]
+
+
+class ResponseCache:
+    """线程安全的LRU响应缓存，值为 (ETag, 响应体)"""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def snapshot(self):
+        """当前缓存内容的浅拷贝 {键: (ETag, 响应体)}（用于内存统计）"""
+        with self._lock:
+            return dict(self._entries)
+
+
+class OpportunityApi:
+    """API业务层：路由、参数解析、响应缓存，以及限制耗时接口并发数的工作线程池
+
+    请求由 ThreadingHTTPServer 的线程处理；工作线程池只限制同时执行的耗时计算数量，并让相同的在途请求
+    共享一次计算。pandas 计算受GIL限制，线程池不会带来多核并行。分析器的惰性缓存在构建时加锁。
+    """
+
+    # 逐个投资者/逐个领域遍历的接口放到工作线程池中执行（限制并发，合并相同请求）
+    EXPENSIVE_ENDPOINTS = {'/recommendations', '/investors'}
+    # 反映服务当前状态的接口，不做响应缓存
+    UNCACHED_ENDPOINTS = {'/health', '/memory'}
+
+    def __init__(self, analyzer, workers=4, cache_size=512):
+        self.analyzer = analyzer
+        self.cache = ResponseCache(cache_size)
+        self.memory_monitor = MemoryMonitor()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api-worker')
+        # 相同请求并发到达时只计算一次
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._investors_version_cache = (None, None)
+        self.routes = {
+            '/health': self.health,
+            '/opportunities': self.opportunities,
+            '/recommendations': self.recommendations,
+            '/investors': self.investors,
+            '/market-insights': self.market_insights,
+            '/memory': self.memory
+        }
+
+    def health(self, params):
+        return {
+            'status': 'ok',
+            'dataset_version': self.analyzer.dataset_version,
+            'patents': self.analyzer.patent_count,
+            'cache': self.cache.stats()
+        }
+
+    def opportunities(self, params):
+        """对应 calculate_opportunity_scores，支持 top_k/risk_levels/min_market_size 过滤"""
+        risk_levels = params.get('risk_levels')
+        min_market_size = params.get('min_market_size')
+        try:
+            min_market_size = float(min_market_size) if min_market_size else None
+        except ValueError:
+            raise ApiError("参数 min_market_size 必须是数字")
+        ranked = self.analyzer.rank_opportunities(
+            top_k=_int_param(params, 'top_k', None),
+            risk_levels=risk_levels.split(',') if risk_levels else None,
+            min_market_size=min_market_size
+        )
+        return {'opportunities': ranked.to_dict('records')}
+
+    def recommendations(self, params):
+        investor_id = _required_param(params, 'investor_id')
+        if investor_id not in set(self.analyzer.df_investors['investor_id']):
+            raise ApiError(f"投资者 {investor_id} 不存在", status=404)
+        top_k = _int_param(params, 'top_k', 10)
+        recs = self.analyzer.hybrid_recommendation(investor_id, top_k)
+        return {
+            'investor_id': investor_id,
+            'recommendations': [{'tech_area': area, 'hybrid_score': round(float(score), 4)} for area, score in recs]
+        }
+
+    def investors(self, params):
+        tech_area = self.analyzer.canonical_area(_required_param(params, 'tech_area'))
+        max_investors = _int_param(params, 'max_investors', 8)
+        return {'tech_area': tech_area, 'investors': self.analyzer.recommend_investors(tech_area, max_investors)}
+
+    def market_insights(self, params):
+        tech_area = self.analyzer.canonical_area(_required_param(params, 'tech_area'))
+        insights = self.analyzer.get_market_insights(tech_area)
+        if insights is None:
+            raise ApiError(f"领域 {tech_area} 没有市场数据", status=404)
+        return {'tech_area': tech_area, 'insights': insights}
+
+    def memory(self, params):
+        """数据集、分析器缓存和响应缓存的内存占用，以及进程RSS趋势"""
+        return self.memory_monitor.report(self.analyzer, extra={'response_cache': self.cache.snapshot()})
+
+    def _render(self, path, params):
+        body = json.dumps(_replace_nan(self.routes[path](params)), ensure_ascii=False, allow_nan=False,
+                          default=_json_default).encode('utf-8')
+        return '"' + hashlib.sha1(body).hexdigest() + '"', body
+
+    def _investors_version(self):
+        """投资者数据的版本号：dataset_version 只覆盖专利和市场数据，df_investors 被替换后推荐类响应也要失效"""
+        df_investors = self.analyzer.df_investors
+        key = (id(df_investors), len(df_investors))
+        cached_key, version = self._investors_version_cache
+        if cached_key != key:
+            version = compute_dataset_version(df_investors)
+            self._investors_version_cache = (key, version)
+        return version
+
+    def handle(self, path, params):
+        """返回 (ETag, 响应体)，按 (接口, 数据集版本, 投资者数据版本, 参数) 缓存"""
+        if path not in self.routes:
+            raise ApiError(f"未知接口 {path}", status=404)
+        if path in self.UNCACHED_ENDPOINTS:
+            return self._render(path, params)
+
+        key = (path, self.analyzer.dataset_version, self._investors_version(), tuple(sorted(params.items())))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        if path not in self.EXPENSIVE_ENDPOINTS:
+            result = self._render(path, params)
+        else:
+            with self._inflight_lock:
+                future = self._inflight.get(key)
+                owner = future is None
+                if owner:
+                    future = self.pool.submit(self._render, path, params)
+                    self._inflight[key] = future
+            try:
+                result = future.result()
+            finally:
+                if owner:
+                    with self._inflight_lock:
+                        self._inflight.pop(key, None)
+        self.cache.put(key, result)
+        return result
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    api = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            etag, body = self.api.handle(url.path.rstrip('/') or '/', params)
+        except ApiError as e:
+            self._send_json(e.status, {'error': str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {'error': f"{type(e).__name__}: {e}"})
+            return
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def create_server(analyzer, host='127.0.0.1', port=8765, workers=4, cache_size=512, quiet=False):
+    """创建（未启动的）HTTP服务，便于在其他脚本中嵌入"""
+    api = OpportunityApi(analyzer, workers=workers, cache_size=cache_size)
+    handler = type('BoundApiRequestHandler', (ApiRequestHandler,), {'api': api})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.api = api
+    server.quiet = quiet
+    return server
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="IP机会发现平台 - 本地JSON API服务")
+    add_dataset_arguments(parser)
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址")
+    parser.add_argument('--port', type=int, default=8765, help="监听端口")
+    parser.add_argument('--workers', type=int, default=4, help="耗时接口的最大并发计算数（线程，受GIL限制不会多核并行）")
+    parser.add_argument('--cache-size', type=int, default=512, help="响应缓存条目上限")
+    parser.add_argument('--quiet', action='store_true', help="不输出访问日志")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    df_patents, df_market, df_investors = load_dataset(args)
+    analyzer = PatentAnalyzer(df_patents, df_market, df_investors)
+    server = create_server(analyzer, args.host, args.port, args.workers, args.cache_size, args.quiet)
+    print(f"✓ API服务已启动: http://{args.host}:{args.port} (数据集版本 {analyzer.dataset_version})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.api.shutdown()
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+# applicant_graph.py
+"""申请人共现图：申请人在同一 (技术领域, 细分方向, 时间窗口) 分桶中申请专利即视为共现
+
+图以稀疏的 申请人 × 分桶 关联矩阵保存（不展开成申请人 × 申请人 的团），
+PageRank、连通分量和集中度都直接在关联矩阵上用稀疏矩阵运算计算，可以增量追加新专利
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse import csgraph
+
+GRAPH_COLUMNS = ['applicant', 'tech_area', 'subcategory', 'year', 'collaboration_level', 'research_institution']
+
+# 合作申请的专利在共现图中的权重更高
+COLLABORATION_WEIGHTS = {
+    'Single Entity': 1.0,
+    'University-Industry': 2.0,
+    'Cross-border': 2.0,
+    'Multi-organization': 2.5
+}
+
+
+class ApplicantGraph:
+    """可增量更新的申请人共现图"""
+
+    def __init__(self, window_years=3, by_subcategory=True):
+        self.window_years = window_years
+        self.by_subcategory = by_subcategory
+        self.applicants = {}
+        self.buckets = {}
+        self.bucket_areas = []
+        self.rows = 0
+        # 未合并的 (申请人编号, 分桶编号, 专利数, 共现权重, 研究机构专利数) 批次
+        self._pending = []
+        self._counts = None
+        self._weights = None
+        self._research = None
+        self._cache = {}
+
+    def _bucket_keys(self, df):
+        """每行的分桶键 (领域, 细分方向, 窗口起始年)：返回 (行的局部编号, 各局部编号对应的键)
+
+        各列分别编码后合成一个整数再编码，只为去重后的组合构造元组
+        """
+        columns = [df['tech_area'].to_numpy()]
+        if self.by_subcategory and 'subcategory' in df:
+            columns.append(df['subcategory'].to_numpy())
+        if self.window_years and 'year' in df:
+            columns.append(df['year'].to_numpy(dtype=np.int64) // self.window_years * self.window_years)
+        combined = np.zeros(len(df), dtype=np.int64)
+        levels = []
+        for values in columns:
+            codes, uniques = pd.factorize(values)
+            combined = combined * len(uniques) + codes
+            levels.append(uniques)
+        local, combos = pd.factorize(combined)
+        parts = []
+        for uniques in reversed(levels):
+            parts.append(uniques[combos % len(uniques)])
+            combos = combos // len(uniques)
+        return local, list(zip(*reversed(parts)))
+
+    @staticmethod
+    def _encode(codes, uniques, mapping):
+        """把局部编号换成全局编号（与历次追加的编码一致），新出现的取值追加到 mapping 末尾"""
+        lookup = np.fromiter((mapping.setdefault(value, len(mapping)) for value in uniques),
+                             dtype=np.int64, count=len(uniques))
+        return lookup[codes]
+
+    def update(self, df_batch):
+        """追加一批专利，返回 self"""
+        df = df_batch.dropna(subset=['applicant', 'tech_area'])
+        if len(df) == 0:
+            return self
+        applicant_codes, applicant_values = pd.factorize(df['applicant'].to_numpy())
+        bucket_codes, bucket_values = self._bucket_keys(df)
+
+        weights = np.ones(len(df))
+        if 'collaboration_level' in df:
+            weights = df['collaboration_level'].map(COLLABORATION_WEIGHTS).fillna(1.0).to_numpy(dtype=np.float64)
+        research = np.zeros(len(df))
+        if 'research_institution' in df:
+            research = df['research_institution'].fillna(False).to_numpy(dtype=np.float64)
+
+        # 先在批次内合并相同的 (申请人, 分桶)，待合并的数据量与边数而不是专利数成正比
+        pairs, pair_codes = np.unique(applicant_codes.astype(np.int64) * len(bucket_values) + bucket_codes,
+                                      return_inverse=True)
+        sums = [np.bincount(pair_codes, weights=values, minlength=len(pairs))
+                for values in (np.ones(len(df)), weights, research)]
+        applicant_ids = self._encode(pairs // len(bucket_values), applicant_values, self.applicants)
+        known = len(self.buckets)
+        bucket_ids = self._encode(pairs % len(bucket_values), bucket_values, self.buckets)
+        self.bucket_areas.extend(key[0] for key in list(self.buckets)[known:])
+        self._pending.append((applicant_ids, bucket_ids, *sums))
+        self.rows += len(df)
+        self._cache = {}
+        return self
+
+    @classmethod
+    def from_chunks(cls, chunks, **kwargs):
+        graph = cls(**kwargs)
+        for chunk in chunks:
+            graph.update(chunk)
+        return graph
+
+    def _matrices(self):
+        """合并待处理批次，返回 (专利数, 共现权重, 研究机构专利数) 三个 申请人 × 分桶 CSR 矩阵"""
+        if self._pending:
+            shape = (len(self.applicants), len(self.buckets))
+            parts = list(zip(*self._pending))
+            rows, cols = np.concatenate(parts[0]), np.concatenate(parts[1])
+            matrices = []
+            for i, existing in enumerate((self._counts, self._weights, self._research)):
+                matrix = sparse.csr_matrix((np.concatenate(parts[2 + i]), (rows, cols)), shape=shape)
+                if existing is not None:
+                    existing = existing.copy()
+                    existing.resize(shape)
+                    matrix = matrix + existing
+                matrices.append(matrix)
+            self._counts, self._weights, self._research = matrices
+            self._pending = []
+        return self._counts, self._weights, self._research
+
+    def _area_columns(self, tech_area=None):
+        """某领域（None 为全部）包含的分桶编号"""
+        if tech_area is None:
+            return None
+        if 'bucket_areas' not in self._cache:
+            areas = pd.Series(self.bucket_areas, dtype=object)
+            self._cache['bucket_areas'] = areas.groupby(areas, sort=False).indices
+        return self._cache['bucket_areas'].get(tech_area, np.zeros(0, dtype=np.int64))
+
+    def _subgraph(self, tech_area=None):
+        """领域子图的 (申请人编号, 专利数矩阵, 共现权重矩阵)，只保留该领域有专利的申请人"""
+        counts, weights, _ = self._matrices()
+        columns = self._area_columns(tech_area)
+        if columns is not None:
+            # 按列切片在CSC格式上进行
+            if 'csc' not in self._cache:
+                self._cache['csc'] = (counts.tocsc(), weights.tocsc())
+            counts, weights = (matrix[:, columns].tocsr() for matrix in self._cache['csc'])
+        members = np.flatnonzero(np.diff(counts.indptr) > 0)
+        return members, counts[members], weights[members]
+
+    def applicant_names(self):
+        if 'names' not in self._cache:
+            self._cache['names'] = np.array(list(self.applicants), dtype=object)
+        return self._cache['names']
+
+    def pagerank(self, tech_area=None, damping=0.85, tol=1e-10, max_iter=100):
+        """共现图上的PageRank（pd.Series，按申请人，总和为1）
+
+        转移概率为 申请人 -> 分桶 -> 申请人 的两步随机游走（按共现权重），
+        每次迭代只做两次稀疏矩阵-向量乘法，不需要构造申请人 × 申请人 矩阵
+        """
+        key = ('pagerank', tech_area, damping)
+        if key not in self._cache:
+            members, _, weights = self._subgraph(tech_area)
+            n = len(members)
+            if n == 0:
+                return pd.Series(dtype=np.float64)
+            row_sums = np.asarray(weights.sum(axis=1)).ravel()
+            col_sums = np.asarray(weights.sum(axis=0)).ravel()
+            col_inv = np.divide(1.0, col_sums, out=np.zeros_like(col_sums), where=col_sums > 0)
+            weights_t = weights.T.tocsr()
+            rank = np.full(n, 1.0 / n)
+            for _ in range(max_iter):
+                bucket_mass = weights_t @ (rank / row_sums)
+                updated = damping * (weights @ (bucket_mass * col_inv)) + (1 - damping) / n
+                updated /= updated.sum()
+                converged = np.abs(updated - rank).sum() < tol
+                rank = updated
+                if converged:
+                    break
+            self._cache[key] = pd.Series(rank, index=self.applicant_names()[members], name='pagerank')
+        return self._cache[key]
+
+    def connected_components(self, tech_area=None):
+        """连通分量：返回 (分量数, 各申请人的分量编号 pd.Series)
+
+        在 申请人+分桶 的二部图上计算，与申请人共现图的连通性相同
+        """
+        key = ('components', tech_area)
+        if key not in self._cache:
+            members, counts, _ = self._subgraph(tech_area)
+            n_applicants = counts.shape[0]
+            if n_applicants == 0:
+                return 0, pd.Series(dtype=np.int64, name='component')
+            bipartite = sparse.bmat([[None, counts], [counts.T, None]], format='csr')
+            _, labels = csgraph.connected_components(bipartite, directed=False)
+            # 只含分桶、没有申请人的分量不计入，分量重新编号为 0..k-1
+            _, applicant_labels = np.unique(labels[:n_applicants], return_inverse=True)
+            self._cache[key] = (int(applicant_labels.max() + 1),
+                                pd.Series(applicant_labels, index=self.applicant_names()[members], name='component'))
+        return self._cache[key]
+
+    def concentration(self):
+        """各领域的申请人结构指标（DataFrame，以领域为索引）
+
+        HHI 和 CR3 按专利数份额计算；effective_applicants = 1 / HHI；
+        pagerank_top_share 为领域子图中中心性最高的申请人所占PageRank份额
+        """
+        if 'concentration' not in self._cache:
+            counts, _, research = self._matrices()
+            areas, bucket_area_codes = np.unique(np.asarray(self.bucket_areas, dtype=object), return_inverse=True)
+            to_area = sparse.csr_matrix((np.ones(len(bucket_area_codes)), (np.arange(len(bucket_area_codes)), bucket_area_codes)),
+                                        shape=(len(bucket_area_codes), len(areas)))
+            area_counts = (counts @ to_area).tocsc()
+            totals = np.asarray(area_counts.sum(axis=0)).ravel()
+            research_totals = np.asarray((research @ to_area).sum(axis=0)).ravel()
+            hhi = np.asarray(area_counts.multiply(area_counts).sum(axis=0)).ravel() / np.maximum(totals, 1) ** 2
+
+            records = []
+            names = self.applicant_names()
+            for j, area in enumerate(areas):
+                column = area_counts.data[area_counts.indptr[j]:area_counts.indptr[j + 1]]
+                applicants = area_counts.indices[area_counts.indptr[j]:area_counts.indptr[j + 1]]
+                top = np.argsort(-column, kind='stable')[:3]
+                n_components, labels = self.connected_components(area)
+                ranks = self.pagerank(area)
+                records.append({
+                    'tech_area': area,
+                    'applicants': len(column),
+                    'patents': int(totals[j]),
+                    'hhi': float(hhi[j]),
+                    'effective_applicants': float(1 / hhi[j]) if hhi[j] > 0 else 0.0,
+                    'cr3': float(column[top].sum() / totals[j]) if totals[j] > 0 else 0.0,
+                    'top_applicant': names[applicants[top[0]]] if len(top) else None,
+                    'pagerank_top_share': float(ranks.max()) if len(ranks) else 0.0,
+                    'components': n_components,
+                    'largest_component_share': float(labels.value_counts().iloc[0] / len(labels)) if len(labels) else 0.0,
+                    'research_share': float(research_totals[j] / totals[j]) if totals[j] > 0 else 0.0
+                })
+            self._cache['concentration'] = pd.DataFrame(records).set_index('tech_area')
+        return self._cache['concentration']
+
+    def area_hhi(self, tech_area):
+        """某领域申请人专利份额的HHI（0-1，越大越集中），没有数据时为 None"""
+        table = self.concentration()
+        return float(table.at[tech_area, 'hhi']) if tech_area in table.index else None
@@ -0,0 +1,240 @@
+# batch_scoring.py
+"""无界面批量评分：加载数据集，计算机会分数、批量推荐和投资者匹配，结果写入Parquet/JSON
+
+示例:
+    python batch_scoring.py --source generated --num-patents 15000 --output results/
+    python batch_scoring.py --source file --patents patents.parquet --market market.csv --investors investors.json --output results/
+    python batch_scoring.py --source snapshot --snapshot snapshots/2024-06-01 --format json --output results/
+    python batch_scoring.py --source file --patents corpus/ --market market.csv --investors investors.json --out-of-core
+"""
+import argparse
+import ast
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from engine import PatentAnalyzer
+
+
+def _read_table(path):
+    """按扩展名读取CSV/Parquet/JSON"""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    if path.endswith('.json'):
+        return pd.read_json(path)
+    return pd.read_csv(path)
+
+
+def _parse_list_column(df, column):
+    """CSV中的列表列会被读成字符串，这里还原为列表"""
+    if column in df and len(df) > 0 and isinstance(df[column].iloc[0], str):
+        df[column] = df[column].apply(ast.literal_eval)
+    elif column in df:
+        df[column] = df[column].apply(list)
+    return df
+
+
+def _parse_date_column(df, column):
+    """CSV/JSON中的日期列会被读成字符串，这里转换为 datetime64"""
+    if column in df and not pd.api.types.is_datetime64_any_dtype(df[column]):
+        df[column] = pd.to_datetime(df[column], format='ISO8601', errors='coerce')
+    return df
+
+
+def load_dataset(args):
+    """根据数据源参数加载 (专利, 市场, 投资者) 数据"""
+    if args.source == 'snapshot' and not args.snapshot:
+        raise SystemExit("--source snapshot 需要指定 --snapshot")
+    if args.source == 'generated':
+        from data_generation import generate_patent_data
+        return generate_patent_data(args.num_patents)
+
+    if args.source == 'snapshot':
+        paths = [os.path.join(args.snapshot, f'{name}.parquet') for name in ('patents', 'market', 'investors')]
+    else:
+        if not (args.patents and args.market and args.investors):
+            raise SystemExit("--source file 需要同时指定 --patents、--market 和 --investors")
+        paths = [args.patents, args.market, args.investors]
+
+    df_patents, df_market, df_investors = (_read_table(path) for path in paths)
+    _parse_date_column(df_patents, 'filing_date')
+    for column in ('focus_areas', 'geographic_focus'):
+        _parse_list_column(df_investors, column)
+    return df_patents, df_market, df_investors
+
+
+def load_dataset_out_of_core(args):
+    """分块模式：只加载市场和投资者数据，返回 (专利文件路径, 市场, 投资者)"""
+    if args.source == 'generated':
+        raise SystemExit("--out-of-core 只支持 --source file 或 --source snapshot")
+    if args.source == 'snapshot':
+        if not args.snapshot:
+            raise SystemExit("--source snapshot 需要指定 --snapshot")
+        patent_path = os.path.join(args.snapshot, 'patents.parquet')
+        market_path = os.path.join(args.snapshot, 'market.parquet')
+        investors_path = os.path.join(args.snapshot, 'investors.parquet')
+    else:
+        if not (args.patents and args.market and args.investors):
+            raise SystemExit("--source file 需要同时指定 --patents、--market 和 --investors")
+        patent_path, market_path, investors_path = args.patents, args.market, args.investors
+
+    df_market, df_investors = _read_table(market_path), _read_table(investors_path)
+    for column in ('focus_areas', 'geographic_focus'):
+        _parse_list_column(df_investors, column)
+    return patent_path, df_market, df_investors
+
+
+def save_snapshot(directory, df_patents, df_market, df_investors):
+    """保存数据集快照，供后续 --source snapshot 使用"""
+    os.makedirs(directory, exist_ok=True)
+    for name, df in (('patents', df_patents), ('market', df_market), ('investors', df_investors)):
+        df.to_parquet(os.path.join(directory, f'{name}.parquet'), index=False)
+    print(f"✓ 数据集快照已保存到 {directory}")
+
+
+def write_result(df, output_dir, name, fmt):
+    path = os.path.join(output_dir, f'{name}.{fmt}')
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_json(path, orient='records', force_ascii=False, indent=2)
+    return path
+
+
+def run(args):
+    """执行完整的批量评分流程，返回运行统计"""
+    timings = {}
+
+    def timed(stage, func):
+        start = time.perf_counter()
+        result = func()
+        timings[stage] = round(time.perf_counter() - start, 4)
+        print(f"  - {stage}: {timings[stage]:.3f}s")
+        return result
+
+    print("=" * 60)
+    print("IP机会发现平台 - 批量评分")
+    print("=" * 60)
+
+    if args.out_of_core:
+        from out_of_core import OutOfCorePatentAnalyzer
+
+        patent_path, df_market, df_investors = timed('load_data', lambda: load_dataset_out_of_core(args))
+        analyzer = timed('init_analyzer', lambda: OutOfCorePatentAnalyzer(
+            patent_path, df_market, df_investors, chunk_size=args.chunk_size
+        ))
+    else:
+        df_patents, df_market, df_investors = timed('load_data', lambda: load_dataset(args))
+        if args.save_snapshot:
+            save_snapshot(args.save_snapshot, df_patents, df_market, df_investors)
+        if args.workers > 1:
+            from parallel import ParallelPatentAnalyzer
+
+            analyzer = timed('init_analyzer', lambda: ParallelPatentAnalyzer(
+                df_patents, df_market, df_investors, workers=args.workers, partition=args.partition,
+                min_rows_per_shard=args.min_rows_per_shard
+            ))
+        else:
+            analyzer = timed('init_analyzer', lambda: PatentAnalyzer(df_patents, df_market, df_investors))
+    opportunities = timed('opportunity_scores', lambda: analyzer.rank_opportunities())
+
+    def investor_recommendations():
+        rows = []
+        for investor_id in df_investors['investor_id']:
+            for rank, (area, score) in enumerate(analyzer.hybrid_recommendation(investor_id, args.top_k), 1):
+                rows.append({'investor_id': investor_id, 'rank': rank, 'tech_area': area, 'hybrid_score': round(float(score), 4)})
+        return pd.DataFrame(rows, columns=['investor_id', 'rank', 'tech_area', 'hybrid_score'])
+
+    def area_investors():
+        if hasattr(analyzer, 'recommend_investors_batch'):
+            by_area = analyzer.recommend_investors_batch(opportunities['tech_area'], args.max_investors)
+        else:
+            by_area = {area: analyzer.recommend_investors(area, args.max_investors) for area in opportunities['tech_area']}
+        rows = []
+        for area in opportunities['tech_area']:
+            for rank, investor in enumerate(by_area[area], 1):
+                rows.append({'tech_area': area, 'rank': rank, **investor})
+        return pd.DataFrame(rows)
+
+    recommendations = timed('investor_recommendations', investor_recommendations)
+    matches = timed('investor_matching', area_investors)
+
+    if args.history:
+        from score_history import ScoreHistoryStore
+
+        run_id = timed('append_history', lambda: ScoreHistoryStore(args.history).append_analyzer(analyzer))
+        print(f"✓ 评分已追加到历史 {args.history} (运行 {run_id})")
+
+    os.makedirs(args.output, exist_ok=True)
+    outputs = {}
+    for name, df in (('opportunities', opportunities), ('investor_recommendations', recommendations), ('area_investors', matches)):
+        outputs[name] = timed(f'write_{name}', lambda: write_result(df, args.output, name, args.format))
+
+    stats = {
+        'run_at': datetime.now().isoformat(timespec='seconds'),
+        'dataset_version': analyzer.dataset_version,
+        'source': args.source,
+        'out_of_core': args.out_of_core,
+        'shards': getattr(analyzer, 'shards', 1),
+        'rows': {
+            'patents': analyzer.patent_count,
+            'market': len(df_market),
+            'investors': len(df_investors),
+            'opportunities': len(opportunities),
+            'investor_recommendations': len(recommendations),
+            'area_investors': len(matches)
+        },
+        'timings_seconds': timings,
+        'total_seconds': round(sum(timings.values()), 4),
+        'outputs': outputs
+    }
+    with open(os.path.join(args.output, 'run_stats.json'), 'w', encoding='utf-8') as f:
+        json.dump(stats, f, ensure_ascii=False, indent=2)
+
+    print(f"\n✓ 批量评分完成，共耗时 {stats['total_seconds']:.2f}s，结果保存在 {args.output}")
+    return stats
+
+
+def add_dataset_arguments(parser):
+    """数据集相关的命令行参数（批量评分和API服务共用）"""
+    parser.add_argument('--source', choices=['generated', 'snapshot', 'file'], default='generated', help="数据来源")
+    parser.add_argument('--num-patents', type=int, default=15000, help="生成数据时的专利数量")
+    parser.add_argument('--snapshot', help="快照目录（包含 patents/market/investors.parquet）")
+    parser.add_argument('--patents', help="专利数据文件 (CSV/Parquet/JSON)")
+    parser.add_argument('--market', help="市场数据文件 (CSV/Parquet/JSON)")
+    parser.add_argument('--investors', help="投资者数据文件 (CSV/Parquet/JSON)")
+    return parser
+
+
+def build_parser():
+    from parallel import DEFAULT_MIN_ROWS_PER_SHARD
+
+    parser = argparse.ArgumentParser(description="IP机会发现平台 - 无界面批量评分")
+    add_dataset_arguments(parser)
+    parser.add_argument('--save-snapshot', help="把加载的数据集另存为快照目录")
+    parser.add_argument('--output', default='batch_output', help="输出目录")
+    parser.add_argument('--format', choices=['parquet', 'json'], default='parquet', help="输出格式")
+    parser.add_argument('--out-of-core', action='store_true', help="分块流式读取专利文件，不在内存中保存专利明细")
+    parser.add_argument('--chunk-size', type=int, default=100_000, help="分块模式下每块的专利行数")
+    parser.add_argument('--workers', type=int, default=1, help="并行聚合的进程数（大于1时启用多进程分片）")
+    parser.add_argument('--partition', choices=['tech_area', 'hash'], default='tech_area', help="多进程分片方式")
+    parser.add_argument('--min-rows-per-shard', type=int, default=DEFAULT_MIN_ROWS_PER_SHARD,
+                        help="每个分片至少的专利行数（数据量不足 2 个分片时单进程聚合）")
+    parser.add_argument('--history', help="把本次评分追加到评分历史目录")
+    parser.add_argument('--top-k', type=int, default=10, help="每个投资者的推荐领域数")
+    parser.add_argument('--max-investors', type=int, default=8, help="每个领域匹配的投资者数")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+# benchmarks/bench_stream_parser.py
+"""流式解析基准：在本地生成的批量专利XML和HTML列表页上，对比 stream_parser 的 iterparse 流式解析、
+lxml 整树解析和 BeautifulSoup 解析的耗时与峰值内存
+
+    python benchmarks/bench_stream_parser.py --records 200000
+    python benchmarks/bench_stream_parser.py --records 1000000 --bs4-max-records 50000 --output bench.json
+
+每个解析器在独立子进程中运行，峰值内存为子进程的峰值RSS减去解析前的RSS（含 libxml2 的C堆）。
+夹具文件生成在 --fixtures 目录（默认 benchmarks/fixtures），已存在时直接复用。
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stream_parser import iter_record_batches, write_patent_xml  # noqa: E402
+
+TECH_AREAS = ['AI', 'Blockchain', 'Biotech', 'Energy', 'IoT', 'Fintech', 'Healthtech', 'Edtech']
+APPLICANTS = ['华为技术有限公司', '腾讯科技', '百度在线', '阿里巴巴集团', '中国科学院', '清华大学', '北京大学']
+
+
+def fixture_frame(n, seed=0):
+    """n 条模拟专利（向量化生成）"""
+    rng = np.random.default_rng(seed)
+    areas = np.asarray(TECH_AREAS, dtype=object)[rng.integers(0, len(TECH_AREAS), n)]
+    dates = pd.Timestamp('2010-01-01') + pd.to_timedelta(rng.integers(0, 15 * 365, n), unit='D')
+    return pd.DataFrame({
+        'patent_id': [f'CN{i:09d}' for i in range(n)],
+        'title': [f'{area}技术专利_{i}' for i, area in enumerate(areas)],
+        'abstract': [f'本发明涉及{area}领域，提供了一种创新的技术解决方案' for area in areas],
+        'applicant': np.asarray(APPLICANTS, dtype=object)[rng.integers(0, len(APPLICANTS), n)],
+        'tech_area': areas,
+        'filing_date': dates,
+        'year': dates.year,
+        'citations': rng.integers(0, 100, n),
+        'quality_score': rng.uniform(20, 100, n).round(1),
+        'market_potential': rng.uniform(20, 100, n).round(1)
+    })
+
+
+def write_html_listing(df, path):
+    """HTML列表页：每条专利为一行 <tr class="patent">，字段为带 class 的单元格"""
+    columns = list(df.columns)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<html><head><meta charset="utf-8"><title>专利列表</title></head><body><table>\n')
+        for row in df.itertuples(index=False, name=None):
+            cells = ''.join(
+                f'<td class="{column.replace("_", "-")}">'
+                f'{value.strftime("%Y-%m-%d") if isinstance(value, pd.Timestamp) else value}</td>'
+                for column, value in zip(columns, row)
+            )
+            f.write(f'<tr class="patent">{cells}</tr>\n')
+        f.write('</table></body></html>\n')
+
+
+def ensure_fixtures(directory, n):
+    os.makedirs(directory, exist_ok=True)
+    xml_path = os.path.join(directory, f'patents_{n}.xml')
+    html_path = os.path.join(directory, f'listing_{n}.html')
+    if not (os.path.exists(xml_path) and os.path.exists(html_path)):
+        print(f"生成 {n} 条专利的夹具文件...")
+        df = fixture_frame(n)
+        write_patent_xml(df, xml_path)
+        write_html_listing(df, html_path)
+    return xml_path, html_path
+
+
+def _max_rss_mb():
+    # Linux 上 ru_maxrss 以KB为单位，macOS 上以字节为单位
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+
+
+def parse_stream_xml(path):
+    return sum(len(batch) for batch in iter_record_batches(path, record_tag='patent'))
+
+
+def parse_stream_html(path):
+    return sum(len(batch) for batch in iter_record_batches(path, record_tag='tr', html=True, record_class='patent'))
+
+
+def parse_lxml_tree(path):
+    from lxml import etree
+
+    tree = etree.parse(path)
+    records = [{child.tag: child.text for child in element} for element in tree.iter('patent')]
+    return len(pd.DataFrame(records))
+
+
+def parse_bs4_xml(path):
+    from bs4 import BeautifulSoup
+
+    with open(path, 'rb') as f:
+        soup = BeautifulSoup(f, 'lxml-xml')
+    records = [{child.name: child.get_text() for child in element.find_all(recursive=False)}
+               for element in soup.find_all('patent')]
+    return len(pd.DataFrame(records))
+
+
+def parse_bs4_html(path):
+    from bs4 import BeautifulSoup
+
+    with open(path, 'rb') as f:
+        soup = BeautifulSoup(f, 'lxml')
+    records = [{cell['class'][0]: cell.get_text() for cell in row.find_all('td')}
+               for row in soup.find_all('tr', class_='patent')]
+    return len(pd.DataFrame(records))
+
+
+PARSERS = {
+    'stream_xml': (parse_stream_xml, 'xml'),
+    'lxml_tree_xml': (parse_lxml_tree, 'xml'),
+    'bs4_xml': (parse_bs4_xml, 'xml'),
+    'stream_html': (parse_stream_html, 'html'),
+    'bs4_html': (parse_bs4_html, 'html')
+}
+
+
+def _run(name, path, queue):
+    parser = PARSERS[name][0]
+    baseline = _max_rss_mb()
+    started = time.perf_counter()
+    rows = parser(path)
+    queue.put({'rows': rows, 'seconds': time.perf_counter() - started, 'peak_mb': _max_rss_mb() - baseline})
+
+
+def run_parser(name, path):
+    """在子进程中运行一个解析器，返回 {'rows', 'seconds', 'peak_mb'}"""
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run, args=(name, path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='流式解析基准')
+    parser.add_argument('--records', type=int, default=200_000, help='夹具文件的专利条数')
+    parser.add_argument('--fixtures', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures'))
+    parser.add_argument('--parsers', default=','.join(PARSERS), help='逗号分隔的解析器名')
+    parser.add_argument('--bs4-max-records', type=int, default=100_000,
+                        help='超过该条数时跳过 BeautifulSoup（整树解析太慢、内存太大）')
+    parser.add_argument('--output', default=None, help='结果JSON文件')
+    args = parser.parse_args()
+
+    xml_path, html_path = ensure_fixtures(args.fixtures, args.records)
+    sizes = {'xml': os.path.getsize(xml_path), 'html': os.path.getsize(html_path)}
+    results = []
+    for name in args.parsers.split(','):
+        kind = PARSERS[name][1]
+        if name.startswith('bs4') and args.records > args.bs4_max_records:
+            print(f"{name:<14} 跳过（{args.records} 条 > --bs4-max-records）")
+            continue
+        result = run_parser(name, xml_path if kind == 'xml' else html_path)
+        result.update(parser=name, file_mb=sizes[kind] / 2 ** 20,
+                      records_per_second=result['rows'] / result['seconds'])
+        results.append(result)
+        print(f"{name:<14} {result['rows']:>9} 条  {result['seconds']:8.2f} s  "
+              f"{result['records_per_second']:>10.0f} 条/s  峰值内存 {result['peak_mb']:8.1f} MB  "
+              f"(文件 {result['file_mb']:.1f} MB)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'records': args.records, 'results': results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+# chart_data.py
+"""图表数据层：按时间粒度预聚合专利申请序列，用LTTB降采样到像素预算，
+并按数据集版本缓存序列化后的Plotly图表（JSON），避免每次重绘都生成巨大的图表数据"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from filing_dates import parse_filing_dates
+
+# 时间粒度 -> pandas 周期频率
+GRANULARITIES = {'year': 'Y', 'quarter': 'Q', 'month': 'M', 'week': 'W', 'day': 'D'}
+GRANULARITY_LABELS = {'year': '年', 'quarter': '季度', 'month': '月', 'week': '周', 'day': '日'}
+# 每个粒度一年包含的周期数，用于计算同比
+PERIODS_PER_YEAR = {'year': 1, 'quarter': 4, 'month': 12, 'week': 52, 'day': 365}
+# 默认每条曲线的点数上限（约等于图表宽度的像素数）
+DEFAULT_MAX_POINTS = 800
+
+
+def lttb(x, y, max_points):
+    """Largest-Triangle-Three-Buckets 降采样，返回保留点的下标（保留首尾点，保持曲线形状）
+
+    x 需为单调递增的数值数组（时间请先转换为整数时间戳）
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    # 除首尾点外，其余点均分到 max_points-2 个桶中，每个桶选一个点
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        # 下一个桶的均值点（最后一个桶使用末尾点）
+        if bucket + 2 < len(edges):
+            next_start, next_stop = edges[bucket + 1], edges[bucket + 2]
+            next_x, next_y = x[next_start:next_stop].mean(), y[next_start:next_stop].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        # 与上一个已选点、下一个桶均值点组成的三角形面积最大的点
+        px, py = x[previous], y[previous]
+        areas = np.abs((px - next_x) * (y[start:stop] - py) - (px - x[start:stop]) * (next_y - py))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample_series(index, values, max_points=DEFAULT_MAX_POINTS):
+    """对一条时间序列做LTTB降采样，index 可以是日期或数值"""
+    index = pd.Index(index)
+    if isinstance(index, pd.DatetimeIndex):
+        x = index.asi8
+    else:
+        x = np.arange(len(index)) if index.dtype == object else index.to_numpy(dtype=np.float64)
+    keep = lttb(x, np.nan_to_num(np.asarray(values, dtype=np.float64)), max_points)
+    return index[keep], np.asarray(values)[keep]
+
+
+def filing_growth(counts, granularity='month', window=None):
+    """由连续的 (周期 × 领域) 申请量计算各领域的增长指标
+
+    返回以领域为索引的DataFrame：最近一期申请量、环比、同比，
+    以及最近 window 期（默认一年）相对前 window 期的增长率和增长加速度
+    """
+    lag = PERIODS_PER_YEAR[granularity]
+    window = window or lag
+
+    def growth(current, previous):
+        return current / previous.where(previous > 0) - 1
+
+    def period(offset):
+        return counts.iloc[-1 - offset] if len(counts) > offset else pd.Series(np.nan, index=counts.columns)
+
+    def window_sum(offset):
+        stop = len(counts) - offset * window
+        if stop - window < 0:
+            return pd.Series(np.nan, index=counts.columns)
+        return counts.iloc[stop - window:stop].sum()
+
+    recent, prior, earlier = window_sum(0), window_sum(1), window_sum(2)
+    result = pd.DataFrame({
+        'latest_period': counts.index[-1] if len(counts) else pd.NaT,
+        'latest_count': period(0),
+        'period_growth': growth(period(0), period(1)),
+        'yoy_growth': growth(period(0), period(lag)),
+        'window_count': recent,
+        'window_growth': growth(recent, prior),
+        'window_acceleration': growth(recent, prior) - growth(prior, earlier)
+    })
+    result.index.name = 'tech_area'
+    return result
+
+
+class ChartDataLayer:
+    """一个数据集版本的图表数据：各粒度的申请量序列和序列化后的图表缓存"""
+
+    FIGURE_CACHE_SIZE = 64
+
+    def __init__(self, df_patents, df_market, dataset_version=None):
+        self.df_patents = df_patents
+        self.df_market = df_market
+        self.dataset_version = dataset_version
+        self._filing_dates = None
+        self._counts = {}
+        # 图表缓存随分析器在会话间共享，查找和插入在锁内进行
+        self._lock = threading.Lock()
+        self._figures = OrderedDict()
+
+    def __getstate__(self):
+        # 锁不能序列化（图表数据可能随分析器传给进程池）
+        state = self.__dict__.copy()
+        state.pop('_lock', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def filing_dates(self):
+        if self._filing_dates is None:
+            # 没有申请日期的专利（例如实时抓取的数据）退化为申请年份的1月1日
+            year_starts = pd.Series((self.df_patents['year'].to_numpy(dtype=np.int64) - 1970).astype('datetime64[Y]'),
+                                    index=self.df_patents.index).astype('datetime64[ns]')
+            if 'filing_date' in self.df_patents:
+                self._filing_dates = parse_filing_dates(self.df_patents['filing_date']).fillna(year_starts)
+            else:
+                self._filing_dates = year_starts
+        return self._filing_dates
+
+    def filing_counts(self, granularity='year'):
+        """各领域按粒度汇总的申请量：行为周期起始日期（连续、无缺口），列为技术领域"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"未知的时间粒度: {granularity}")
+        if granularity not in self._counts:
+            freq = GRANULARITIES[granularity]
+            dates = self.filing_dates()
+            valid = dates.notna().to_numpy()
+            # 周期序号和领域编码合成一个整数，用 bincount 计数（比 crosstab 快一个数量级）
+            ordinals = dates[valid].dt.to_period(freq).array.asi8
+            area_codes, areas = pd.factorize(self.df_patents['tech_area'].to_numpy()[valid])
+            if len(ordinals):
+                first, last = ordinals.min(), ordinals.max()
+                flat = np.bincount((ordinals - first) * len(areas) + area_codes,
+                                   minlength=(last - first + 1) * len(areas))
+                index = pd.period_range(pd.Period(ordinal=first, freq=freq), periods=last - first + 1).to_timestamp()
+                counts = pd.DataFrame(flat.reshape(-1, len(areas)), index=index, columns=list(areas))
+            else:
+                counts = pd.DataFrame(index=pd.DatetimeIndex([]), columns=list(areas), dtype=np.int64)
+            self._counts[granularity] = counts
+        return self._counts[granularity]
+
+    def area_series(self, tech_area, granularity='year', max_points=DEFAULT_MAX_POINTS):
+        """某领域降采样后的申请量序列（pd.Series，索引为周期起始日期）"""
+        counts = self.filing_counts(granularity)
+        if tech_area not in counts:
+            return pd.Series(dtype=np.int64)
+        index, values = downsample_series(counts.index, counts[tech_area].to_numpy(), max_points)
+        return pd.Series(values, index=index, name=tech_area)
+
+    def figure_spec(self, key, builder):
+        """按 key 缓存 builder() 生成的图表，返回其JSON；builder 只在缓存未命中时调用"""
+        with self._lock:
+            if key in self._figures:
+                self._figures.move_to_end(key)
+                return self._figures[key]
+        spec = builder().to_json()
+        with self._lock:
+            self._figures[key] = spec
+            if len(self._figures) > self.FIGURE_CACHE_SIZE:
+                self._figures.popitem(last=False)
+        return spec
+
+    def area_trend_figure(self, tech_area, granularity='year', max_points=DEFAULT_MAX_POINTS):
+        """某领域申请量趋势折线图"""
+        def build():
+            import plotly.express as px
+
+            series = self.area_series(tech_area, granularity, max_points)
+            fig = px.line(x=series.index, y=series.to_numpy(),
+                          title=f'{tech_area} - 专利申请趋势（按{GRANULARITY_LABELS[granularity]}）',
+                          labels={'x': '申请日期', 'y': '专利数量'}, markers=len(series) <= 60)
+            fig.update_traces(line=dict(width=3 if len(series) <= 60 else 1.5))
+            return fig
+        return self.figure_spec(('area_trend', tech_area, granularity, max_points), build)
+
+    def market_growth_figure(self, tech_area):
+        """某领域市场增长率折线图"""
+        def build():
+            import plotly.express as px
+
+            market_data = self.df_market[self.df_market['tech_area'] == tech_area].sort_values('year')
+            fig = px.line(market_data, x='year', y='growth_rate', title=f'{tech_area} - 市场增长率',
+                          labels={'year': '年份', 'growth_rate': '增长率'})
+            fig.update_traces(line=dict(color='green', width=3))
+            return fig
+        return self.figure_spec(('market_growth', tech_area), build)
+
+    def growth_comparison_figure(self, growth_df):
+        """各领域专利增长与市场增长对比柱状图（growth_df 由当前版本的增长指标得到）"""
+        def build():
+            import plotly.express as px
+
+            return px.bar(growth_df, x='Tech Area', y=['Patent Growth', 'Market Growth'],
+                          title="技术领域增长对比", barmode='group')
+        return self.figure_spec(('growth_comparison',), build)
+
+    def score_history_figure(self, history, max_points=DEFAULT_MAX_POINTS):
+        """各领域机会分数走势（每个领域分别降采样）；按评分历史的运行数和最新运行缓存"""
+        runs = history.runs()
+        key = ('score_history', len(runs), runs['run_id'].iloc[-1] if len(runs) else None, max_points)
+
+        def build():
+            import plotly.graph_objects as go
+
+            score_matrix = history.score_matrix()
+            fig = go.Figure()
+            for area in score_matrix.columns:
+                series = score_matrix[area].dropna()
+                index, values = downsample_series(series.index, series.to_numpy(), max_points)
+                fig.add_trace(go.Scatter(x=index, y=values, mode='lines', name=area))
+            fig.update_layout(title="各领域机会分数走势", xaxis_title='评分时间', yaxis_title='机会分数',
+                              legend_title='技术领域')
+            return fig
+        return self.figure_spec(key, build)
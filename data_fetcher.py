@@ -1,109 +1,201 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import requests
-from bs4 import BeautifulSoup
+# requests / BeautifulSoup 较重，只在真正发起网络请求的代码路径中按需导入
 import time
 import random
+from functools import partial
+
+from resilience import SourceGuard
+from taxonomy import get_taxonomy
+from watermarks import WatermarkStore
 
 class NoKeyDataFetcher:
-    def __init__(self):
+    # 专利数据源按优先级排列；市场数据只有一个统计数据源
+    PATENT_SOURCES = ['opendata', 'academic']
+    MARKET_SOURCE = 'statistics'
+    PATENT_COLUMNS = ['patent_id', 'filing_date', 'title', 'abstract', 'applicant', 'year', 'tech_area',
+                      'citations', 'market_potential']
+
+    # 内置数据源每30天的专利数，按抓取窗口长度折算
+    SOURCE_RATES = {'opendata': 50, 'academic': 30, 'generated': 150}
+
+    def __init__(self, source_urls=None, timeout=5.0, max_retries=2, hedge_delay=None,
+                 failure_threshold=3, reset_timeout=60.0, watermarks=None):
         self.tech_areas = ['AI', 'Blockchain', 'Biotech', 'Energy', 'IoT', 'Fintech', 'Healthtech', 'Edtech']
         self.last_fetch_time = {}
+        # 可选的HTTP数据源 {数据源名: URL}（返回JSON），未配置的数据源使用内置实现
+        self.source_urls = dict(source_urls or {})
+        # 每个数据源独立熔断：一个数据源持续故障时，后续领域直接跳过它，刷新耗时不随领域数成倍增加
+        self.guard = SourceGuard(timeout=timeout, max_retries=max_retries, hedge_delay=hedge_delay,
+                                 failure_threshold=failure_threshold, reset_timeout=reset_timeout)
+        # 各 (数据源, 领域) 的高水位。一次性构建完整数据集的调用方（应用初次加载、桩服务器）默认只在内存中保存；
+        # 长期运行的增量更新传入带路径的 WatermarkStore（RealTimeUpdater 需同时传入 delta_store），重启后从水位继续
+        self.watermarks = watermarks if watermarks is not None else WatermarkStore(path=None)
+        # 抓取领域名（'AI'、'Blockchain' 等）在返回前统一映射到规范领域和细分方向
+        self.taxonomy = get_taxonomy()
         
     def fetch_patent_data(self, tech_area, days=30):
-        """获取专利数据 - 使用免费数据源和模拟数据结合"""
+        """获取专利数据 - 使用免费数据源和模拟数据结合
+        
+        只返回数据源高水位之后的新专利（没有水位时为最近 days 天），新水位在 commit_watermarks 后生效
+        """
+        default_since = pd.Timestamp.now().normalize() - pd.Timedelta(days=days)
         try:
             print(f"尝试获取 {tech_area} 的专利数据...")
             
             # 尝试从免费数据源获取
-            real_data = self._try_free_patent_sources(tech_area)
-            if real_data is not None and len(real_data) > 0:
-                print(f"成功获取 {len(real_data)} 条真实专利数据")
-                return real_data
+            real_data = self._try_free_patent_sources(tech_area, default_since)
+            if real_data is not None:
+                print(f"成功获取 {len(real_data)} 条新专利数据")
+                return self.taxonomy.canonicalize_patents(real_data)
             
             # 如果免费源失败，使用增强模拟数据
             print("使用增强模拟数据")
-            return self._generate_enhanced_patent_data(tech_area, 150)
-            
         except Exception as e:
             print(f"数据获取失败: {e}, 使用模拟数据")
-            return self._generate_enhanced_patent_data(tech_area, 100)
+        since = self.watermarks.since('generated', tech_area, default_since)
+        data = self._generate_enhanced_patent_data(tech_area, self._window_count('generated', since), since=since)
+        return self.taxonomy.canonicalize_patents(self.watermarks.take('generated', tech_area, data))
     
-    def _try_free_patent_sources(self, tech_area):
-        """尝试免费数据源"""
+    def _try_free_patent_sources(self, tech_area, default_since):
+        """尝试免费数据源：按优先级（开放数据门户、学术网站）取第一个成功的结果，
+        设置了 hedge_delay 时慢的数据源会并行对冲到下一个数据源"""
         try:
-            # 方法1: 尝试从开放数据门户获取
-            open_data = self._fetch_from_opendata(tech_area)
-            if open_data is not None:
-                return open_data
-                
-            # 方法2: 尝试从学术网站获取
-            academic_data = self._fetch_from_academic_sources(tech_area)
-            if academic_data is not None:
-                return academic_data
-                
+            name, data = self.guard.first_success(self._patent_sources(tech_area, default_since), tech_area)
+            return self.watermarks.take(name, tech_area, data)
         except Exception as e:
             print(f"免费数据源获取失败: {e}")
             
         return None
     
-    def _fetch_from_opendata(self, tech_area):
-        """从政府开放数据平台获取数据"""
-        try:
-            # 示例: 尝试获取科技部开放数据
-            # 这里使用模拟的开放数据格式
-            patents = []
-            base_year = 2020
-            
-            for i in range(50):  # 生成50条模拟开放数据
-                year = base_year + random.randint(0, 4)
-                patent = {
-                    'patent_id': f'CN{year}1{random.randint(10000, 99999)}',
-                    'title': f'{tech_area}相关技术专利_{i}',
-                    'abstract': f'这是关于{tech_area}领域的一项技术创新',
-                    'applicant': random.choice(['清华大学', '北京大学', '中国科学院', '华为技术', '阿里巴巴']),
-                    'year': year,
-                    'tech_area': tech_area,
-                    'citations': random.randint(0, 50),
-                    'market_potential': random.randint(20, 95)
-                }
-                patents.append(patent)
-            
-            return pd.DataFrame(patents)
-            
-        except Exception as e:
-            print(f"开放数据获取失败: {e}")
-            return None
+    def _patent_sources(self, tech_area, default_since):
+        """[(数据源名, 函数)]，每个数据源从自己的水位开始抓取"""
+        builtin = {'opendata': self._fetch_from_opendata, 'academic': self._fetch_from_academic_sources}
+        sources = []
+        for name in self.PATENT_SOURCES:
+            since = self.watermarks.since(name, tech_area, default_since)
+            if name in self.source_urls:
+                _, after_id = self.watermarks.get(name, tech_area)
+                sources.append((name, partial(self._fetch_http_patents, self.source_urls[name], since=since, after_id=after_id)))
+            else:
+                sources.append((name, partial(builtin[name], since=since)))
+        return sources
     
-    def _fetch_from_academic_sources(self, tech_area):
-        """从学术网站获取数据"""
-        try:
-            # 这里可以集成arXiv等学术论文数据
-            # 暂时返回模拟数据
-            patents = []
-            
-            for i in range(30):
-                patent = {
-                    'patent_id': f'ARXIV{datetime.now().year}{random.randint(1000, 9999)}',
-                    'title': f'{tech_area}领域研究论文_{i}',
-                    'abstract': f'基于{tech_area}的创新研究方法',
-                    'applicant': random.choice(['麻省理工', '斯坦福大学', '加州伯克利', '剑桥大学']),
-                    'year': datetime.now().year - random.randint(0, 3),
-                    'tech_area': tech_area,
-                    'citations': random.randint(0, 100),
-                    'market_potential': random.randint(30, 90)
-                }
-                patents.append(patent)
-            
-            return pd.DataFrame(patents)
-            
-        except Exception as e:
-            print(f"学术数据获取失败: {e}")
-            return None
+    def commit_watermarks(self):
+        """增量数据合并成功后提交本轮抓取的水位"""
+        self.watermarks.commit()
     
-    def _generate_enhanced_patent_data(self, tech_area, count=100):
-        """生成增强的模拟专利数据"""
+    def discard_watermarks(self):
+        self.watermarks.discard()
+    
+    def _window_count(self, source, since):
+        """内置数据源在 [since, 现在] 窗口内的模拟新专利数"""
+        window_days = max(0.0, (pd.Timestamp.now() - since).total_seconds() / 86400)
+        return int(round(self.SOURCE_RATES[source] * window_days / 30))
+    
+    @staticmethod
+    def _window_dates(since, count):
+        """[since, 现在] 内均匀分布的 count 个申请日期（按天取整）"""
+        start, stop = since.value, pd.Timestamp.now().value
+        values = np.sort(np.random.randint(start, max(start + 1, stop), size=count))
+        return pd.to_datetime(values).normalize()
+    
+    def _fetch_json(self, url, params):
+        """GET 一个JSON数据源；失败时抛出异常，由熔断/重试逻辑处理"""
+        import requests
+        
+        response = requests.get(url, params=params, timeout=self.guard.timeout)
+        response.raise_for_status()
+        return response.json()
+    
+    def _fetch_http_patents(self, url, tech_area, since=None, after_id=None):
+        """从HTTP数据源获取专利：JSON 直接转换；XML批量数据和HTML列表页边下载边流式解析"""
+        import requests
+        
+        params = {'tech_area': tech_area}
+        if since is not None:
+            params['since'] = since.isoformat()
+        if after_id is not None:
+            params['after_id'] = after_id
+        with requests.get(url, params=params, timeout=self.guard.timeout, stream=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '')
+            if 'xml' in content_type or 'html' in content_type:
+                from stream_parser import read_patent_xml
+                
+                response.raw.decode_content = True
+                html = 'html' in content_type
+                data = read_patent_xml(response.raw, html=html, record_tag=None if html else 'patent',
+                                       record_class='patent' if html else None)
+            else:
+                data = pd.DataFrame(response.json())
+        if 'filing_date' in data:
+            data['filing_date'] = pd.to_datetime(data['filing_date'], errors='coerce')
+        return data
+    
+    def _fetch_http_statistics(self, url, industry):
+        data = self._fetch_json(url, {'industry': industry})
+        data['update_time'] = datetime.now()
+        return data
+    
+    def source_health(self):
+        """各数据源的调用统计和熔断器状态"""
+        return self.guard.health()
+    
+    def close(self):
+        """关闭容错调用器的线程池；超时未返回的调用最多再占用一个HTTP超时，之后线程退出"""
+        self.guard.shutdown()
+    
+    def _fetch_from_opendata(self, tech_area, since=None):
+        """从政府开放数据平台获取数据（since 之后申请的专利）"""
+        # 示例: 尝试获取科技部开放数据
+        # 这里使用模拟的开放数据格式
+        patents = []
+        since = since if since is not None else pd.Timestamp.now().normalize() - pd.Timedelta(days=30)
+        
+        for i, filing_date in enumerate(self._window_dates(since, self._window_count('opendata', since))):
+            year = filing_date.year
+            patent = {
+                'patent_id': f'CN{year}1{random.randint(10000, 99999)}',
+                'filing_date': filing_date,
+                'title': f'{tech_area}相关技术专利_{i}',
+                'abstract': f'这是关于{tech_area}领域的一项技术创新',
+                'applicant': random.choice(['清华大学', '北京大学', '中国科学院', '华为技术', '阿里巴巴']),
+                'year': year,
+                'tech_area': tech_area,
+                'citations': random.randint(0, 50),
+                'market_potential': random.randint(20, 95)
+            }
+            patents.append(patent)
+        
+        return pd.DataFrame(patents, columns=self.PATENT_COLUMNS)
+    
+    def _fetch_from_academic_sources(self, tech_area, since=None):
+        """从学术网站获取数据（since 之后发表的论文）"""
+        # 这里可以集成arXiv等学术论文数据
+        # 暂时返回模拟数据
+        patents = []
+        since = since if since is not None else pd.Timestamp.now().normalize() - pd.Timedelta(days=30)
+        
+        for i, filing_date in enumerate(self._window_dates(since, self._window_count('academic', since))):
+            patent = {
+                'patent_id': f'ARXIV{filing_date.year}{random.randint(1000, 9999)}',
+                'filing_date': filing_date,
+                'title': f'{tech_area}领域研究论文_{i}',
+                'abstract': f'基于{tech_area}的创新研究方法',
+                'applicant': random.choice(['麻省理工', '斯坦福大学', '加州伯克利', '剑桥大学']),
+                'year': filing_date.year,
+                'tech_area': tech_area,
+                'citations': random.randint(0, 100),
+                'market_potential': random.randint(30, 90)
+            }
+            patents.append(patent)
+        
+        return pd.DataFrame(patents, columns=self.PATENT_COLUMNS)
+    
+    def _generate_enhanced_patent_data(self, tech_area, count=100, since=None):
+        """生成增强的模拟专利数据（给定 since 时申请日期位于 [since, 现在]，否则为2020-2024年）"""
         patents = []
         
         # 基于技术领域设置不同的特性
@@ -126,12 +218,19 @@ class NoKeyDataFetcher:
             '北京大学', '浙江大学', '上海交通大学', '复旦大学'
         ]
         
-        for i in range(count):
-            year = 2020 + random.randint(0, 4)
+        if since is not None:
+            filing_dates = self._window_dates(since, count)
+        else:
+            filing_dates = [pd.Timestamp(2020 + random.randint(0, 4), random.randint(1, 12), random.randint(1, 28))
+                            for _ in range(count)]
+        
+        for i, filing_date in enumerate(filing_dates):
+            year = filing_date.year
             citations = random.randint(profile['citation_range'][0], profile['citation_range'][1])
             
             patent = {
                 'patent_id': f'CN{year}1{random.randint(100000, 999999)}',
+                'filing_date': filing_date,
                 'title': f'{tech_area}技术专利_{i}',
                 'abstract': f'本发明涉及{tech_area}领域，提供了一种创新的技术解决方案',
                 'applicant': random.choice(applicants),
@@ -142,49 +241,44 @@ class NoKeyDataFetcher:
             }
             patents.append(patent)
         
-        return pd.DataFrame(patents)
+        return pd.DataFrame(patents, columns=self.PATENT_COLUMNS)
     
     def fetch_market_data(self, industry):
         """获取市场数据 - 使用公开统计数据和模拟数据"""
+        url = self.source_urls.get(self.MARKET_SOURCE)
+        source = partial(self._fetch_http_statistics, url) if url else self._fetch_public_statistics
         try:
             # 尝试获取公开统计数据
-            public_data = self._fetch_public_statistics(industry)
-            if public_data:
-                return public_data
-        except:
-            pass
+            return self.guard.call(self.MARKET_SOURCE, source, industry)
+        except Exception as e:
+            print(f"公开统计数据获取失败: {e}")
         
         # 使用模拟市场数据
         return self._generate_market_data(industry)
     
     def _fetch_public_statistics(self, industry):
         """尝试获取公开统计数据"""
-        try:
-            # 这里可以集成政府统计网站的数据
-            # 暂时返回模拟的公开数据
-            
-            growth_rates = {
-                'AI': 0.25, 'Blockchain': 0.18, 'Biotech': 0.22, 
-                'Energy': 0.15, 'IoT': 0.20, 'Fintech': 0.16,
-                'Healthtech': 0.19, 'Edtech': 0.12
-            }
-            
-            market_sizes = {
-                'AI': 180, 'Blockchain': 75, 'Biotech': 220, 
-                'Energy': 150, 'IoT': 130, 'Fintech': 110,
-                'Healthtech': 160, 'Edtech': 90
-            }
-            
-            return {
-                'growth_rate': growth_rates.get(industry, 0.15),
-                'market_size': market_sizes.get(industry, 100),
-                'competition_level': random.randint(30, 80),
-                'update_time': datetime.now()
-            }
-            
-        except Exception as e:
-            print(f"公开统计数据获取失败: {e}")
-            return None
+        # 这里可以集成政府统计网站的数据
+        # 暂时返回模拟的公开数据
+        
+        growth_rates = {
+            'AI': 0.25, 'Blockchain': 0.18, 'Biotech': 0.22, 
+            'Energy': 0.15, 'IoT': 0.20, 'Fintech': 0.16,
+            'Healthtech': 0.19, 'Edtech': 0.12
+        }
+        
+        market_sizes = {
+            'AI': 180, 'Blockchain': 75, 'Biotech': 220, 
+            'Energy': 150, 'IoT': 130, 'Fintech': 110,
+            'Healthtech': 160, 'Edtech': 90
+        }
+        
+        return {
+            'growth_rate': growth_rates.get(industry, 0.15),
+            'market_size': market_sizes.get(industry, 100),
+            'competition_level': random.randint(30, 80),
+            'update_time': datetime.now()
+        }
     
     def _generate_market_data(self, industry):
         """生成模拟市场数据"""
@@ -2,13 +2,6 @@
 import pandas as pd
 import numpy as np
 import random
-from datetime import datetime, timedelta
-from faker import Faker
-import requests
-import json
-
-# 初始化Faker
-fake = Faker()
 
 class DataGenerator:
     def __init__(self):
@@ -225,7 +218,6 @@ class DataGenerator:
                 'geographic_scope': random.choice(['Hong Kong', 'Greater Bay Area', 'Asia Pacific', 'Global']),
                 'industry_impact': random.randint(30, 98),
                 'investment_attractiveness': random.randint(35, 96),
-                'filing_date': self._generate_realistic_date(year),
                 'location': 'Hong Kong',
                 'research_institution': random.choice([True, False]),
                 'collaboration_level': random.choice(['Single Entity', 'University-Industry', 'Cross-border', 'Multi-organization']),
@@ -238,6 +230,8 @@ class DataGenerator:
                 print(f"已生成 {i} 条专利数据...")
         
         df_patents = pd.DataFrame(patents)
+        df_patents.insert(df_patents.columns.get_loc('investment_attractiveness') + 1, 'filing_date',
+                          self._generate_filing_dates(df_patents['year'].to_numpy()))
         print(f"✓ 成功生成 {len(df_patents)} 条专利数据")
         return df_patents
     
@@ -393,12 +387,13 @@ class DataGenerator:
         
         return abstract_template.format(subcategory=subcategory, tech_area=tech_area, context=context)
     
-    def _generate_realistic_date(self, year):
-        """生成真实的申请日期"""
-        start_date = datetime(year, 1, 1)
-        end_date = datetime(year, 12, 31)
-        random_date = start_date + timedelta(days=random.randint(0, (end_date - start_date).days))
-        return random_date.strftime('%Y-%m-%d')
+    def _generate_filing_dates(self, years):
+        """为每个申请年份随机生成当年内的申请日期（向量化，返回 datetime64[ns] 数组）"""
+        year_offsets = np.asarray(years, dtype=np.int64) - 1970
+        start_dates = year_offsets.astype('datetime64[Y]').astype('datetime64[D]')
+        days_in_year = ((year_offsets + 1).astype('datetime64[Y]').astype('datetime64[D]') - start_dates).astype(np.int64)
+        day_offsets = (np.random.random(len(year_offsets)) * days_in_year).astype(np.int64)
+        return (start_dates + day_offsets).astype('datetime64[ns]')
     
     def generate_market_data(self):
         """生成全面的市场数据"""
@@ -1,31 +1,81 @@
+import glob
+import os
 import schedule
-import time
 import threading
 from datetime import datetime, timedelta
 import streamlit as st
 import pandas as pd
 
 class RealTimeUpdater:
-    def __init__(self, analyzer):
+    def __init__(self, analyzer, history=None, memory_monitor=None, fetcher=None,
+                 watermarks=None, delta_store=None):
         self.analyzer = analyzer
+        # 数据获取器在多次更新之间复用，熔断器状态、数据源健康统计和抓取水位才能跨更新保留
+        self.fetcher = fetcher
+        # 抓取水位：None 表示只保存在内存中（默认，不写文件），或JSON文件路径、WatermarkStore 实例（每轮更新合并成功后写入）。
+        # 传入 fetcher 时使用 fetcher 自带的水位
+        if isinstance(watermarks, str):
+            from watermarks import WatermarkStore
+            watermarks = WatermarkStore(watermarks)
+        self.watermarks = watermarks
+        # 增量数据目录：每轮合并的专利增量写为 delta_store/<运行编号>/part-*.parquet，首次更新时先把以前运行写入的增量并入分析器。
+        # 持久化水位后重启只抓取水位之后的专利，水位之前抓到的专利只能从这里恢复，因此持久化水位必须同时传入 delta_store
+        marks = getattr(fetcher, 'watermarks', None) if fetcher is not None else watermarks
+        if delta_store is None and marks is not None and marks.path:
+            raise ValueError("持久化抓取水位需要同时传入 delta_store 保存已抓取的专利增量")
+        self.delta_store = delta_store
+        self._delta_spill = None
+        # 增量合并用的去重器、草图和申请人共现图在首次更新时由现有专利初始化，之后只追加新专利
+        self.deduplicator = None
+        self.applicant_graph = None
+        self.last_delta_size = 0
         self.last_update = None
         self.is_updating = False
         self.update_count = 0
+        self.area_sketches = None
+        self.last_run_id = None
+        # 评分历史：目录路径、ScoreHistoryStore 实例，或 None 表示不记录（默认，构造时不创建目录）；
+        # 与应用或批量评分共用历史时传入同一目录，例如 'score_history'
+        if isinstance(history, str):
+            from score_history import ScoreHistoryStore
+            history = ScoreHistoryStore(history)
+        self.history = history
+        # 内存监控：每次更新后采样RSS，设置了 report_path 时同时写出JSON报告
+        self.memory_monitor = memory_monitor
+        # 由更新器自己创建的数据获取器在 stop() 时关闭，调用方传入的由调用方关闭
+        self._owns_fetcher = fetcher is None
+        self._stop_event = threading.Event()
+        self._thread = None
         
     def start_background_update(self):
         """启动后台更新线程"""
         def update_loop():
-            while True:
+            while not self._stop_event.is_set():
                 try:
                     self.update_opportunity_scores()
-                    # 每2小时更新一次（演示用可以设置更短时间）
-                    time.sleep(7200)  
+                    # 每2小时更新一次（演示用可以设置更短时间）；stop() 时立即退出等待
+                    self._stop_event.wait(7200)
                 except Exception as e:
                     print(f"更新失败: {e}")
-                    time.sleep(300)  # 5分钟后重试
+                    self._stop_event.wait(300)  # 5分钟后重试
         
-        thread = threading.Thread(target=update_loop, daemon=True)
-        thread.start()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=update_loop, daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout=60):
+        """停止后台更新，等待进行中的更新结束（最多 timeout 秒），再关闭更新器创建的数据获取器（释放其线程池）"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # 更新仍在进行，保留获取器，避免进行中的更新因获取器已关闭而失败
+                print(f"后台更新在 {timeout} 秒内未结束，未关闭数据获取器")
+                return
+            self._thread = None
+        if self._owns_fetcher and self.fetcher is not None:
+            self.fetcher.close()
+            self.fetcher = None
     
     def update_opportunity_scores(self):
         """更新机会分数"""
@@ -37,35 +87,54 @@ class RealTimeUpdater:
             print("开始更新机会分数...")
             
             # 使用无需密钥的数据获取器
-            from data_fetcher import NoKeyDataFetcher
-            fetcher = NoKeyDataFetcher()
+            fetcher = self.get_fetcher()
+            self._init_incremental_state()
             
-            # 获取所有技术领域的最新数据
+            # 获取所有技术领域水位之后的新数据
             updated_patents = []
-            updated_market = []
+            # 市场数据按规范领域保存：多个抓取领域映射到同一领域时（'Fintech'、'Blockchain'），优先用指向整个领域的那个
+            updated_market = {}
             
             for area in fetcher.tech_areas:
-                # 获取专利数据
-                new_patents = fetcher.fetch_patent_data(area)
-                updated_patents.append(new_patents)
+                # 获取专利增量（去除与已有专利、跨数据源的重复专利）
+                new_patents = self.deduplicator.deduplicate(fetcher.fetch_patent_data(area))
+                if len(new_patents) > 0:
+                    updated_patents.append(new_patents)
                 
                 # 获取市场数据
+                canonical_area = fetcher.taxonomy.canonical_area(area, register=True)
+                if canonical_area in updated_market and not fetcher.taxonomy.is_area_alias(area):
+                    continue
                 market_data = fetcher.fetch_market_data(area)
-                market_data['tech_area'] = area
+                market_data['tech_area'] = canonical_area
                 market_data['year'] = datetime.now().year
-                updated_market.append(market_data)
+                updated_market[canonical_area] = market_data
             
-            # 合并数据
-            if updated_patents:
-                all_patents = pd.concat(updated_patents, ignore_index=True)
-                self.analyzer.df_patents = all_patents
+            # 合并数据：专利增量追加到已有专利之后，市场数据按 (领域, 年份) 覆盖当年的记录
+            if updated_patents or updated_market:
+                delta = pd.concat(updated_patents, ignore_index=True) if updated_patents else None
+                if delta is not None and hasattr(self.analyzer, 'append_patents'):
+                    # 聚合模式的分析器自行累加聚合量、草图和共现图；保留窗口模式还会把过期明细溢写到磁盘，
+                    # 移出内存的专利同时移出去重语料（LSH分桶大小由保留窗口决定），只在归档中保留专利号和抽样签名，
+                    # 其他数据源重新返回同一专利号时仍会被拒绝；与已移出专利编号不同的近重复不再能检出
+                    evicted = self.analyzer.append_patents(delta)
+                    if evicted is not None and len(evicted) > 0:
+                        self.deduplicator.evict(evicted)
+                elif delta is not None:
+                    self.analyzer.df_patents = pd.concat([self.analyzer.df_patents, delta], ignore_index=True)
+                    self.area_sketches.update(delta)
+                    self.applicant_graph.update(delta)
+                self.last_delta_size = 0 if delta is None else len(delta)
                 
                 # 更新市场数据
-                market_df = pd.DataFrame(updated_market)
-                self.analyzer.df_market = market_df
+                self.analyzer.df_market = self._merge_market(self.analyzer.df_market, pd.DataFrame(list(updated_market.values())))
+                self.analyzer.set_area_sketches(self.area_sketches)
+                self.analyzer.set_applicant_graph(self.applicant_graph)
                 
                 # 重新计算机会分数
                 new_opportunities = self.analyzer.calculate_opportunity_scores()
+                if self.history is not None:
+                    self.last_run_id = self.history.append_analyzer(self.analyzer)
                 
                 # 更新缓存
                 try:
@@ -75,20 +144,85 @@ class RealTimeUpdater:
                 
                 self.update_count += 1
                 self.last_update = datetime.now()
-                print(f"机会分数更新完成 ({self.update_count}): {self.last_update}")
+                if self.memory_monitor is not None:
+                    if self.memory_monitor.report_path:
+                        self.memory_monitor.write_report(analyzer=self.analyzer, extra={'area_sketches': self.area_sketches})
+                    else:
+                        self.memory_monitor.record()
+                # 增量先落盘再提交水位，重启后水位之前的专利可以从 delta_store 恢复
+                if delta is not None and self._delta_spill is not None:
+                    self._delta_spill.spill(delta)
+                fetcher.commit_watermarks()
+                print(f"机会分数更新完成 ({self.update_count}, 新增 {self.last_delta_size} 条专利): {self.last_update}")
                 
         except Exception as e:
+            # 合并失败时不推进水位，下次从原水位重新抓取
+            if self.fetcher is not None:
+                self.fetcher.discard_watermarks()
             print(f"更新失败: {e}")
         finally:
             self.is_updating = False
     
+    def _init_incremental_state(self):
+        """首次更新时由分析器现有的专利初始化去重语料、统计草图和申请人共现图"""
+        if self.deduplicator is not None:
+            return
+        from dedup import PatentDeduplicator
+        
+        self._replay_deltas()
+        deduplicator = PatentDeduplicator()
+        if self.analyzer.df_patents is not None:
+            deduplicator.add_corpus(self.analyzer.df_patents)
+        # 保留窗口模式下已溢写到磁盘的专利记入去重归档
+        spill_store = getattr(self.analyzer, 'spill_store', None)
+        if spill_store is not None:
+            for chunk in spill_store.iter_chunks(columns=['patent_id', 'title', 'abstract'] + deduplicator.block_fields):
+                deduplicator.add_archive(chunk)
+        self.area_sketches = self.analyzer.get_area_sketches()
+        self.applicant_graph = self.analyzer.get_applicant_graph()
+        self.deduplicator = deduplicator
+    
+    def _replay_deltas(self):
+        """把以前运行写入 delta_store 的专利增量并入分析器（与持久化的水位对应），之后的增量写到本次运行的新目录"""
+        if self.delta_store is None:
+            return
+        from aggregates import iter_patent_chunks
+        from retention import PatentSpillStore
+        
+        files = sorted(glob.glob(os.path.join(self.delta_store, '*', 'part-*.parquet')))
+        for chunk in iter_patent_chunks(files):
+            if hasattr(self.analyzer, 'append_patents'):
+                self.analyzer.append_patents(chunk)
+            else:
+                self.analyzer.df_patents = pd.concat([self.analyzer.df_patents, chunk], ignore_index=True)
+        self._delta_spill = PatentSpillStore(self.delta_store)
+    
+    @staticmethod
+    def _merge_market(df_market, updates):
+        """用新的市场数据覆盖同一 (领域, 年份) 的旧记录，其余记录保留"""
+        if df_market is None or len(df_market) == 0:
+            return updates
+        keys = pd.MultiIndex.from_frame(updates[['tech_area', 'year']])
+        stale = pd.MultiIndex.from_frame(df_market[['tech_area', 'year']]).isin(keys)
+        return pd.concat([df_market[~stale], updates], ignore_index=True)
+    
+    def get_fetcher(self):
+        if self.fetcher is None:
+            from data_fetcher import NoKeyDataFetcher
+            self.fetcher = NoKeyDataFetcher(watermarks=self.watermarks)
+        return self.fetcher
+    
     def get_update_status(self):
         """获取更新状态"""
         return {
             'last_update': self.last_update,
             'is_updating': self.is_updating,
             'update_count': self.update_count,
-            'next_update': self.last_update + timedelta(hours=2) if self.last_update else None
+            'last_run_id': self.last_run_id,
+            'last_delta_size': self.last_delta_size,
+            'next_update': self.last_update + timedelta(hours=2) if self.last_update else None,
+            'source_health': self.fetcher.source_health() if self.fetcher is not None else {},
+            'retention': self.analyzer.retention_status() if hasattr(self.analyzer, 'retention_status') else None
         }
     
     def manual_update(self):
@@ -0,0 +1,262 @@
+# dedup.py
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from search_index import tokenize
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# 空文本没有片段，签名保持全部为最大哈希值
+_EMPTY_HASH = np.uint32(_MAX_HASH)
+
+
+def _shingles(text, k=2):
+    """按词项生成k-gram片段"""
+    tokens = tokenize(text)
+    if len(tokens) < k:
+        return list(tokens)
+    return [' '.join(tokens[i:i + k]) for i in range(len(tokens) - k + 1)]
+
+
+class PatentDeduplicator:
+    """专利去重：专利号精确哈希 + 标题/摘要MinHash-LSH近重复检测
+
+    移出语料（evict）的专利只保留专利号和每个字段 archive_perm 个签名值的抽样（每条 8 * archive_perm 字节）：
+    之后以相同专利号再次抓取时仍按内容判为精确重复或编号冲突（抽样估计较粗，内容改动较多的同号专利会被重新编号），
+    但不再参与LSH近重复检测。归档随累计移出条数增长，远小于完整签名和明细
+    """
+
+    def __init__(self, num_perm=128, bands=32, threshold=0.9, block_fields=('tech_area',), seed=42, archive_perm=16):
+        if (2 * num_perm) % bands != 0:
+            raise ValueError("bands 必须整除签名长度 (2 * num_perm)")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = 2 * num_perm // bands
+        self.threshold = threshold
+        self.block_fields = list(block_fields)
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 31, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, 1 << 31, size=num_perm).astype(np.uint64)
+
+        self._signatures = np.empty((1024, 2 * num_perm), dtype=np.uint32)
+        self._blocks = []
+        self._patent_ids = []
+        self._id_to_row = {}
+        self._buckets = [defaultdict(list) for _ in range(bands)]
+        # 已移出专利的抽样签名（标题、摘要各取前 archive_perm 个值）
+        archive_perm = min(archive_perm, num_perm)
+        self._archive_columns = np.r_[0:archive_perm, num_perm:num_perm + archive_perm]
+        self._archived = np.empty((0, 2 * archive_perm), dtype=np.uint32)
+        self._archived_ids = {}
+        self.last_report = None
+        self.duplicate_log = pd.DataFrame(columns=['patent_id', 'duplicate_of', 'similarity', 'reason'])
+
+    @property
+    def corpus_size(self):
+        return len(self._patent_ids)
+
+    @property
+    def archived_size(self):
+        return len(self._archived_ids)
+
+    def _minhash(self, texts):
+        """批量计算MinHash签名"""
+        signatures = np.full((len(texts), self.num_perm), _MAX_HASH, dtype=np.uint64)
+        doc_index, shingles = [], []
+        for i, text in enumerate(texts):
+            pieces = _shingles(text)
+            doc_index.extend([i] * len(pieces))
+            shingles.extend(pieces)
+        if not shingles:
+            return signatures.astype(np.uint32)
+
+        hashes = pd.util.hash_array(np.asarray(shingles, dtype=object)) & _MAX_HASH
+        doc_index = np.asarray(doc_index)
+
+        # 分块计算 (a*x+b) mod p，控制中间矩阵大小
+        step = max(1, 2_000_000 // self.num_perm)
+        for lo in range(0, len(hashes), step):
+            hi = min(lo + step, len(hashes))
+            permuted = (np.outer(hashes[lo:hi], self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+            chunk_docs = doc_index[lo:hi]
+            chunk_starts = np.flatnonzero(np.r_[True, np.diff(chunk_docs) != 0])
+            reduced = np.minimum.reduceat(permuted, chunk_starts, axis=0)
+            rows = chunk_docs[chunk_starts]
+            signatures[rows] = np.minimum(signatures[rows], reduced)
+
+        return signatures.astype(np.uint32)
+
+    def _signature(self, df):
+        titles = df['title'].fillna('').astype(str).tolist()
+        abstracts = df['abstract'].fillna('').astype(str).tolist() if 'abstract' in df else [''] * len(titles)
+        return np.hstack([self._minhash(titles), self._minhash(abstracts)])
+
+    def _block_keys(self, df):
+        if not self.block_fields:
+            return [()] * len(df)
+        return list(df[self.block_fields].astype(str).itertuples(index=False, name=None))
+
+    @staticmethod
+    def _estimate(signature, other):
+        """标题与摘要签名（各占一半）的估计Jaccard相似度取平均
+
+        两边都为空的字段不参与平均（否则两条空摘要会贡献相似度1.0，标题稍有相似就被判为重复），
+        两个字段都为空时相似度为0；只有一边为空的字段签名不会相等，相似度约为0
+        """
+        similarities = (signature == other).reshape(2, -1).mean(axis=1)
+        if signature[0] != _EMPTY_HASH and signature[len(signature) // 2] != _EMPTY_HASH:
+            # 新专利两个字段都非空（常见情况），不需要判断空字段
+            return float(similarities.mean())
+        both_empty = ((signature == _EMPTY_HASH) & (other == _EMPTY_HASH)).reshape(2, -1).all(axis=1)
+        return 0.0 if both_empty.all() else float(similarities[~both_empty].mean())
+
+    def _similarity(self, signature, row):
+        return self._estimate(signature, self._signatures[row])
+
+    def _id_similarity(self, patent_id, signature):
+        """与语料或已移出专利中同一专利号的内容相似度，专利号未出现过时为 None"""
+        row = self._id_to_row.get(patent_id)
+        if row is not None:
+            return self._similarity(signature, row)
+        row = self._archived_ids.get(patent_id)
+        if row is not None:
+            return self._estimate(signature[self._archive_columns], self._archived[row])
+        return None
+
+    def _insert(self, patent_id, signature, block):
+        row = len(self._patent_ids)
+        if row == len(self._signatures):
+            # 容量翻倍，保证追加的均摊代价为常数
+            grown = np.empty((2 * row, self._signatures.shape[1]), dtype=np.uint32)
+            grown[:row] = self._signatures
+            self._signatures = grown
+        self._signatures[row] = signature
+        self._patent_ids.append(patent_id)
+        self._id_to_row.setdefault(patent_id, row)
+        self._blocks.append(block)
+        for band, bucket in enumerate(self._band_keys(signature)):
+            if bucket is not None:
+                self._buckets[band][bucket].append(row)
+        return row
+
+    def _band_keys(self, signature):
+        """每个分段的桶键；空字段的分段为 None，不分桶，避免所有空摘要的专利落进同一个桶"""
+        bands = signature.reshape(self.bands, self.rows_per_band)
+        empty = (bands == _EMPTY_HASH).all(axis=1)
+        return [None if is_empty else band.tobytes() for band, is_empty in zip(bands, empty)]
+
+    def add_corpus(self, df_patents):
+        """将已有语料加入索引（不做去重）"""
+        if len(df_patents) == 0:
+            return
+        signatures = self._signature(df_patents)
+        for patent_id, signature, block in zip(df_patents['patent_id'].tolist(), signatures, self._block_keys(df_patents)):
+            self._insert(patent_id, signature, block)
+
+    def evict(self, patent_ids):
+        """把专利移出语料（例如已移出内存保留窗口的旧专利），重建签名表和LSH分桶；返回移出的条数
+
+        移出的专利号和抽样签名留在归档中，相同专利号的重复抓取仍会被拒绝
+        """
+        evicted = set(patent_ids)
+        keep = [row for row, patent_id in enumerate(self._patent_ids) if patent_id not in evicted]
+        removed = len(self._patent_ids) - len(keep)
+        if removed == 0:
+            return 0
+        archived = [row for row, patent_id in enumerate(self._patent_ids) if patent_id in evicted]
+        self._archive([self._patent_ids[row] for row in archived], self._signatures[archived])
+        signatures = self._signatures[keep]
+        patent_ids = [self._patent_ids[row] for row in keep]
+        blocks = [self._blocks[row] for row in keep]
+        self._signatures = np.empty((max(1024, len(keep)), signatures.shape[1]), dtype=np.uint32)
+        self._patent_ids, self._blocks, self._id_to_row = [], [], {}
+        self._buckets = [defaultdict(list) for _ in range(self.bands)]
+        for patent_id, signature, block in zip(patent_ids, signatures, blocks):
+            self._insert(patent_id, signature, block)
+        return removed
+
+    def _archive(self, patent_ids, signatures):
+        """记入归档：专利号 → 抽样签名（同一专利号只记第一次）"""
+        archived = {}
+        for patent_id, signature in zip(patent_ids, signatures):
+            if patent_id not in self._archived_ids:
+                archived.setdefault(patent_id, signature)
+        start = len(self._archived_ids)
+        end = start + len(archived)
+        if end > len(self._archived):
+            # 容量翻倍，保证多次移出的均摊代价与移出条数成正比
+            grown = np.empty((max(1024, 2 * end), self._archived.shape[1]), dtype=np.uint32)
+            grown[:start] = self._archived[:start]
+            self._archived = grown
+        if archived:
+            self._archived[start:end] = np.asarray(list(archived.values()))[:, self._archive_columns]
+        for offset, patent_id in enumerate(archived):
+            self._archived_ids[patent_id] = start + offset
+
+    def add_archive(self, df_patents):
+        """把已移出内存的专利（例如溢写到磁盘的分片）只记入归档，不加入LSH分桶"""
+        if len(df_patents) == 0:
+            return
+        self._archive(df_patents['patent_id'].tolist(), self._signature(df_patents))
+
+    def deduplicate(self, df_batch):
+        """对新批次去重，并把保留下来的专利加入语料"""
+        if len(df_batch) == 0:
+            self.last_report = {'input': 0, 'kept': 0, 'exact_duplicates': 0, 'near_duplicates': 0, 'id_collisions': 0}
+            return df_batch
+
+        signatures = self._signature(df_batch)
+
+        keep = np.ones(len(df_batch), dtype=bool)
+        patent_ids = df_batch['patent_id'].tolist()
+        new_ids = list(patent_ids)
+        report = {'input': len(df_batch), 'exact_duplicates': 0, 'near_duplicates': 0, 'id_collisions': 0}
+        duplicates = []
+
+        for i, (patent_id, signature, block) in enumerate(zip(patent_ids, signatures, self._block_keys(df_batch))):
+            # 1. 专利号精确匹配（含已移出语料的专利）：内容相同视为重复，否则视为编号冲突并重新编号
+            similarity = self._id_similarity(patent_id, signature)
+            if similarity is not None:
+                if similarity >= self.threshold:
+                    keep[i] = False
+                    report['exact_duplicates'] += 1
+                    duplicates.append((patent_id, patent_id, similarity, 'exact_id'))
+                    continue
+                suffix = 2
+                while f'{patent_id}-{suffix}' in self._id_to_row or f'{patent_id}-{suffix}' in self._archived_ids:
+                    suffix += 1
+                new_ids[i] = f'{patent_id}-{suffix}'
+                report['id_collisions'] += 1
+
+            # 2. LSH分桶找候选，再用签名估计相似度确认
+            candidates = set()
+            for band, bucket in enumerate(self._band_keys(signature)):
+                if bucket is not None:
+                    candidates.update(self._buckets[band].get(bucket, ()))
+            match = None
+            for candidate in candidates:
+                if self._blocks[candidate] != block:
+                    continue
+                similarity = self._similarity(signature, candidate)
+                if similarity >= self.threshold:
+                    match = (candidate, similarity)
+                    break
+
+            if match is not None:
+                keep[i] = False
+                report['near_duplicates'] += 1
+                duplicates.append((patent_id, self._patent_ids[match[0]], match[1], 'near_duplicate'))
+                continue
+
+            self._insert(new_ids[i], signature, block)
+
+        result = df_batch.assign(patent_id=new_ids)[keep]
+        report['kept'] = int(keep.sum())
+        self.last_report = report
+        self.duplicate_log = pd.DataFrame(duplicates, columns=['patent_id', 'duplicate_of', 'similarity', 'reason'])
+        print(f"去重完成: 输入 {report['input']} 条, 保留 {report['kept']} 条, "
+              f"精确重复 {report['exact_duplicates']} 条, 近重复 {report['near_duplicates']} 条, 编号冲突 {report['id_collisions']} 条")
+        return result
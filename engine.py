@@ -1,29 +1,294 @@
 # engine.py
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+import functools
+import hashlib
+import threading
 import warnings
 warnings.filterwarnings('ignore')
 
+from taxonomy import UNKNOWN, get_taxonomy
+
+# 机会分数的组成：(分数名, 指标, 缩放, 偏移, 下限, 上限, 权重)
+# 指标先变换为 偏移 + 缩放 * 指标，再按 [下限, 上限] 标准化到0-1后乘以权重
+SCORE_COMPONENTS = [
+    ('growth_score', 'cagr', 100, 0, 0, 50, 0.20),
+    ('market_score', 'market_growth', 100, 0, 0, 30, 0.15),
+    ('size_score', 'market_size', 1, 0, 0, 300, 0.15),
+    ('quality_score', 'avg_quality', 1, 0, 0, 100, 0.15),
+    ('commercial_score', 'avg_commercial', 1, 0, 0, 100, 0.10),
+    ('attractiveness_score', 'avg_attractiveness', 1, 0, 0, 100, 0.10),
+    ('competition_score', 'competition_level', -1, 100, 0, 100, 0.10),
+    ('government_score', 'government_support', 1, 0, 0, 100, 0.05),
+]
+
+# 增长指标中取均值的专利字段，以及领域相似度使用的特征（另加专利数）
+GROWTH_MEAN_COLUMNS = ['quality_score', 'commercial_viability', 'industry_impact', 'investment_attractiveness']
+SIMILARITY_FEATURES = ['quality_score', 'market_potential', 'commercial_viability', 'citations', 'industry_impact', 'investment_attractiveness']
+
+# 申请人专利份额的HHI超过该值视为高度集中（对应反垄断指南的2500点）
+HHI_CONCENTRATED = 0.25
+
+def cosine_similarity(X, Y=None):
+    """NumPy实现的余弦相似度（与 sklearn.metrics.pairwise.cosine_similarity 结果一致），
+    避免仅为此函数在导入时加载scikit-learn；零向量与任何向量的相似度为0"""
+    def normalize(matrix):
+        matrix = np.asarray(matrix, dtype=np.float64)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    X = normalize(X)
+    Y = X if Y is None else normalize(Y)
+    return X @ Y.T
+
+def compute_dataset_version(*frames):
+    """根据数据内容计算数据集版本号"""
+    digest = hashlib.sha1()
+    for df in frames:
+        digest.update(str((len(df), list(df.columns))).encode())
+        try:
+            hashed = pd.util.hash_pandas_object(df, index=False).values
+        except TypeError:
+            hashed = pd.util.hash_pandas_object(df.astype(str), index=False).values
+        digest.update(hashed.tobytes())
+    return digest.hexdigest()[:16]
+
+def synchronized(method):
+    """在分析器的缓存锁内执行：惰性缓存可能被多个请求线程（API服务）同时构建或读取，
+    加锁后每个数据集版本只构建一次，也不会读到构建到一半的缓存"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._cache_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 class PatentAnalyzer:
-    def __init__(self, df_patents, df_market, df_investors):
-        self.df_patents = df_patents
-        self.df_market = df_market
-        self.df_investors = df_investors
-        self.tech_areas = df_patents['tech_area'].unique()
+    def __init__(self, df_patents, df_market, df_investors, financial_provider=None):
+        # 可重入：缓存之间有依赖（评分表依赖申请人共现图等）
+        self._cache_lock = threading.RLock()
+        # 入库时统一各来源的领域名称并添加整数编号列，领域分组和连接都按编号进行
+        self.taxonomy = get_taxonomy()
+        self.df_patents = self.taxonomy.canonicalize_patents(df_patents)
+        self.df_market = self.taxonomy.canonicalize_market(df_market)
+        self.df_investors = self.taxonomy.canonicalize_investors(df_investors)
+        self.financial_provider = financial_provider
+        self.tech_areas = self._list_tech_areas()
         print(f"初始化专利分析器，包含 {len(self.tech_areas)} 个技术领域")
         
+        self._version_key = None
+        self._dataset_version = None
+        self._search_index = None
+        self._similarity_model = None
+        self._query_index = None
+        self._chart_data = None
+        self._area_rows = None
+        self._area_rows_version = None
+        self._area_sketches = None
+        self._area_sketches_version = None
+        self._applicant_graph = None
+        self._applicant_graph_version = None
+        # 开启后风险评估的“所有权集中”同时参考申请人共现图的HHI
+        self.applicant_concentration_risk = False
+        self._scoring_table = None
+        self._scoring_table_version = None
+        self._component_cache = {}
+        self._scoring_columns = {}
+        self._preference_matcher = None
+        self._financial_table = None
+        self._financial_table_key = None
+        
         # 准备协同过滤数据
         self._prepare_collaborative_data()
     
+    def __getstate__(self):
+        # 锁不能序列化（分析器会被传给进程池）
+        state = self.__dict__.copy()
+        state.pop('_cache_lock', None)
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache_lock = threading.RLock()
+    
+    def _list_tech_areas(self):
+        return self.df_patents['tech_area'].unique()
+    
+    def canonical_area(self, tech_area):
+        """查询参数中的领域名称（'AI'、'人工智能' 等别名）-> 规范名称；未登记的名称原样返回"""
+        if isinstance(tech_area, (list, tuple, set, np.ndarray, pd.Series)):
+            return [self.canonical_area(area) for area in tech_area]
+        return self.taxonomy.canonical_area(tech_area) or tech_area
+    
+    @property
+    @synchronized
+    def dataset_version(self):
+        """当前数据集版本（df_patents或df_market被替换后自动重新计算）"""
+        key = (id(self.df_patents), len(self.df_patents), id(self.df_market), len(self.df_market))
+        if key != self._version_key:
+            self._dataset_version = compute_dataset_version(self.df_patents, self.df_market)
+            self._version_key = key
+        return self._dataset_version
+    
+    @property
+    def patent_count(self):
+        """数据集中的专利数（分块模式下为聚合量覆盖的行数）"""
+        return len(self.df_patents)
+    
+    @synchronized
+    def get_search_index(self):
+        """获取全文索引：每个数据集版本只构建一次，新增专利增量加入"""
+        from search_index import PatentSearchIndex
+        
+        version = self.dataset_version
+        index = self._search_index
+        if index is not None and index.dataset_version == version:
+            return index
+        
+        if index is not None and index.can_extend(self.df_patents):
+            # 新数据包含全部已索引专利，只需追加新增部分
+            index.add_documents(self.df_patents)
+        else:
+            index = PatentSearchIndex()
+            index.add_documents(self.df_patents)
+        index.dataset_version = version
+        self._search_index = index
+        return index
+    
+    def search_patents(self, query, top_k=20, tech_area=None, year=None, applicant=None):
+        """全文检索专利"""
+        if tech_area is not None:
+            tech_area = self.canonical_area(tech_area)
+        return self.get_search_index().search(query, top_k=top_k, tech_area=tech_area, year=year, applicant=applicant)
+    
+    @synchronized
+    def get_similarity_model(self):
+        """获取专利相似度模型（按数据集版本缓存）"""
+        from patent_similarity import PatentSimilarityModel
+        
+        version = self.dataset_version
+        if self._similarity_model is None or self._similarity_model.dataset_version != version:
+            self._similarity_model = PatentSimilarityModel(self.df_patents, dataset_version=version)
+        return self._similarity_model
+    
+    def find_similar_patents(self, patent_id, top_k=10):
+        """查找内容相似的专利（"更多类似专利"）"""
+        return self.get_similarity_model().most_similar(patent_id, top_k)
+    
+    def compute_patent_neighbors(self, top_k=10, memory_budget_mb=256):
+        """分块计算所有专利的top-k相似专利"""
+        return self.get_similarity_model().top_k_neighbors(top_k=top_k, memory_budget_mb=memory_budget_mb)
+    
+    @synchronized
+    def get_query_index(self):
+        """获取专利明细查询索引（按数据集版本缓存）"""
+        from patent_query import PatentQueryIndex
+        
+        version = self.dataset_version
+        if self._query_index is None or self._query_index.dataset_version != version:
+            self._query_index = PatentQueryIndex(self.df_patents, dataset_version=version)
+        return self._query_index
+    
+    def query_patents(self, filters=None, sort_by='quality_score', ascending=False, page=1, page_size=50, columns=None):
+        """按条件筛选专利并分页返回，只取出当前页的行"""
+        if filters and filters.get('tech_area'):
+            filters = {**filters, 'tech_area': self.canonical_area(filters['tech_area'])}
+        return self.get_query_index().query(filters, sort_by, ascending, page, page_size, columns)
+    
+    @synchronized
+    def get_chart_data(self):
+        """获取图表数据层（各粒度申请量序列和序列化图表缓存，按数据集版本缓存）"""
+        from chart_data import ChartDataLayer
+        
+        version = self.dataset_version
+        if self._chart_data is None or self._chart_data.dataset_version != version:
+            self._chart_data = ChartDataLayer(self.df_patents, self.df_market, dataset_version=version)
+        return self._chart_data
+    
+    def filing_counts(self, granularity='month'):
+        """各领域按 年/季度/月/周/日 重采样的申请量（行为周期起始日期，连续无缺口；列为技术领域）"""
+        return self.get_chart_data().filing_counts(granularity)
+    
+    def filing_growth(self, granularity='month', window=None):
+        """各领域按月/季度等粒度的申请量增长：环比、同比、最近 window 期的增长率和加速度"""
+        from chart_data import filing_growth
+        
+        return filing_growth(self.filing_counts(granularity), granularity, window)
+    
+    @synchronized
+    def get_area_sketches(self):
+        """获取各领域的流式统计草图（去重申请人数、指标分位数），按数据集版本缓存"""
+        from sketches import AreaStatisticsSketch
+        
+        version = self.dataset_version
+        if self._area_sketches is None or self._area_sketches_version != version:
+            self._area_sketches = AreaStatisticsSketch().update(self.df_patents)
+            self._area_sketches_version = version
+        return self._area_sketches
+    
+    @synchronized
+    def set_area_sketches(self, area_sketches):
+        """使用外部增量维护的草图（例如流式更新器合并的分片草图）"""
+        self._area_sketches = area_sketches
+        self._area_sketches_version = self.dataset_version
+    
+    @synchronized
+    def get_applicant_graph(self):
+        """获取申请人共现图（PageRank、连通分量、集中度），按数据集版本缓存"""
+        from applicant_graph import ApplicantGraph
+        
+        version = self.dataset_version
+        if self._applicant_graph is None or self._applicant_graph_version != version:
+            self._applicant_graph = ApplicantGraph().update(self.df_patents)
+            self._applicant_graph_version = version
+        return self._applicant_graph
+    
+    @synchronized
+    def set_applicant_graph(self, applicant_graph):
+        """使用外部增量维护的申请人共现图"""
+        self._applicant_graph = applicant_graph
+        self._applicant_graph_version = self.dataset_version
+        self._scoring_table = None
+    
+    def use_applicant_concentration(self, enabled=True):
+        """风险评估是否使用共现图的申请人集中度（HHI）判断所有权集中"""
+        self.applicant_concentration_risk = enabled
+        self._scoring_table = None
+    
+    def _area_codes(self):
+        """每条专利的整数领域编号：总是由领域名称经当前注册表推导，不信任数据中带来的 area_id 列
+        （非内置领域的编号按进程分配，直接赋值的 df_patents 或其他进程的快照中的编号可能已失效）"""
+        return self.taxonomy.encode_areas(self.df_patents['tech_area']).astype(np.int64)
+    
+    @synchronized
+    def get_area_rows(self):
+        """各领域在 df_patents 中的行号（升序）：按整数领域编号一次分组，每个数据集版本计算一次"""
+        version = self.dataset_version
+        if self._area_rows is None or self._area_rows_version != version:
+            codes = self._area_codes()
+            order = np.argsort(codes, kind='stable')
+            area_ids, starts = np.unique(codes[order], return_index=True)
+            bounds = np.append(starts, len(order))
+            self._area_rows = {
+                self.taxonomy.area_names[area_id]: order[bounds[i]:bounds[i + 1]]
+                for i, area_id in enumerate(area_ids) if area_id != UNKNOWN
+            }
+            self._area_rows_version = version
+        return self._area_rows
+    
+    def _area_data(self, tech_area):
+        rows = self.get_area_rows().get(tech_area)
+        return self.df_patents.iloc[rows if rows is not None else np.zeros(0, dtype=np.int64)]
+    
     def _prepare_collaborative_data(self):
         """准备协同过滤所需的数据"""
-        self.investor_tech_matrix = pd.DataFrame(0, index=self.df_investors['investor_id'], columns=self.tech_areas)
-        
-        for _, investor in self.df_investors.iterrows():
-            for area in investor['focus_areas']:
-                if area in self.tech_areas:
-                    self.investor_tech_matrix.loc[investor['investor_id'], area] = 1
+        area_positions = {area: i for i, area in enumerate(self.tech_areas)}
+        focus = self.df_investors['focus_areas'].reset_index(drop=True).explode()
+        positions = focus.map(area_positions)
+        valid = positions.notna().to_numpy()
+        matrix = np.zeros((len(self.df_investors), len(self.tech_areas)), dtype=np.int64)
+        matrix[focus.index.to_numpy()[valid], positions.to_numpy()[valid].astype(np.int64)] = 1
+        self.investor_tech_matrix = pd.DataFrame(matrix, index=self.df_investors['investor_id'], columns=self.tech_areas)
         
         self.tech_similarity_matrix = self._compute_tech_similarity()
     
@@ -31,20 +296,13 @@ class PatentAnalyzer:
         """计算技术领域之间的相似度"""
         tech_features = []
         for area in self.tech_areas:
-            area_data = self.df_patents[self.df_patents['tech_area'] == area]
-            features = [
-                area_data['quality_score'].mean(),
-                area_data['market_potential'].mean(),
-                area_data['commercial_viability'].mean(),
-                area_data['citations'].mean(),
-                area_data['industry_impact'].mean(),
-                area_data['investment_attractiveness'].mean(),
-                len(area_data)
-            ]
-            features = [0 if np.isnan(x) else x for x in features]
-            tech_features.append(features)
-        
-        tech_features = np.array(tech_features)
+            area_data = self._area_data(area)
+            tech_features.append(list(area_data[SIMILARITY_FEATURES].mean()) + [len(area_data)])
+        return self._similarity_from_features(tech_features)
+    
+    def _similarity_from_features(self, tech_features):
+        """由 领域 × (特征均值..., 专利数) 计算领域相似度矩阵"""
+        tech_features = np.nan_to_num(np.array(tech_features, dtype=np.float64))
         tech_features = (tech_features - tech_features.mean(axis=0)) / (tech_features.std(axis=0) + 1e-8)
         similarity_matrix = cosine_similarity(tech_features)
         return pd.DataFrame(similarity_matrix, index=self.tech_areas, columns=self.tech_areas)
@@ -55,72 +313,78 @@ class PatentAnalyzer:
         growth_metrics = {}
         
         for area in self.tech_areas:
-            area_data = self.df_patents[self.df_patents['tech_area'] == area]
-            market_data = self.df_market[self.df_market['tech_area'] == area]
-            
+            area_data = self._area_data(area)
             if len(area_data) == 0:
                 continue
             
-            yearly_counts = area_data.groupby('year').size()
-            if len(yearly_counts) > 1:
-                start_count = yearly_counts.iloc[0]
-                end_count = yearly_counts.iloc[-1]
-                years = len(yearly_counts) - 1
-                cagr = (end_count / start_count) ** (1/years) - 1 if start_count > 0 else 0
-                
-                if len(yearly_counts) > 2:
-                    recent_growth = (yearly_counts.iloc[-1] - yearly_counts.iloc[-2]) / yearly_counts.iloc[-2] if yearly_counts.iloc[-2] > 0 else 0
-                    previous_growth = (yearly_counts.iloc[-2] - yearly_counts.iloc[-3]) / yearly_counts.iloc[-3] if yearly_counts.iloc[-3] > 0 else 0
-                    growth_acceleration = recent_growth - previous_growth
-                else:
-                    growth_acceleration = 0
+            growth_metrics[area] = self._area_growth_metric(
+                area,
+                area_data.groupby('year').size(),
+                area_data[GROWTH_MEAN_COLUMNS].mean(),
+                len(area_data),
+                area_data['applicant'].nunique()
+            )
+        
+        return growth_metrics
+    
+    def _area_growth_metric(self, area, yearly_counts, means, patent_count, company_diversity):
+        """由领域的年度专利数、指标均值等汇总量计算增长指标（内存模式和分块模式共用）"""
+        market_data = self.df_market[self.df_market['tech_area'] == area]
+        if len(yearly_counts) > 1:
+            start_count = yearly_counts.iloc[0]
+            end_count = yearly_counts.iloc[-1]
+            years = len(yearly_counts) - 1
+            cagr = (end_count / start_count) ** (1/years) - 1 if start_count > 0 else 0
+            
+            if len(yearly_counts) > 2:
+                recent_growth = (yearly_counts.iloc[-1] - yearly_counts.iloc[-2]) / yearly_counts.iloc[-2] if yearly_counts.iloc[-2] > 0 else 0
+                previous_growth = (yearly_counts.iloc[-2] - yearly_counts.iloc[-3]) / yearly_counts.iloc[-3] if yearly_counts.iloc[-3] > 0 else 0
+                growth_acceleration = recent_growth - previous_growth
             else:
-                cagr = 0
                 growth_acceleration = 0
-            
-            if len(market_data) > 0:
-                current_market = market_data[market_data['year'] == 2024]
-                if len(current_market) > 0:
-                    market_growth = current_market['growth_rate'].iloc[0]
-                    market_size = current_market['market_size'].iloc[0]
-                    competition = current_market['competition_level'].iloc[0]
-                    investment_heat = current_market['investment_heat'].iloc[0]
-                    government_support = current_market['government_support'].iloc[0]
-                else:
-                    market_growth = 0.1
-                    market_size = 50
-                    competition = 50
-                    investment_heat = 50
-                    government_support = 50
+        else:
+            cagr = 0
+            growth_acceleration = 0
+        
+        if len(market_data) > 0:
+            current_market = market_data[market_data['year'] == 2024]
+            if len(current_market) > 0:
+                market_growth = current_market['growth_rate'].iloc[0]
+                market_size = current_market['market_size'].iloc[0]
+                competition = current_market['competition_level'].iloc[0]
+                investment_heat = current_market['investment_heat'].iloc[0]
+                government_support = current_market['government_support'].iloc[0]
             else:
                 market_growth = 0.1
                 market_size = 50
                 competition = 50
                 investment_heat = 50
                 government_support = 50
-            
-            avg_quality = area_data['quality_score'].mean()
-            avg_commercial = area_data['commercial_viability'].mean()
-            avg_impact = area_data['industry_impact'].mean()
-            avg_attractiveness = area_data['investment_attractiveness'].mean()
-            
-            growth_metrics[area] = {
-                'cagr': cagr,
-                'growth_acceleration': growth_acceleration,
-                'market_growth': market_growth,
-                'market_size': market_size,
-                'competition_level': competition,
-                'investment_heat': investment_heat,
-                'government_support': government_support,
-                'avg_quality': avg_quality,
-                'avg_commercial': avg_commercial,
-                'avg_impact': avg_impact,
-                'avg_attractiveness': avg_attractiveness,
-                'patent_count': len(area_data),
-                'company_diversity': area_data['applicant'].nunique()
-            }
+        else:
+            market_growth = 0.1
+            market_size = 50
+            competition = 50
+            investment_heat = 50
+            government_support = 50
         
-        return growth_metrics
+        metric = {
+            'cagr': cagr,
+            'growth_acceleration': growth_acceleration,
+            'market_growth': market_growth,
+            'market_size': market_size,
+            'competition_level': competition,
+            'investment_heat': investment_heat,
+            'government_support': government_support,
+            'avg_quality': means['quality_score'],
+            'avg_commercial': means['commercial_viability'],
+            'avg_impact': means['industry_impact'],
+            'avg_attractiveness': means['investment_attractiveness'],
+            'patent_count': patent_count,
+            'company_diversity': company_diversity
+        }
+        if self.applicant_concentration_risk:
+            metric['applicant_hhi'] = self.get_applicant_graph().area_hhi(area)
+        return metric
     
     def calculate_opportunity_scores(self):
         """计算机会分数"""
@@ -130,20 +394,19 @@ class PatentAnalyzer:
         opportunities = []
         
         for area, metric in metrics.items():
-            growth_score = self._normalize_score(metric['cagr'] * 100, 0, 50) * 0.20
-            market_score = self._normalize_score(metric['market_growth'] * 100, 0, 30) * 0.15
-            size_score = self._normalize_score(metric['market_size'], 0, 300) * 0.15
-            quality_score = self._normalize_score(metric['avg_quality'], 0, 100) * 0.15
-            commercial_score = self._normalize_score(metric['avg_commercial'], 0, 100) * 0.10
-            attractiveness_score = self._normalize_score(metric['avg_attractiveness'], 0, 100) * 0.10
-            competition_score = self._normalize_score(100 - metric['competition_level'], 0, 100) * 0.10
-            government_score = self._normalize_score(metric['government_support'], 0, 100) * 0.05
+            components = {
+                name: self._normalize_score(offset + scale * metric[key], min_val, max_val) * weight
+                for name, key, scale, offset, min_val, max_val, weight in SCORE_COMPONENTS
+            }
+            growth_score = components['growth_score']
+            market_score = components['market_score']
+            quality_score = components['quality_score']
+            commercial_score = components['commercial_score']
+            attractiveness_score = components['attractiveness_score']
+            competition_score = components['competition_score']
+            government_score = components['government_score']
             
-            opportunity_score = (
-                growth_score + market_score + size_score + 
-                quality_score + commercial_score + attractiveness_score +
-                competition_score + government_score
-            )
+            opportunity_score = sum(components.values())
             
             trend_signal = "📈 Bullish" if metric['growth_acceleration'] > 0 else "📉 Caution" if metric['growth_acceleration'] < 0 else "➡️ Stable"
             
@@ -170,6 +433,119 @@ class PatentAnalyzer:
         
         return sorted(opportunities, key=lambda x: x['opportunity_score'], reverse=True)
     
+    def build_metric_matrix(self, metrics=None):
+        """构建 领域 × 原始指标 矩阵，供情景分析和重新加权使用"""
+        if metrics is None:
+            metrics = self.calculate_growth_metrics()
+        return pd.DataFrame.from_dict(metrics, orient='index')
+    
+    @synchronized
+    def get_scoring_table(self):
+        """评分基础表：原始指标 + 风险等级 + 趋势信号，按数据集版本缓存"""
+        version = self.dataset_version
+        if self._scoring_table is None or self._scoring_table_version != version:
+            metrics = self.calculate_growth_metrics()
+            table = self.build_metric_matrix(metrics)
+            table['risk_level'] = [self._assess_risk_level(metric) for metric in metrics.values()]
+            table['trend_signal'] = np.select(
+                [table['growth_acceleration'] > 0, table['growth_acceleration'] < 0],
+                ["📈 Bullish", "📉 Caution"],
+                default="➡️ Stable"
+            )
+            self._scoring_table = table
+            self._scoring_columns = {column: table[column].to_numpy() for column in table.columns}
+            self._scoring_columns['tech_area'] = table.index.to_numpy()
+            self._scoring_table_version = version
+            self._component_cache = {}
+        return self._scoring_table
+    
+    @synchronized
+    def get_component_matrix(self, ranges=None):
+        """未加权的标准化分数矩阵（领域 × 组成部分），按数据集版本和标准化区间缓存"""
+        table = self.get_scoring_table()
+        ranges = ranges or {}
+        key = tuple(sorted(ranges.items()))
+        if key not in self._component_cache:
+            columns = {}
+            for name, metric, scale, offset, min_val, max_val, _ in SCORE_COMPONENTS:
+                min_val, max_val = ranges.get(name, (min_val, max_val))
+                values = offset + scale * table[metric].astype(float).values
+                if max_val - min_val == 0:
+                    columns[name] = np.zeros(len(values))
+                else:
+                    columns[name] = np.clip((values - min_val) / (max_val - min_val), 0, 1)
+            if len(self._component_cache) >= 32:
+                self._component_cache.pop(next(iter(self._component_cache)))
+            self._component_cache[key] = pd.DataFrame(columns, index=table.index)
+        return self._component_cache[key]
+    
+    @synchronized
+    def rank_opportunities(self, weights=None, ranges=None, top_k=None, risk_levels=None, min_market_size=None):
+        """按自定义权重和筛选条件重新排序机会，只做一次矩阵加权，不重新计算指标"""
+        self.get_scoring_table()
+        columns = self._scoring_columns
+        components = self.get_component_matrix(ranges)
+        weights = weights or {}
+        weight_vector = np.array([weights.get(name, weight) for name, *_, weight in SCORE_COMPONENTS], dtype=float)
+        
+        weighted = components.to_numpy() * weight_vector
+        scores = weighted.sum(axis=1)
+        
+        mask = np.ones(len(scores), dtype=bool)
+        if risk_levels:
+            mask &= np.isin(columns['risk_level'], risk_levels)
+        if min_market_size is not None:
+            mask &= columns['market_size'] >= min_market_size
+        candidates = np.flatnonzero(mask)
+        order = candidates[np.argsort(-scores[candidates], kind='stable')]
+        if top_k is not None:
+            order = order[:top_k]
+        
+        # 一次性构建结果表，避免逐列插入的开销
+        result = {'tech_area': columns['tech_area'][order], 'opportunity_score': np.round(scores[order], 1)}
+        for i, name in enumerate(components.columns):
+            result[name] = np.round(weighted[order, i], 1)
+        result['cagr'] = np.round(columns['cagr'][order].astype(float) * 100, 1)
+        for column in ['market_size', 'investment_heat', 'government_support', 'patent_count',
+                       'company_diversity', 'trend_signal', 'risk_level']:
+            result[column] = columns[column][order]
+        result['recommendation'] = [self._generate_recommendation(score, None) for score in scores[order]]
+        return pd.DataFrame(result)
+    
+    @synchronized
+    def get_preference_matcher(self):
+        """获取个性化推荐匹配器（内部按偏好缓存结果）"""
+        if self._preference_matcher is None:
+            from matching import PreferenceMatcher
+            self._preference_matcher = PreferenceMatcher(self)
+        return self._preference_matcher
+    
+    @synchronized
+    def get_financial_table(self):
+        """当前数据集所有领域的财务指标表（确定性生成，可跨页面共享）"""
+        if self.financial_provider is None:
+            from financials import FinancialMetricsProvider
+            self.financial_provider = FinancialMetricsProvider()
+        key = (self.dataset_version, self.financial_provider.version)
+        if key != self._financial_table_key:
+            self._financial_table = self.financial_provider.get_table(self.get_scoring_table().index)
+            self._financial_table_key = key
+        return self._financial_table
+    
+    def match_preferences(self, preferences, financial_table=None, top_n=8, min_match=50):
+        """按投资偏好和财务要求匹配机会"""
+        return self.get_preference_matcher().match(preferences, financial_table, top_n=top_n, min_match=min_match)
+    
+    def match_profiles(self, profiles, financial_table=None, top_n=5, min_match=50):
+        """批量为客户偏好打分（例如每周推送）"""
+        return self.get_preference_matcher().match_batch(profiles, financial_table, top_n=top_n, min_match=min_match)
+    
+    def run_scenarios(self, n_scenarios=5000, top_k=3, **kwargs):
+        """蒙特卡洛情景分析：评估机会排名对权重和输入扰动的稳健性"""
+        from scenario import ScenarioEngine
+        
+        return ScenarioEngine(self.build_metric_matrix()).run(n_scenarios=n_scenarios, top_k=top_k, **kwargs)
+    
     def _normalize_score(self, value, min_val, max_val):
         """标准化分数到0-1范围"""
         if max_val - min_val == 0:
@@ -186,7 +562,8 @@ class PatentAnalyzer:
             risk_factors.append('low_growth')
         if metric['market_size'] < 50:
             risk_factors.append('small_market')
-        if metric['company_diversity'] < 3:
+        hhi = metric.get('applicant_hhi')
+        if metric['company_diversity'] < 3 or (hhi is not None and hhi > HHI_CONCENTRATED):
             risk_factors.append('concentrated_ownership')
         if metric['government_support'] < 40:
             risk_factors.append('low_government_support')
@@ -215,6 +592,7 @@ class PatentAnalyzer:
     
     def find_similar_areas(self, target_area, top_k=5):
         """找到相似的技术领域"""
+        target_area = self.canonical_area(target_area)
         if target_area not in self.tech_similarity_matrix.index:
             return []
         
@@ -255,11 +633,14 @@ class PatentAnalyzer:
             else:
                 return []
         
+        # 复用按数据集版本缓存的评分结果，避免每个领域都重新计算全部机会分数
+        ranked = self.rank_opportunities()
+        opportunity_scores = dict(zip(ranked['tech_area'], ranked['opportunity_score']))
+        
         content_scores = {}
         for area, collab_score in collaborative_recs:
-            area_opportunity = next((opp for opp in self.calculate_opportunity_scores() if opp['tech_area'] == area), None)
-            if area_opportunity:
-                content_score = area_opportunity['opportunity_score'] / 100
+            if area in opportunity_scores:
+                content_score = opportunity_scores[area] / 100
             else:
                 content_score = 0.5
             
@@ -270,13 +651,11 @@ class PatentAnalyzer:
     
     def recommend_investors(self, tech_area, max_investors=8):
         """推荐适合的投资者"""
-        area_data = self.df_patents[self.df_patents['tech_area'] == tech_area]
-        if len(area_data) == 0:
+        tech_area = self.canonical_area(tech_area)
+        profile = self._area_investor_profile(tech_area)
+        if profile is None:
             return []
-        
-        avg_quality = area_data['quality_score'].mean()
-        avg_commercial = area_data['commercial_viability'].mean()
-        maturity = area_data['tech_maturity'].mode()[0] if len(area_data['tech_maturity'].mode()) > 0 else 'Growth'
+        avg_quality, avg_commercial, maturity = profile
         
         recommendations = []
         
@@ -318,6 +697,44 @@ class PatentAnalyzer:
         
         return sorted(recommendations, key=lambda x: x['match_score'], reverse=True)[:max_investors]
     
+    def _area_investor_profile(self, tech_area):
+        """投资者匹配所需的领域概况：(平均质量, 平均商业可行性, 最常见成熟度)"""
+        area_data = self._area_data(tech_area)
+        if len(area_data) == 0:
+            return None
+        maturity = area_data['tech_maturity'].mode()
+        return (
+            area_data['quality_score'].mean(),
+            area_data['commercial_viability'].mean(),
+            maturity[0] if len(maturity) > 0 else 'Growth'
+        )
+    
+    def _area_investor_profiles(self, tech_areas):
+        """批量计算多个领域的投资者匹配概况（结果与逐个调用 _area_investor_profile 一致）"""
+        codes = pd.Series(self._area_codes(), index=self.df_patents.index, name='area_id')
+        means = self.df_patents[['quality_score', 'commercial_viability']].groupby(codes).mean()
+        # mode() 并列时取排序最小的取值
+        maturity_counts = self.df_patents.groupby([codes, self.df_patents['tech_maturity']]).size().reset_index(name='count')
+        modes = (maturity_counts.sort_values(['area_id', 'count', 'tech_maturity'], ascending=[True, False, True])
+                 .drop_duplicates('area_id').set_index('area_id')['tech_maturity'])
+        area_ids = [self.taxonomy.area_id(area) for area in tech_areas]
+        return [
+            (means.at[area_id, 'quality_score'], means.at[area_id, 'commercial_viability'], modes.get(area_id, 'Growth'))
+            if area_id in means.index else None
+            for area_id in area_ids
+        ]
+    
+    def allocate_investors(self, needs=None, df_investors=None, top_l=20, min_match=40,
+                           max_areas_per_investor=None, demand_ratio=1.0):
+        """在投资者资金容量和领域资金需求约束下把投资者分配到技术领域，最大化总匹配分数"""
+        from allocation import InvestorAllocator
+        
+        if needs is not None:
+            needs = {self.canonical_area(area): need for area, need in needs.items()}
+        allocator = InvestorAllocator(self, df_investors)
+        return allocator.allocate(needs, top_l=top_l, min_match=min_match,
+                                  max_areas_per_investor=max_areas_per_investor, demand_ratio=demand_ratio)
+    
     def _generate_investor_reasoning(self, match_score):
         """生成投资理由"""
         if match_score >= 80:
@@ -331,6 +748,7 @@ class PatentAnalyzer:
     
     def get_market_insights(self, tech_area):
         """获取市场洞察"""
+        tech_area = self.canonical_area(tech_area)
         market_data = self.df_market[self.df_market['tech_area'] == tech_area]
         if len(market_data) == 0:
             return None
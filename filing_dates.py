@@ -0,0 +1,19 @@
+# filing_dates.py
+"""申请日期解析：抓取水位、保留窗口和图表数据层共用"""
+import pandas as pd
+
+
+def parse_filing_dates(series):
+    """把申请日期列转换为 datetime64（已是日期类型则原样返回），无法解析的为 NaT"""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return pd.to_datetime(series, format='ISO8601', errors='coerce')
+
+
+def row_filing_dates(df):
+    """每行的申请日期：没有 filing_date 的退化为申请年份的1月1日"""
+    year_starts = pd.to_datetime(df['year'].astype('Int64').astype(str) + '-01-01', errors='coerce') \
+        if 'year' in df else pd.Series(pd.NaT, index=df.index)
+    if 'filing_date' not in df:
+        return year_starts
+    return parse_filing_dates(df['filing_date']).fillna(year_starts)
@@ -0,0 +1,132 @@
+# financials.py
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from taxonomy import get_taxonomy
+
+# 各技术领域的财务指标区间（模拟数据）
+FINANCIAL_PROFILES = {
+    'AI': {'gross_margin': (50, 80), 'net_margin': (20, 40), 'roi': (30, 100), 'payback': (2, 5)},
+    '区块链': {'gross_margin': (60, 90), 'net_margin': (25, 50), 'roi': (40, 120), 'payback': (1, 4)},
+    '生物科技': {'gross_margin': (40, 70), 'net_margin': (15, 35), 'roi': (25, 80), 'payback': (3, 8)},
+    '新能源': {'gross_margin': (35, 60), 'net_margin': (10, 25), 'roi': (20, 60), 'payback': (4, 10)},
+    '物联网': {'gross_margin': (45, 75), 'net_margin': (18, 38), 'roi': (28, 90), 'payback': (2, 6)},
+}
+
+DEFAULT_FINANCIAL_PROFILE = {'gross_margin': (40, 70), 'net_margin': (15, 30), 'roi': (25, 70), 'payback': (3, 7)}
+
+FINANCIAL_COLUMNS = ['gross_margin', 'net_margin', 'roi', 'payback_period']
+
+INVESTMENT_RECOMMENDATIONS = np.array([
+    "强烈推荐：财务指标优秀，盈利能力强，回收快",
+    "推荐投资：财务指标良好，投资回报可观",
+    "谨慎考虑：财务指标一般，需要关注运营效率",
+    "暂不推荐：财务指标未达投资标准"
+])
+
+
+def calculate_financial_score(df):
+    """向量化计算财务健康度分数"""
+    score = (
+        np.minimum(df['gross_margin'] * 0.25, 25) +
+        np.minimum(df['net_margin'] * 0.30, 30) +
+        np.minimum(df['roi'] / 2 * 0.25, 25) +
+        np.minimum((10 - df['payback_period']) * 2 * 0.20, 20)
+    )
+    return np.round(score, 1)
+
+
+def recommendation_category(df):
+    """向量化计算投资建议类别（0为最优，3为暂不推荐）"""
+    gross, net, roi, payback = df['gross_margin'], df['net_margin'], df['roi'], df['payback_period']
+    return np.select(
+        [
+            (gross >= 60) & (net >= 25) & (roi >= 50) & (payback <= 3),
+            (gross >= 45) & (net >= 15) & (roi >= 25) & (payback <= 5),
+            (gross >= 35) & (net >= 10) & (roi >= 20)
+        ],
+        [0, 1, 2],
+        default=3
+    )
+
+
+class FinancialMetricsProvider:
+    """确定性的领域财务指标表：按种子生成一次（或从文件加载），所有页面共享"""
+
+    SCHEMA_VERSION = 2
+
+    def __init__(self, seed=2024, profiles=None):
+        self.seed = seed
+        # 财务区间按规范领域名称索引（'区块链' -> FinTech，'生物科技' -> Biotechnology 等）
+        self.taxonomy = get_taxonomy()
+        profiles = profiles if profiles is not None else FINANCIAL_PROFILES
+        self.profiles = {self.taxonomy.canonical_area(area) or area: profile for area, profile in profiles.items()}
+        self.version = f'v{self.SCHEMA_VERSION}-seed{seed}'
+        self._table = pd.DataFrame(columns=['tech_area'] + FINANCIAL_COLUMNS)
+        self._loaded = False
+
+    @classmethod
+    def from_file(cls, path):
+        """从CSV或JSON文件加载财务指标表"""
+        if str(path).endswith('.json'):
+            table = pd.read_json(path)
+        else:
+            table = pd.read_csv(path)
+        missing = [c for c in ['tech_area'] + FINANCIAL_COLUMNS if c not in table]
+        if missing:
+            raise ValueError(f"财务指标文件缺少列: {missing}")
+        provider = cls()
+        table = table[['tech_area'] + FINANCIAL_COLUMNS].copy()
+        # 文件中的领域名可能是别名（'AI'、'区块链'），统一为 get_table 收到的规范名称；多个别名指向同一领域时保留第一行
+        table['tech_area'] = [provider.taxonomy.canonical_area(area) or area for area in table['tech_area']]
+        provider._table = table.drop_duplicates('tech_area').reset_index(drop=True)
+        provider._loaded = True
+        digest = pd.util.hash_pandas_object(provider._table, index=False).sum()
+        provider.version = f'file-{digest & 0xffffffff:08x}'
+        return provider
+
+    def save(self, path):
+        """保存财务指标表"""
+        table = self._table[['tech_area'] + FINANCIAL_COLUMNS]
+        if str(path).endswith('.json'):
+            table.to_json(path, orient='records', force_ascii=False)
+        else:
+            table.to_csv(path, index=False)
+
+    def _generate(self, tech_area):
+        """按 (种子, 领域名) 生成，新增领域不会改变已有领域的结果"""
+        rng = np.random.default_rng([self.seed, zlib.crc32(str(tech_area).encode('utf-8'))])
+        profile = self.profiles.get(self.taxonomy.canonical_area(tech_area), DEFAULT_FINANCIAL_PROFILE)
+        return {
+            'tech_area': tech_area,
+            'gross_margin': int(rng.integers(profile['gross_margin'][0], profile['gross_margin'][1] + 1)),
+            'net_margin': int(rng.integers(profile['net_margin'][0], profile['net_margin'][1] + 1)),
+            'roi': int(rng.integers(profile['roi'][0], profile['roi'][1] + 1)),
+            'payback_period': int(rng.integers(profile['payback'][0], profile['payback'][1] + 1))
+        }
+
+    def get_table(self, tech_areas):
+        """返回指定领域的财务指标表（含财务分数和建议类别）"""
+        known = set(self._table['tech_area'])
+        missing = [area for area in pd.unique(pd.Series(list(tech_areas), dtype=object)) if area not in known]
+        if missing and not self._loaded:
+            generated = pd.DataFrame([self._generate(area) for area in missing])
+            self._table = generated if len(self._table) == 0 else pd.concat([self._table, generated], ignore_index=True)
+
+        table = self._table[self._table['tech_area'].isin(list(tech_areas))].reset_index(drop=True)
+        if self._loaded and missing:
+            # 文件中没有的领域按默认区间补齐
+            fallback = pd.DataFrame([self._generate(area) for area in missing])
+            table = pd.concat([table, fallback], ignore_index=True)
+
+        table['financial_score'] = calculate_financial_score(table)
+        table['recommendation_category'] = recommendation_category(table)
+        table['investment_recommendation'] = INVESTMENT_RECOMMENDATIONS[table['recommendation_category']]
+        return table
+
+    def get_metrics(self, tech_area):
+        """单个领域的财务指标"""
+        row = self.get_table([tech_area]).iloc[0]
+        return {column: row[column] for column in FINANCIAL_COLUMNS}
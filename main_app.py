@@ -1,14 +1,11 @@
 # main_app.py
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import random
 from datetime import datetime
 
 # 导入我们写的模块
 from data_generation import generate_patent_data
-from engine import PatentAnalyzer
+from engine import PatentAnalyzer, SCORE_COMPONENTS
 
 # 设置页面
 st.set_page_config(
@@ -33,22 +30,6 @@ def get_investment_recommendation(opportunity_score, risk_level):
     else:
         return "建议谨慎投资或观望 (100万港币以下)"
 
-def generate_investment_recommendation(financial_data):
-    """生成投资建议"""
-    gross = financial_data['gross_margin']
-    net = financial_data['net_margin']
-    roi = financial_data['roi']
-    payback = financial_data['payback_period']
-    
-    if gross >= 60 and net >= 25 and roi >= 50 and payback <= 3:
-        return "强烈推荐：财务指标优秀，盈利能力强，回收快"
-    elif gross >= 45 and net >= 15 and roi >= 25 and payback <= 5:
-        return "推荐投资：财务指标良好，投资回报可观"
-    elif gross >= 35 and net >= 10 and roi >= 20:
-        return "谨慎考虑：财务指标一般，需要关注运营效率"
-    else:
-        return "暂不推荐：财务指标未达投资标准"
-
 # 侧边栏导航
 st.sidebar.title("导航")
 page = st.sidebar.radio("选择功能", [
@@ -56,43 +37,104 @@ page = st.sidebar.radio("选择功能", [
     "技术分析", 
     "趋势追踪",
     "个性化推荐",
-    "投资者匹配"
+    "投资者匹配",
+    "专利检索",
+    "专利浏览"
 ])
 
-def generate_financial_metrics(tech_area):
-    """为技术领域生成财务指标（模拟数据）"""
-    financial_profiles = {
-        'AI': {'gross_margin': (50, 80), 'net_margin': (20, 40), 'roi': (30, 100), 'payback': (2, 5)},
-        '区块链': {'gross_margin': (60, 90), 'net_margin': (25, 50), 'roi': (40, 120), 'payback': (1, 4)},
-        '生物科技': {'gross_margin': (40, 70), 'net_margin': (15, 35), 'roi': (25, 80), 'payback': (3, 8)},
-        '新能源': {'gross_margin': (35, 60), 'net_margin': (10, 25), 'roi': (20, 60), 'payback': (4, 10)},
-        '物联网': {'gross_margin': (45, 75), 'net_margin': (18, 38), 'roi': (28, 90), 'payback': (2, 6)},
-    }
-    
-    profile = financial_profiles.get(tech_area, {'gross_margin': (40, 70), 'net_margin': (15, 30), 'roi': (25, 70), 'payback': (3, 7)})
-    
-    import random
-    return {
-        'gross_margin': random.randint(profile['gross_margin'][0], profile['gross_margin'][1]),
-        'net_margin': random.randint(profile['net_margin'][0], profile['net_margin'][1]),
-        'roi': random.randint(profile['roi'][0], profile['roi'][1]),
-        'payback_period': random.randint(profile['payback'][0], profile['payback'][1])
-    }
-
-# 加载数据和分析器
-@st.cache_data
+# 加载数据和分析器（使用cache_resource共享同一个分析器实例，保留其内部缓存）
+@st.cache_resource
 def load_data():
     df_patents, df_market, df_investors = generate_patent_data(8000)
     analyzer = PatentAnalyzer(df_patents, df_market, df_investors)
     return df_patents, df_market, df_investors, analyzer
 
+@st.cache_resource
+def get_score_history(directory='score_history'):
+    """评分历史存储；每次查询时会自动加载其他进程新追加的运行"""
+    from score_history import ScoreHistoryStore
+    return ScoreHistoryStore(directory)
+
+@st.cache_resource
+def get_memory_monitor():
+    from memory_profile import MemoryMonitor
+    return MemoryMonitor(report_path='memory_report.json')
+
 df_patents, df_market, df_investors, analyzer = load_data()
 
+with st.sidebar.expander("🛠️ 管理员: 内存监控"):
+    from memory_profile import process_rss
+    
+    memory_monitor = get_memory_monitor()
+    rss = memory_monitor.record()
+    peak = process_rss()[1]
+    trend = memory_monitor.trend()
+    st.metric("进程内存 (RSS)", f"{rss / 2 ** 20:.0f} MB" if rss else "未知",
+              delta=f"{trend['growth_mb']:+.1f} MB" if trend['samples'] > 1 else None, delta_color="inverse")
+    if peak:
+        st.caption(f"峰值 {peak / 2 ** 20:.0f} MB · 趋势 {trend['slope_mb_per_hour']:+.1f} MB/小时")
+    if trend['samples'] > 1:
+        st.line_chart(trend['history_mb'], height=120)
+    
+    # 深度统计需要遍历所有缓存对象，只在勾选时计算
+    if st.checkbox("统计各数据结构内存"):
+        history_store = get_score_history()
+        memory_report = memory_monitor.report(analyzer, extra={'score_history': history_store})
+        sizes = {f"{name} ({frame['rows']}行)": frame['bytes'] for name, frame in memory_report['frames'].items()}
+        sizes.update(memory_report['structures'])
+        st.dataframe(pd.DataFrame({'结构': list(sizes), 'MB': [round(b / 2 ** 20, 2) for b in sizes.values()]}),
+                     hide_index=True, use_container_width=True)
+        st.caption(f"已统计 {memory_report['tracked_mb']:.1f} MB")
+        
+        patent_columns = memory_report['frames']['df_patents']['columns']
+        top_columns = sorted(patent_columns.items(), key=lambda item: item[1], reverse=True)[:5]
+        st.caption("df_patents 占用最多的列: " + ", ".join(f"{c} {b / 2 ** 20:.1f}MB" for c, b in top_columns))
+        if st.button("写出内存报告 (JSON)"):
+            memory_monitor.write_report(analyzer=analyzer, extra={'score_history': history_store})
+            st.success(f"已写入 {memory_monitor.report_path}")
+
 if page == "机会发现":
     st.header("技术投资机会发现")
     
+    with st.expander("⚙️ 自定义评分权重与筛选"):
+        weight_labels = {
+            'growth_score': '专利增长', 'market_score': '市场增长', 'size_score': '市场规模',
+            'quality_score': '专利质量', 'commercial_score': '商业潜力', 'attractiveness_score': '投资吸引力',
+            'competition_score': '竞争程度', 'government_score': '政府支持'
+        }
+        custom_weights = {}
+        weight_cols = st.columns(4)
+        for i, (name, *_, default_weight) in enumerate(SCORE_COMPONENTS):
+            with weight_cols[i % 4]:
+                custom_weights[name] = st.slider(weight_labels[name], 0.0, 0.5, float(default_weight), 0.05, key=f"weight_{name}")
+        
+        # 标准化区间：指标（换算后）在 [最小值, 最大值] 内线性映射到 0~1，区间外截断；只把改动过的区间传给分析器
+        custom_ranges = {}
+        if st.checkbox("自定义标准化区间"):
+            range_cols = st.columns(4)
+            for i, (name, _, _, _, default_min, default_max, _) in enumerate(SCORE_COMPONENTS):
+                with range_cols[i % 4]:
+                    st.caption(weight_labels[name])
+                    min_val = st.number_input("最小值", value=float(default_min), step=1.0, key=f"range_min_{name}")
+                    max_val = st.number_input("最大值", value=float(default_max), step=1.0, key=f"range_max_{name}")
+                if max_val <= min_val:
+                    st.warning(f"{weight_labels[name]}的最大值必须大于最小值，已使用默认区间")
+                elif (min_val, max_val) != (default_min, default_max):
+                    custom_ranges[name] = (min_val, max_val)
+        
+        filter_col1, filter_col2 = st.columns(2)
+        with filter_col1:
+            risk_filter = st.multiselect("风险等级", ['Low', 'Medium', 'Medium-High', 'High'])
+        with filter_col2:
+            min_market_filter = st.number_input("最低市场规模 (亿)", min_value=0, value=0, step=10)
+    
     with st.spinner('正在分析技术投资机会...'):
-        opportunities = analyzer.calculate_opportunity_scores()
+        opportunities = analyzer.rank_opportunities(
+            weights=custom_weights,
+            ranges=custom_ranges or None,
+            risk_levels=risk_filter or None,
+            min_market_size=min_market_filter or None
+        ).to_dict('records')
     
     st.subheader("机会排行榜")
     
@@ -119,38 +161,48 @@ if page == "机会发现":
             similar_areas = analyzer.find_similar_areas(opp['tech_area'])
             if similar_areas:
                 st.write("相关领域:", ", ".join([f"{area}({sim:.2f})" for area, sim in similar_areas]))
+    
+    st.subheader("排名稳健性分析")
+    with st.expander("蒙特卡洛情景分析"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            n_scenarios = st.select_slider("情景数量", options=[1000, 5000, 10000, 50000], value=5000)
+        with col2:
+            input_noise = st.slider("输入扰动幅度", 0.0, 0.5, 0.1, 0.05, help="对各项原始指标施加的对数正态扰动标准差")
+        with col3:
+            scenario_top_k = st.slider("Top-K", 1, 5, 3)
+        
+        if st.button("运行情景分析"):
+            with st.spinner('正在评估排名稳健性...'):
+                scenario_summary = analyzer.run_scenarios(
+                    n_scenarios=n_scenarios, top_k=scenario_top_k, input_noise=input_noise, seed=42
+                )
+            st.dataframe(scenario_summary, use_container_width=True)
 
 elif page == "技术分析":
+    import plotly.io as pio  # 只在需要绘图的页面加载Plotly
+    from chart_data import GRANULARITY_LABELS
+    
     st.header("技术领域深度分析")
     
     selected_area = st.selectbox("选择技术领域", df_patents['tech_area'].unique())
+    granularity = st.radio("时间粒度", list(GRANULARITY_LABELS), format_func=GRANULARITY_LABELS.get, horizontal=True)
+    chart_data = analyzer.get_chart_data()
     
     if selected_area:
         col1, col2 = st.columns(2)
         
         with col1:
             area_data = df_patents[df_patents['tech_area'] == selected_area]
-            yearly_counts = area_data.groupby('year').size().reset_index()
-            yearly_counts.columns = ['Year', 'Patent Count']
-            
-            if len(yearly_counts) > 1:
-                fig1 = px.line(yearly_counts, x='Year', y='Patent Count', 
-                              title=f'{selected_area} - 年度专利趋势',
-                              markers=True)
-                fig1.update_traces(line=dict(width=3))
-                st.plotly_chart(fig1, use_container_width=True)
+            if area_data['year'].nunique() > 1:
+                st.plotly_chart(pio.from_json(chart_data.area_trend_figure(selected_area, granularity)),
+                                use_container_width=True)
             else:
                 st.info("该领域专利数据不足，无法显示趋势")
         
         with col2:
-            market_data = df_market[df_market['tech_area'] == selected_area]
-            if len(market_data) > 0:
-                market_data = market_data.sort_values('year')
-                fig2 = px.line(market_data, x='year', y='growth_rate',
-                              title=f'{selected_area} - 市场增长率',
-                              labels={'year': '年份', 'growth_rate': '增长率'})
-                fig2.update_traces(line=dict(color='green', width=3))
-                st.plotly_chart(fig2, use_container_width=True)
+            if (df_market['tech_area'] == selected_area).any():
+                st.plotly_chart(pio.from_json(chart_data.market_growth_figure(selected_area)), use_container_width=True)
             else:
                 st.info("该领域市场数据不足")
         
@@ -172,18 +224,41 @@ elif page == "技术分析":
         with col6:
             market_potential = area_data['market_potential'].mean()
             st.metric("市场潜力", f"{market_potential:.1f}")
+        
+        st.subheader("指标分布 (P50 / P90)")
+        area_sketches = analyzer.get_area_sketches()
+        dist_cols = st.columns(len(area_sketches.QUANTILE_COLUMNS))
+        dist_labels = {'quality_score': '质量评分', 'citations': '引用数', 'market_potential': '市场潜力'}
+        for dist_col, column in zip(dist_cols, area_sketches.QUANTILE_COLUMNS):
+            p50, p90 = area_sketches.quantiles(selected_area, column)
+            with dist_col:
+                st.metric(f"{dist_labels[column]} P50", f"{p50:.1f}")
+                st.metric(f"{dist_labels[column]} P90", f"{p90:.1f}")
+        
+        st.subheader("申请人生态")
+        applicant_graph = analyzer.get_applicant_graph()
+        concentration = applicant_graph.concentration()
+        if selected_area in concentration.index:
+            area_structure = concentration.loc[selected_area]
+            eco_cols = st.columns(4)
+            eco_cols[0].metric("集中度 (HHI)", f"{area_structure['hhi']:.3f}")
+            eco_cols[1].metric("等效申请人数", f"{area_structure['effective_applicants']:.1f}")
+            eco_cols[2].metric("前三申请人份额", f"{area_structure['cr3']:.1%}")
+            eco_cols[3].metric("研究机构占比", f"{area_structure['research_share']:.1%}")
+            central = applicant_graph.pagerank(selected_area).nlargest(8)
+            st.write("共现网络中心性最高的申请人: " + "，".join(f"{name} ({score:.3f})" for name, score in central.items()))
 
 elif page == "趋势追踪":
+    import plotly.io as pio
+    
     st.header("市场趋势追踪")
     
     st.subheader("技术领域增长对比")
+    chart_data = analyzer.get_chart_data()
     
     growth_data = []
+    metrics = analyzer.calculate_growth_metrics()
     for area in df_patents['tech_area'].unique():
-        area_data = df_patents[df_patents['tech_area'] == area]
-        market_data = df_market[df_market['tech_area'] == area]
-        
-        metrics = analyzer.calculate_growth_metrics()
         if area in metrics:
             patent_growth = metrics[area]['cagr']
             market_growth = metrics[area]['market_growth']
@@ -200,12 +275,23 @@ elif page == "趋势追踪":
     
     growth_df = pd.DataFrame(growth_data)
     
-    fig = px.bar(growth_df, x='Tech Area', y=['Patent Growth', 'Market Growth'],
-                 title="技术领域增长对比", barmode='group')
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(pio.from_json(chart_data.growth_comparison_figure(growth_df)), use_container_width=True)
     
     st.subheader("详细增长数据")
     st.dataframe(growth_df)
+    
+    st.subheader("机会分数历史")
+    history = get_score_history()
+    if len(history.runs()) == 0:
+        st.info("暂无评分历史，实时更新或批量评分（--history）运行后将在此显示分数走势")
+    else:
+        st.plotly_chart(pio.from_json(chart_data.score_history_figure(history)), use_container_width=True)
+        
+        if len(history.runs()) > 1:
+            st.write("最近一次评分的最大变动:")
+            movers = history.biggest_movers(n=5)
+            st.dataframe(movers[['tech_area', 'rank', 'previous_rank', 'rank_change', 'opportunity_score', 'score_change']],
+                         use_container_width=True)
 
 elif page == "个性化推荐":
     st.header("🎯 智能投资推荐系统")
@@ -261,163 +347,26 @@ elif page == "个性化推荐":
             min_roi_consistency = st.slider("最低ROI稳定性 (%)", 50, 100, 70, 
                                            help="预期ROI实现的概率")
     
-    # 风险偏好映射
-    risk_mapping = {
-        '非常保守': {'max_risk': '低风险', 'min_net_margin': 20, 'min_roi': 20},
-        '保守': {'max_risk': '低风险', 'min_net_margin': 15, 'min_roi': 18},
-        '适中': {'max_risk': '中风险', 'min_net_margin': 12, 'min_roi': 15},
-        '积极': {'max_risk': '中风险', 'min_net_margin': 8, 'min_roi': 12},
-        '非常积极': {'max_risk': '高风险', 'min_net_margin': 5, 'min_roi': 10}
-    }
-    
-    # 投资规模映射
-    size_mapping = {
-        '天使轮 (5-20M)': {'min_market_size': 30, 'max_payback_bonus': 8},
-        'A轮 (20-50M)': {'min_market_size': 50, 'max_payback_bonus': 6},
-        'B轮 (50-100M)': {'min_market_size': 80, 'max_payback_bonus': 5},
-        'C轮及以上 (100M+)': {'min_market_size': 120, 'max_payback_bonus': 4}
-    }
-    
     if st.button("🎯 生成智能推荐", type="primary", use_container_width=True):
         with st.spinner('正在分析最佳投资机会...'):
-            # 获取所有机会
-            def calculate_financial_score(financial_data):
-                """计算财务健康度分数"""
-                score = 0
-                # 毛利润率权重25%
-                score += min(financial_data['gross_margin'] * 0.25, 25)
-                # 净利润率权重30%
-                score += min(financial_data['net_margin'] * 0.30, 30)
-                # ROI权重25%（除以2避免数值过大）
-                score += min(financial_data['roi'] / 2 * 0.25, 25)
-                # 回收期权重20%（回收期越短分数越高）
-                score += min((10 - financial_data['payback_period']) * 2 * 0.20, 20)
-                
-                return round(score, 1)
-
-            opportunities = analyzer.calculate_opportunity_scores()
-            
-            # 为每个机会添加财务指标
-            financial_opportunities = []
-            for opp in opportunities:
-                financial_data = generate_financial_metrics(opp['tech_area'])
-                financial_opp = {
-                    **opp,
-                    **financial_data,
-                    'financial_score': calculate_financial_score(financial_data),
-                    'investment_recommendation': generate_investment_recommendation(financial_data)
-                }
-                financial_opportunities.append(financial_opp)
-            
-            # 筛选和评分
-            filtered_opps = []
-            risk_profile = risk_mapping[risk_tolerance]
-            size_profile = size_mapping[investment_size]
-            
-            for opp in financial_opportunities:
-                match_score = 0
-                total_weight = 0
-                reasoning = []
-                
-                # 1. 财务指标匹配 (权重40%)
-                financial_match = 0
-                if opp['roi'] >= min_roi:
-                    financial_match += 25
-                    reasoning.append(f"ROI {opp['roi']}% 达标")
-                else:
-                    reasoning.append(f"ROI {opp['roi']}% 未达{min_roi}%要求")
-                
-                if opp['payback_period'] <= max_payback:
-                    financial_match += 25
-                    reasoning.append(f"回收期{opp['payback_period']}年符合要求")
-                else:
-                    reasoning.append(f"回收期{opp['payback_period']}年超过{max_payback}年限制")
-                
-                if opp['gross_margin'] >= min_gross_margin:
-                    financial_match += 25
-                    reasoning.append(f"毛利率{opp['gross_margin']}% 达标")
-                else:
-                    reasoning.append(f"毛利率{opp['gross_margin']}% 未达{min_gross_margin}%要求")
-                
-                if opp['net_margin'] >= min_net_margin:
-                    financial_match += 25
-                    reasoning.append(f"净利率{opp['net_margin']}% 达标")
-                else:
-                    reasoning.append(f"净利率{opp['net_margin']}% 未达{min_net_margin}%要求")
-                
-                match_score += financial_match * 0.4
-                total_weight += 40
-                
-                # 2. 风险偏好匹配 (权重20%)
-                risk_bonus = 0
-                if (opp['risk_level'] in ['低风险'] and risk_profile['max_risk'] == '低风险') or \
-                   (opp['risk_level'] in ['低风险', '中风险'] and risk_profile['max_risk'] == '中风险') or \
-                   (risk_profile['max_risk'] == '高风险'):
-                    risk_bonus = 20
-                    reasoning.append("风险等级匹配")
-                else:
-                    reasoning.append(f"风险等级{opp['risk_level']}不符合要求")
-                
-                match_score += risk_bonus
-                total_weight += 20
-                
-                # 3. 市场规模匹配 (权重15%)
-                if opp['market_size'] >= size_profile['min_market_size']:
-                    match_score += 15
-                    reasoning.append(f"市场规模{opp['market_size']}亿符合要求")
-                else:
-                    reasoning.append(f"市场规模{opp['market_size']}亿偏小")
-                total_weight += 15
-                
-                # 4. 领域偏好匹配 (权重15%)
-                if not preferred_areas or opp['tech_area'] in preferred_areas:
-                    match_score += 15
-                    reasoning.append("技术领域匹配")
-                else:
-                    reasoning.append("技术领域不匹配")
-                total_weight += 15
-                
-                # 5. 投资期限匹配 (权重10%)
-                horizon_bonus = 0
-                if investment_horizon == '短期 (1-2年)' and opp['payback_period'] <= 2:
-                    horizon_bonus = 10
-                elif investment_horizon == '中期 (3-5年)' and opp['payback_period'] <= 5:
-                    horizon_bonus = 10
-                elif investment_horizon == '长期 (5年以上)':
-                    horizon_bonus = 10
-                
-                if horizon_bonus > 0:
-                    reasoning.append("投资期限匹配")
-                else:
-                    reasoning.append("投资期限不匹配")
-                
-                match_score += horizon_bonus
-                total_weight += 10
-                
-                # 计算最终匹配度
-                final_match_percentage = (match_score / total_weight) * 100
-                
-                # 机会质量加成（基于原始机会分数）
-                quality_bonus = opp['opportunity_score'] * 0.1
-                final_match_percentage = min(final_match_percentage + quality_bonus, 100)
-                
-                if final_match_percentage >= 50:  # 匹配度50%以上的机会
-                    opp['match_percentage'] = final_match_percentage
-                    opp['match_reasoning'] = reasoning
-                    filtered_opps.append(opp)
+            preferences = {
+                'risk_tolerance': risk_tolerance,
+                'investment_horizon': investment_horizon,
+                'investment_size': investment_size,
+                'preferred_areas': preferred_areas,
+                'min_roi': min_roi,
+                'max_payback': max_payback,
+                'min_gross_margin': min_gross_margin,
+                'min_net_margin': min_net_margin
+            }
+            match_result = analyzer.match_preferences(preferences, top_n=8)
+            filtered_opps = match_result['matches'].to_dict('records')
             
             if filtered_opps:
-                # 按匹配度和机会分数综合排序
-                filtered_opps = sorted(
-                    filtered_opps, 
-                    key=lambda x: (x['match_percentage'] * 0.6 + x['opportunity_score'] * 0.4), 
-                    reverse=True
-                )
-                
-                st.success(f"找到 {len(filtered_opps)} 个匹配的投资机会")
+                st.success(f"找到 {match_result['total_matches']} 个匹配的投资机会")
                 
                 # 显示推荐结果
-                for i, opp in enumerate(filtered_opps[:8]):
+                for i, opp in enumerate(filtered_opps):
                     with st.container():
                         # 创建卡片式布局
                         st.markdown(f"### 🎯 {i+1}. {opp['tech_area']}")
@@ -447,7 +396,7 @@ elif page == "个性化推荐":
                             st.progress(opp['match_percentage'] / 100)
                         with col_c:
                             st.write("风险适配度")
-                            risk_progress = 0.8 if opp['risk_level'] == '低风险' else 0.6 if opp['risk_level'] == '中风险' else 0.4
+                            risk_progress = 0.8 if opp['risk_tier'] == 0 else 0.6 if opp['risk_tier'] == 1 else 0.4
                             st.progress(risk_progress)
                         
                         # 详细分析
@@ -517,7 +466,8 @@ elif page == "个性化推荐":
                 
                 # 显示部分高潜力机会作为参考
                 st.info("以下是一些高潜力机会供您参考:")
-                high_potential = sorted(financial_opportunities, key=lambda x: x['opportunity_score'], reverse=True)[:3]
+                financial_opportunities = analyzer.get_preference_matcher().build_table()
+                high_potential = financial_opportunities.nlargest(3, 'opportunity_score').to_dict('records')
                 
                 for opp in high_potential:
                     with st.container():
@@ -525,57 +475,6 @@ elif page == "个性化推荐":
                         st.write(f"投资建议: {opp['investment_recommendation']}")
                         st.progress(opp['opportunity_score'] / 100)
     
-    # 财务分析辅助函数（放在页面底部）
-    def generate_financial_metrics(tech_area):
-        """为技术领域生成财务指标（模拟数据）"""
-        financial_profiles = {
-            'AI': {'gross_margin': (50, 80), 'net_margin': (20, 40), 'roi': (30, 100), 'payback': (2, 5)},
-            '区块链': {'gross_margin': (60, 90), 'net_margin': (25, 50), 'roi': (40, 120), 'payback': (1, 4)},
-            '生物科技': {'gross_margin': (40, 70), 'net_margin': (15, 35), 'roi': (25, 80), 'payback': (3, 8)},
-            '新能源': {'gross_margin': (35, 60), 'net_margin': (10, 25), 'roi': (20, 60), 'payback': (4, 10)},
-            '物联网': {'gross_margin': (45, 75), 'net_margin': (18, 38), 'roi': (28, 90), 'payback': (2, 6)},
-        }
-        
-        profile = financial_profiles.get(tech_area, {'gross_margin': (40, 70), 'net_margin': (15, 30), 'roi': (25, 70), 'payback': (3, 7)})
-        
-        import random
-        return {
-            'gross_margin': random.randint(profile['gross_margin'][0], profile['gross_margin'][1]),
-            'net_margin': random.randint(profile['net_margin'][0], profile['net_margin'][1]),
-            'roi': random.randint(profile['roi'][0], profile['roi'][1]),
-            'payback_period': random.randint(profile['payback'][0], profile['payback'][1])
-        }
-
-    def calculate_financial_score(financial_data):
-        """计算财务健康度分数"""
-        score = 0
-        # 毛利润率权重25%
-        score += min(financial_data['gross_margin'] * 0.25, 25)
-        # 净利润率权重30%
-        score += min(financial_data['net_margin'] * 0.30, 30)
-        # ROI权重25%（除以2避免数值过大）
-        score += min(financial_data['roi'] / 2 * 0.25, 25)
-        # 回收期权重20%（回收期越短分数越高）
-        score += min((10 - financial_data['payback_period']) * 2 * 0.20, 20)
-        
-        return round(score, 1)
-
-    def generate_investment_recommendation(financial_data):
-        """生成投资建议"""
-        gross = financial_data['gross_margin']
-        net = financial_data['net_margin']
-        roi = financial_data['roi']
-        payback = financial_data['payback_period']
-        
-        if gross >= 60 and net >= 25 and roi >= 50 and payback <= 3:
-            return "强烈推荐：财务指标优秀，盈利能力强，回收快"
-        elif gross >= 45 and net >= 15 and roi >= 25 and payback <= 5:
-            return "推荐投资：财务指标良好，投资回报可观"
-        elif gross >= 35 and net >= 10 and roi >= 20:
-            return "谨慎考虑：财务指标一般，需要关注运营效率"
-        else:
-            return "暂不推荐：财务指标未达投资标准"
-
 elif page == "投资者匹配":
     st.header("投资者智能匹配")
     
@@ -641,6 +540,114 @@ elif page == "投资者匹配":
                             st.divider()
             else:
                 st.warning("未找到匹配的推荐领域")
+    
+    st.subheader("资金分配方案")
+    st.caption("在投资者资金容量（按投资规模上限）和各领域资金需求（按机会分数分摊总容量）的约束下，最大化总匹配分数")
+    alloc_col1, alloc_col2 = st.columns(2)
+    with alloc_col1:
+        max_areas = st.slider("每个投资者最多投资领域数", 1, 5, 2)
+    with alloc_col2:
+        demand_ratio = st.slider("资金需求 / 总容量", 0.5, 2.0, 1.0, 0.1)
+    allocation = analyzer.allocate_investors(max_areas_per_investor=max_areas, demand_ratio=demand_ratio)
+    st.dataframe(allocation['areas'].round(1).rename(columns={
+        'tech_area': '技术领域', 'opportunity_score': '机会分数', 'need': '资金需求(M)', 'allocated': '已分配(M)',
+        'fill_rate': '满足率', 'investors': '投资者数'}), hide_index=True, use_container_width=True)
+    if selected_investor:
+        investor_allocations = allocation['allocations'][allocation['allocations']['investor_name'] == selected_investor]
+        if len(investor_allocations):
+            st.write(f"{selected_investor} 的分配: " + "，".join(
+                f"{row.tech_area} {row.amount:.1f}M (匹配 {row.match_score})" for row in investor_allocations.itertuples()))
+        else:
+            st.write(f"{selected_investor} 在当前方案中未被分配")
+
+elif page == "专利检索":
+    st.header("🔎 专利全文检索")
+    
+    query = st.text_input("检索词", placeholder='例如: blockchain payment 或 "deep learning"',
+                          help="双引号内的内容按短语匹配，结果按BM25相关度排序")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        search_areas = st.multiselect("技术领域", options=sorted(df_patents['tech_area'].unique()))
+    with col2:
+        year_min, year_max = int(df_patents['year'].min()), int(df_patents['year'].max())
+        search_years = st.slider("年份范围", year_min, year_max, (year_min, year_max)) if year_min < year_max else None
+    with col3:
+        search_applicants = st.multiselect("申请人", options=sorted(df_patents['applicant'].unique()))
+    
+    top_k = st.slider("返回结果数", 10, 200, 50)
+    
+    if query:
+        with st.spinner('正在检索...'):
+            results = analyzer.search_patents(
+                query,
+                top_k=top_k,
+                tech_area=search_areas or None,
+                year=search_years,
+                applicant=search_applicants or None
+            )
+        
+        if len(results) > 0:
+            st.success(f"找到 {len(results)} 条相关专利")
+            st.dataframe(results, use_container_width=True)
+            
+            st.subheader("更多类似专利")
+            selected_patent = st.selectbox("选择专利", results['patent_id'].tolist())
+            if selected_patent:
+                similar = analyzer.find_similar_patents(selected_patent, top_k=10)
+                similar_df = pd.DataFrame(similar, columns=['patent_id', 'similarity'])
+                similar_df = similar_df.merge(df_patents[['patent_id', 'title', 'tech_area', 'year']].drop_duplicates('patent_id'), on='patent_id', how='left')
+                st.dataframe(similar_df, use_container_width=True)
+        else:
+            st.warning("未找到匹配的专利")
+
+elif page == "专利浏览":
+    st.header("📚 专利浏览")
+    
+    query_index = analyzer.get_query_index()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        browse_areas = st.multiselect("技术领域", options=query_index.category_values('tech_area'))
+        browse_status = st.multiselect("法律状态", options=query_index.category_values('legal_status'))
+    with col2:
+        subcategory_options = query_index.category_values('subcategory')
+        if browse_areas:
+            subcategory_options = sorted(df_patents.loc[df_patents['tech_area'].isin(browse_areas), 'subcategory'].unique())
+        browse_subcategories = st.multiselect("细分方向", options=subcategory_options)
+        browse_maturity = st.multiselect("技术成熟度", options=query_index.category_values('tech_maturity'))
+    with col3:
+        year_min, year_max = (int(v) for v in query_index.value_range('year'))
+        browse_years = st.slider("申请年份", year_min, year_max, (year_min, year_max), key="browse_years") if year_min < year_max else None
+        browse_quality = st.slider("质量评分", 0.0, 100.0, (0.0, 100.0), 1.0)
+        browse_potential = st.slider("市场潜力", 0, 100, (0, 100))
+    
+    sort_labels = {'quality_score': '质量评分', 'market_potential': '市场潜力', 'commercial_viability': '商业可行性',
+                   'citations': '引用数', 'year': '申请年份'}
+    col4, col5, col6 = st.columns(3)
+    with col4:
+        sort_by = st.selectbox("排序", list(sort_labels), format_func=sort_labels.get)
+    with col5:
+        ascending = st.radio("顺序", ["降序", "升序"], horizontal=True) == "升序"
+    with col6:
+        page_size = st.selectbox("每页条数", [25, 50, 100, 200], index=1)
+    
+    filters = {
+        'tech_area': browse_areas,
+        'subcategory': browse_subcategories,
+        'legal_status': browse_status,
+        'tech_maturity': browse_maturity,
+        'year': browse_years,
+        'quality_score': browse_quality if browse_quality != (0.0, 100.0) else None,
+        'market_potential': browse_potential if browse_potential != (0, 100) else None
+    }
+    matched_rows = query_index.filter_rows(filters)
+    total = query_index.size if matched_rows is None else len(matched_rows)
+    total_pages = max(1, -(-total // page_size))
+    page_number = st.number_input(f"页码 (共 {total_pages} 页)", min_value=1, max_value=total_pages, value=1, step=1)
+    
+    result = analyzer.query_patents(filters, sort_by=sort_by, ascending=ascending, page=int(page_number), page_size=page_size)
+    st.caption(f"共 {result['total']:,} 条专利 · 第 {result['page']} / {result['pages']} 页")
+    st.dataframe(result['rows'], use_container_width=True, hide_index=True)
 
 # 页脚
 st.markdown("---")
@@ -649,34 +656,39 @@ st.markdown("IP机会发现平台 · 基于人工智能的技术投资分析工
 # 修改导入部分
 from data_fetcher import NoKeyDataFetcher  # 替换原来的 DataFetcher
 from data_updater import RealTimeUpdater
+from dedup import PatentDeduplicator
 
 # 修改数据加载部分
-@st.cache_data
+@st.cache_resource
 def load_data():
     # 使用无需密钥的数据获取器
     fetcher = NoKeyDataFetcher()
+    try:
+        # 生成专利数据（去除跨数据源的重复专利）
+        deduplicator = PatentDeduplicator()
+        all_patents = []
+        for area in fetcher.tech_areas:
+            area_patents = deduplicator.deduplicate(fetcher.fetch_patent_data(area))
+            all_patents.append(area_patents)
+        df_patents = pd.concat(all_patents, ignore_index=True)
     
-    # 生成专利数据
-    all_patents = []
-    for area in fetcher.tech_areas:
-        area_patents = fetcher.fetch_patent_data(area)
-        all_patents.append(area_patents)
-    df_patents = pd.concat(all_patents, ignore_index=True)
-    
-    # 生成市场数据
-    market_data = []
-    for area in fetcher.tech_areas:
-        data = fetcher.fetch_market_data(area)
-        data['tech_area'] = area
-        data['year'] = datetime.now().year
-        market_data.append(data)
-    df_market = pd.DataFrame(market_data)
-    
-    # 生成投资者数据
-    df_investors = fetcher.fetch_investment_data()
+        # 生成市场数据
+        market_data = []
+        for area in fetcher.tech_areas:
+            data = fetcher.fetch_market_data(area)
+            data['tech_area'] = area
+            data['year'] = datetime.now().year
+            market_data.append(data)
+        df_market = pd.DataFrame(market_data)
     
-    analyzer = PatentAnalyzer(df_patents, df_market, df_investors)
-    return df_patents, df_market, df_investors, analyzer
+        # 生成投资者数据
+        df_investors = fetcher.fetch_investment_data()
+    
+        analyzer = PatentAnalyzer(df_patents, df_market, df_investors)
+        return df_patents, df_market, df_investors, analyzer
+    finally:
+        # 获取器只用于初次加载，用完即关闭容错调用器的线程池
+        fetcher.close()
 
 # 在侧边栏添加数据源说明
 with st.sidebar:
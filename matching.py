@@ -0,0 +1,245 @@
+# matching.py
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from financials import FINANCIAL_COLUMNS, INVESTMENT_RECOMMENDATIONS, calculate_financial_score, recommendation_category
+from taxonomy import get_taxonomy
+
+# 风险偏好映射
+RISK_MAPPING = {
+    '非常保守': {'max_risk': '低风险', 'min_net_margin': 20, 'min_roi': 20},
+    '保守': {'max_risk': '低风险', 'min_net_margin': 15, 'min_roi': 18},
+    '适中': {'max_risk': '中风险', 'min_net_margin': 12, 'min_roi': 15},
+    '积极': {'max_risk': '中风险', 'min_net_margin': 8, 'min_roi': 12},
+    '非常积极': {'max_risk': '高风险', 'min_net_margin': 5, 'min_roi': 10}
+}
+
+# 投资规模映射
+SIZE_MAPPING = {
+    '天使轮 (5-20M)': {'min_market_size': 30, 'max_payback_bonus': 8},
+    'A轮 (20-50M)': {'min_market_size': 50, 'max_payback_bonus': 6},
+    'B轮 (50-100M)': {'min_market_size': 80, 'max_payback_bonus': 5},
+    'C轮及以上 (100M+)': {'min_market_size': 120, 'max_payback_bonus': 4}
+}
+
+# 投资期限对应的最长回收期
+HORIZON_MAX_PAYBACK = {
+    '短期 (1-2年)': 2,
+    '中期 (3-5年)': 5,
+    '长期 (5年以上)': np.inf
+}
+
+# 分析器的风险等级与偏好中的风险档位
+RISK_TIERS = {'Low': 0, 'Medium': 1, 'Medium-High': 2, 'High': 3}
+MAX_RISK_TIERS = {'低风险': 0, '中风险': 1, '高风险': 3}
+
+DEFAULT_PREFERENCES = {
+    'risk_tolerance': '适中',
+    'investment_horizon': '中期 (3-5年)',
+    'investment_size': 'A轮 (20-50M)',
+    'preferred_areas': (),
+    'min_roi': 25,
+    'max_payback': 5,
+    'min_gross_margin': 40,
+    'min_net_margin': 15
+}
+
+
+def normalize_preferences(preferences):
+    """补全默认值并转换为可哈希的元组，用作缓存键"""
+    merged = {**DEFAULT_PREFERENCES, **(preferences or {})}
+    merged['preferred_areas'] = tuple(sorted(merged['preferred_areas'] or ()))
+    return tuple(sorted(merged.items()))
+
+
+class PreferenceMatcher:
+    """个性化推荐：在 机会 × 财务指标 表上用向量化掩码评估投资偏好"""
+
+    CACHE_SIZE = 128
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self._table = None
+        self._table_key = None
+        # 匹配器随分析器在会话间共享：合并表的重建和结果缓存的查找/插入在锁内进行
+        self._lock = threading.RLock()
+        self._cache = OrderedDict()
+
+    def build_table(self, financial_table=None):
+        """合并机会分数与财务指标，按数据集版本和财务表内容缓存"""
+        if financial_table is None:
+            # 共享的财务指标表是确定性的，直接用其版本号作为缓存键
+            financial_table = self.analyzer.get_financial_table()
+            financial_key = self.analyzer.financial_provider.version
+        else:
+            financial_key = pd.util.hash_pandas_object(financial_table[['tech_area'] + FINANCIAL_COLUMNS], index=False).sum()
+        key = (self.analyzer.dataset_version, financial_key)
+        with self._lock:
+            if key != self._table_key:
+                opportunities = self.analyzer.rank_opportunities()
+                financial = financial_table[['tech_area'] + FINANCIAL_COLUMNS]
+                table = opportunities.merge(financial, on='tech_area', how='left')
+                table[FINANCIAL_COLUMNS] = table[FINANCIAL_COLUMNS].fillna(0)
+                table['financial_score'] = calculate_financial_score(table)
+                table['recommendation_category'] = recommendation_category(table)
+                table['investment_recommendation'] = INVESTMENT_RECOMMENDATIONS[table['recommendation_category']]
+                table['risk_tier'] = table['risk_level'].map(RISK_TIERS).fillna(3).astype(int)
+                self._table = table
+                self._table_key = key
+                self._cache.clear()
+            return self._table
+
+    def __getstate__(self):
+        # 锁不能序列化（匹配器可能随分析器传给进程池）
+        state = self.__dict__.copy()
+        state.pop('_lock', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def _evaluate(self, table, profiles):
+        """对 (偏好数 × 机会数) 广播计算匹配度，profiles 为偏好DataFrame"""
+        roi = table['roi'].values[np.newaxis]
+        payback = table['payback_period'].values[np.newaxis]
+        gross = table['gross_margin'].values[np.newaxis]
+        net = table['net_margin'].values[np.newaxis]
+        market_size = table['market_size'].values[np.newaxis]
+        risk_tier = table['risk_tier'].values[np.newaxis]
+        opportunity_score = table['opportunity_score'].values[np.newaxis]
+
+        def column(name):
+            return profiles[name].values[:, np.newaxis]
+
+        max_risk = profiles['risk_tolerance'].map(lambda r: MAX_RISK_TIERS[RISK_MAPPING[r]['max_risk']]).values[:, np.newaxis]
+        min_market = profiles['investment_size'].map(lambda s: SIZE_MAPPING[s]['min_market_size']).values[:, np.newaxis]
+        horizon_payback = profiles['investment_horizon'].map(HORIZON_MAX_PAYBACK).values[:, np.newaxis]
+
+        # 领域偏好：没有指定领域的偏好视为全部匹配；别名（'AI'、'区块链' 等）先映射到规范领域，
+        # 未登记的名称原样保留（不匹配任何领域，而不是被丢弃后变成全部匹配）
+        taxonomy = get_taxonomy()
+        areas = {area: i for i, area in enumerate(table['tech_area'])}
+        area_ok = np.zeros((len(profiles), len(table)), dtype=bool)
+        for row, preferred in enumerate(profiles['preferred_areas']):
+            if not preferred:
+                area_ok[row] = True
+            else:
+                canonical = (taxonomy.canonical_area(a) or a for a in preferred)
+                area_ok[row, [areas[a] for a in canonical if a in areas]] = True
+
+        checks = {
+            'roi_ok': roi >= column('min_roi'),
+            'payback_ok': payback <= column('max_payback'),
+            'gross_ok': gross >= column('min_gross_margin'),
+            'net_ok': net >= column('min_net_margin'),
+            'risk_ok': risk_tier <= max_risk,
+            'size_ok': market_size >= min_market,
+            'area_ok': area_ok,
+            'horizon_ok': payback <= horizon_payback
+        }
+
+        financial_match = 25 * (checks['roi_ok'].astype(int) + checks['payback_ok'] + checks['gross_ok'] + checks['net_ok'])
+        match_score = (
+            financial_match * 0.4 +
+            20 * checks['risk_ok'] +
+            15 * checks['size_ok'] +
+            15 * checks['area_ok'] +
+            10 * checks['horizon_ok']
+        )
+        match_percentage = np.minimum(match_score + opportunity_score * 0.1, 100)
+        combined = match_percentage * 0.6 + opportunity_score * 0.4
+        return match_percentage, combined, checks
+
+    def match(self, preferences, financial_table=None, top_n=8, min_match=50):
+        """单个投资偏好的推荐结果，结果按偏好元组缓存；返回缓存结果的副本，调用方可以原地修改"""
+        table = self.build_table(financial_table)
+        key = (normalize_preferences(preferences), top_n, min_match)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._copy_result(self._cache[key])
+
+        prefs = dict(key[0])
+        profiles = pd.DataFrame([prefs])
+        match_percentage, combined, checks = self._evaluate(table, profiles)
+        match_percentage, combined = match_percentage[0], combined[0]
+
+        matched = np.flatnonzero(match_percentage >= min_match)
+        order = matched[np.argsort(-combined[matched], kind='stable')]
+        top = order[:top_n]
+
+        result = table.iloc[top].copy()
+        result['match_percentage'] = match_percentage[top]
+        # 只为展示的结果生成匹配理由
+        result['match_reasoning'] = [
+            self._build_reasoning(table.iloc[i], prefs, {name: mask[0, i] for name, mask in checks.items()})
+            for i in top
+        ]
+        result = result.reset_index(drop=True)
+        output = {'matches': result, 'total_matches': len(matched)}
+
+        with self._lock:
+            self._cache[key] = output
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return self._copy_result(output)
+
+    @staticmethod
+    def _copy_result(output):
+        return {'matches': output['matches'].copy(), 'total_matches': output['total_matches']}
+
+    def match_batch(self, profiles, financial_table=None, top_n=5, min_match=50):
+        """批量为多个客户偏好打分，profiles 需包含 profile_id 和偏好字段"""
+        table = self.build_table(financial_table)
+        profiles = profiles.copy()
+        for name, default in DEFAULT_PREFERENCES.items():
+            if name not in profiles:
+                profiles[name] = [default] * len(profiles)
+        match_percentage, combined, _ = self._evaluate(table, profiles)
+
+        ranked = np.where(match_percentage >= min_match, combined, -np.inf)
+        top_n = min(top_n, ranked.shape[1])
+        top = np.argsort(-ranked, axis=1, kind='stable')[:, :top_n]
+        top_combined = np.take_along_axis(ranked, top, axis=1)
+        valid = np.isfinite(top_combined)
+
+        profile_rows = np.repeat(np.arange(len(profiles)), top_n).reshape(top.shape)
+        return pd.DataFrame({
+            'profile_id': profiles['profile_id'].values[profile_rows[valid]],
+            'rank': np.tile(np.arange(1, top_n + 1), (len(profiles), 1))[valid],
+            'tech_area': table['tech_area'].values[top[valid]],
+            'match_percentage': np.round(np.take_along_axis(match_percentage, top, axis=1)[valid], 1),
+            'combined_score': np.round(top_combined[valid], 2),
+            'opportunity_score': table['opportunity_score'].values[top[valid]],
+            'financial_score': table['financial_score'].values[top[valid]]
+        })
+
+    @staticmethod
+    def _build_reasoning(opp, prefs, checks):
+        """生成匹配理由"""
+        reasoning = []
+        if checks['roi_ok']:
+            reasoning.append(f"ROI {opp['roi']}% 达标")
+        else:
+            reasoning.append(f"ROI {opp['roi']}% 未达{prefs['min_roi']}%要求")
+        if checks['payback_ok']:
+            reasoning.append(f"回收期{opp['payback_period']}年符合要求")
+        else:
+            reasoning.append(f"回收期{opp['payback_period']}年超过{prefs['max_payback']}年限制")
+        if checks['gross_ok']:
+            reasoning.append(f"毛利率{opp['gross_margin']}% 达标")
+        else:
+            reasoning.append(f"毛利率{opp['gross_margin']}% 未达{prefs['min_gross_margin']}%要求")
+        if checks['net_ok']:
+            reasoning.append(f"净利率{opp['net_margin']}% 达标")
+        else:
+            reasoning.append(f"净利率{opp['net_margin']}% 未达{prefs['min_net_margin']}%要求")
+        reasoning.append("风险等级匹配" if checks['risk_ok'] else f"风险等级{opp['risk_level']}不符合要求")
+        reasoning.append(f"市场规模{opp['market_size']}亿符合要求" if checks['size_ok'] else f"市场规模{opp['market_size']}亿偏小")
+        reasoning.append("技术领域匹配" if checks['area_ok'] else "技术领域不匹配")
+        reasoning.append("投资期限匹配" if checks['horizon_ok'] else "投资期限不匹配")
+        return reasoning
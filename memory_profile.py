@@ -0,0 +1,176 @@
+# memory_profile.py
+import json
+import os
+import sys
+import threading
+import time
+import types
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# 分析器上需要统计的数据结构和缓存（不存在或为空的会被跳过）
+ANALYZER_FRAMES = ['df_patents', 'df_market', 'df_investors']
+ANALYZER_STRUCTURES = [
+    'investor_tech_matrix', 'tech_similarity_matrix', 'aggregates',
+    '_search_index', '_similarity_model', '_query_index', '_chart_data', '_area_rows', '_applicant_graph', '_area_sketches', '_scoring_table', '_scoring_columns',
+    '_component_cache', '_preference_matcher', '_financial_table'
+]
+
+_SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+               type(threading.Lock()), type(threading.RLock()), threading.Thread)
+
+
+def deep_sizeof(obj, seen=None):
+    """对象的深度内存占用（字节），seen 用于在多个对象间避免重复计算共享的数据"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen or isinstance(obj, _SKIP_TYPES):
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True, index=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        if obj.dtype == object:
+            return int(pd.Series(obj.ravel(), copy=False).memory_usage(deep=True, index=False))
+        # 视图只统计一次其底层数组
+        return int(obj.nbytes) if obj.base is None else deep_sizeof(obj.base, seen)
+    if hasattr(obj, 'indptr') and hasattr(obj, 'indices') and hasattr(obj, 'data'):
+        # scipy.sparse 压缩矩阵
+        return int(obj.data.nbytes + obj.indices.nbytes + obj.indptr.nbytes)
+    if isinstance(obj, (str, bytes, int, float, bool, type(None))):
+        return sys.getsizeof(obj)
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    else:
+        if hasattr(obj, '__dict__'):
+            size += deep_sizeof(vars(obj), seen)
+        for slot in getattr(type(obj), '__slots__', ()):
+            if hasattr(obj, slot):
+                size += deep_sizeof(getattr(obj, slot), seen)
+    return size
+
+
+def frame_memory(df):
+    """DataFrame的深度内存占用：总量和各列明细（字节）"""
+    usage = df.memory_usage(deep=True, index=True)
+    return {
+        'rows': len(df),
+        'bytes': int(usage.sum()),
+        'columns': {str(column): int(size) for column, size in usage.items()}
+    }
+
+
+def process_rss():
+    """当前进程常驻内存和峰值（字节）；Linux读取/proc，其他平台退回到psutil或resource"""
+    rss = peak = None
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith('VmHWM:'):
+                    peak = int(line.split()[1]) * 1024
+    except OSError:
+        try:
+            import psutil
+            rss = psutil.Process().memory_info().rss
+        except ImportError:
+            pass
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            peak *= 1 if sys.platform == 'darwin' else 1024
+        except ImportError:
+            pass
+    return rss, peak
+
+
+class MemoryMonitor:
+    """内存监控：统计数据集和各级缓存的深度内存，并记录进程RSS的变化趋势"""
+
+    def __init__(self, max_samples=720, report_path=None):
+        self.samples = deque(maxlen=max_samples)
+        self.report_path = report_path
+        self._lock = threading.Lock()
+
+    def record(self):
+        """记录一次RSS采样"""
+        rss, _ = process_rss()
+        if rss is not None:
+            with self._lock:
+                self.samples.append((time.time(), rss))
+        return rss
+
+    def trend(self):
+        """RSS趋势：首次采样以来的增长和最小二乘斜率（MB/小时）"""
+        with self._lock:
+            samples = list(self.samples)
+        if len(samples) < 2:
+            return {'samples': len(samples), 'growth_mb': 0.0, 'slope_mb_per_hour': 0.0}
+        times = np.array([s[0] for s in samples])
+        rss = np.array([s[1] for s in samples], dtype=np.float64) / 2 ** 20
+        slope = np.polyfit(times - times[0], rss, 1)[0] * 3600 if times[-1] > times[0] else 0.0
+        return {
+            'samples': len(samples),
+            'since': datetime.fromtimestamp(times[0]).isoformat(timespec='seconds'),
+            'growth_mb': round(float(rss[-1] - rss[0]), 2),
+            'slope_mb_per_hour': round(float(slope), 2),
+            'history_mb': [round(float(value), 1) for value in rss[-60:]]
+        }
+
+    def report(self, analyzer=None, extra=None):
+        """生成内存报告：进程RSS、数据集各列、分析器缓存以及 extra 中的其他缓存对象"""
+        rss = self.record()
+        _, peak = process_rss()
+        # 共享的对象只统计一次：分析器自身不计入，各结构按报告顺序归属
+        seen = {id(analyzer)} if analyzer is not None else set()
+
+        frames, structures = {}, {}
+        if analyzer is not None:
+            for name in ANALYZER_FRAMES:
+                df = getattr(analyzer, name, None)
+                if isinstance(df, pd.DataFrame):
+                    seen.add(id(df))
+                    frames[name] = frame_memory(df)
+            for name in ANALYZER_STRUCTURES:
+                value = getattr(analyzer, name, None)
+                if value is not None:
+                    structures[name] = deep_sizeof(value, seen)
+        for name, value in (extra or {}).items():
+            if isinstance(value, pd.DataFrame) and id(value) not in seen:
+                seen.add(id(value))
+                frames[name] = frame_memory(value)
+            else:
+                structures[name] = deep_sizeof(value, seen)
+
+        tracked = sum(f['bytes'] for f in frames.values()) + sum(structures.values())
+        return {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'pid': os.getpid(),
+            'process': {
+                'rss_mb': round(rss / 2 ** 20, 2) if rss is not None else None,
+                'peak_rss_mb': round(peak / 2 ** 20, 2) if peak is not None else None,
+                'trend': self.trend()
+            },
+            'tracked_mb': round(tracked / 2 ** 20, 2),
+            'frames': frames,
+            'structures': dict(sorted(structures.items(), key=lambda item: item[1], reverse=True))
+        }
+
+    def write_report(self, path=None, analyzer=None, extra=None):
+        """把内存报告写入JSON文件（先写临时文件再改名），返回报告"""
+        path = path or self.report_path
+        report = self.report(analyzer, extra)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        os.replace(path + '.tmp', path)
+        return report
@@ -0,0 +1,137 @@
+# out_of_core.py
+import itertools
+
+import numpy as np
+
+from aggregates import AGGREGATE_COLUMNS, PatentAggregates, iter_patent_chunks
+from engine import SIMILARITY_FEATURES, PatentAnalyzer, compute_dataset_version, synchronized
+
+
+class UnsupportedInChunkedMode(RuntimeError):
+    """分块模式不保存专利明细，需要明细的功能（全文检索、专利浏览等）不可用"""
+
+
+class OutOfCorePatentAnalyzer(PatentAnalyzer):
+    """分块模式的专利分析器：流式读取专利文件，只保留部分聚合量
+
+    增长指标、领域相似度、机会分数和投资者匹配与内存模式的 PatentAnalyzer 结果一致
+    （去重申请人数为HyperLogLog估计值）。全文检索和专利级相似度需要明细数据，分块模式下不可用，
+    调用时抛出 UnsupportedInChunkedMode。
+
+    append_patents 追加的批次写到 append_store（PatentSpillStore）的分片中，申请人共现图由专利文件和这些分片构建
+    """
+
+    def __init__(self, patent_paths, df_market, df_investors, chunk_size=100_000,
+                 financial_provider=None, aggregates=None, append_store=None):
+        self.patent_paths = patent_paths
+        self.chunk_size = chunk_size
+        # 第一次追加批次时才创建（默认写到系统临时目录）
+        self.append_store = append_store
+        if aggregates is None:
+            print("分块读取专利数据...")
+            chunks = iter_patent_chunks(patent_paths, chunk_size, columns=AGGREGATE_COLUMNS)
+            aggregates = PatentAggregates.from_chunks(chunks)
+        self.aggregates = aggregates
+        super().__init__(None, df_market, df_investors, financial_provider)
+
+    def _list_tech_areas(self):
+        return np.array(self.aggregates.tech_areas, dtype=object)
+
+    @property
+    @synchronized
+    def dataset_version(self):
+        """由聚合量和市场数据计算版本号"""
+        key = (self.aggregates.rows, id(self.df_market), len(self.df_market))
+        if key != self._version_key:
+            # 没有 tech_maturity 列（或还没有任何专利）时对应的聚合量为 None，不计入版本
+            frames = [stats.reset_index() for stats in (self.aggregates.year_stats, self.aggregates.maturity_counts)
+                      if stats is not None]
+            self._dataset_version = compute_dataset_version(*frames, self.df_market)
+            self._version_key = key
+        return self._dataset_version
+
+    @property
+    def patent_count(self):
+        return self.aggregates.rows
+
+    @synchronized
+    def append_patents(self, df_batch):
+        """把新到达的专利批次累加到聚合量中，明细写到 append_store"""
+        df_batch = self.taxonomy.canonicalize_patents(df_batch)
+        self._keep_appended(df_batch)
+        self.aggregates.update(df_batch)
+        if self._applicant_graph is not None:
+            self._applicant_graph.update(df_batch)
+            self._applicant_graph_version = self.dataset_version
+        self.tech_areas = self._list_tech_areas()
+        self._prepare_collaborative_data()
+
+    def _keep_appended(self, df_batch):
+        """保留追加批次的明细，供之后按需构建的申请人共现图读取"""
+        if len(df_batch) == 0:
+            return
+        if self.append_store is None:
+            from retention import PatentSpillStore
+            self.append_store = PatentSpillStore()
+        self.append_store.spill(df_batch)
+
+    def calculate_growth_metrics(self):
+        """由 (领域, 年份) 聚合量计算增长指标"""
+        print("计算增长指标...")
+        growth_metrics = {}
+        for area in self.tech_areas:
+            if self.aggregates.patent_count(area) == 0:
+                continue
+            growth_metrics[area] = self._area_growth_metric(
+                area,
+                self.aggregates.yearly_counts(area),
+                self.aggregates.area_means(area),
+                self.aggregates.patent_count(area),
+                self.aggregates.distinct_applicants(area)
+            )
+        return growth_metrics
+
+    def _compute_tech_similarity(self):
+        tech_features = [
+            list(self.aggregates.area_means(area, SIMILARITY_FEATURES)) + [self.aggregates.patent_count(area)]
+            for area in self.tech_areas
+        ]
+        return self._similarity_from_features(tech_features)
+
+    def _area_investor_profile(self, tech_area):
+        if self.aggregates.patent_count(tech_area) == 0:
+            return None
+        means = self.aggregates.area_means(tech_area, ['quality_score', 'commercial_viability'])
+        return means['quality_score'], means['commercial_viability'], self.aggregates.dominant_maturity(tech_area)
+
+    def _area_investor_profiles(self, tech_areas):
+        return [self._area_investor_profile(area) for area in tech_areas]
+
+    def get_area_sketches(self):
+        return self.aggregates.sketches
+
+    @synchronized
+    def get_applicant_graph(self):
+        """分块读取专利文件和追加批次的申请人相关字段构建共现图"""
+        from applicant_graph import GRAPH_COLUMNS, ApplicantGraph
+
+        version = self.dataset_version
+        if self._applicant_graph is None or self._applicant_graph_version != version:
+            chunks = iter_patent_chunks(self.patent_paths or [], self.chunk_size, columns=GRAPH_COLUMNS)
+            if self.append_store is not None:
+                chunks = itertools.chain(chunks, self.append_store.iter_chunks(self.chunk_size, GRAPH_COLUMNS))
+            self._applicant_graph = ApplicantGraph.from_chunks(chunks)
+            self._applicant_graph_version = version
+        return self._applicant_graph
+
+    def get_search_index(self):
+        raise UnsupportedInChunkedMode("分块模式不保存专利明细，无法构建全文索引")
+
+    def get_similarity_model(self):
+        raise UnsupportedInChunkedMode("分块模式不保存专利明细，无法计算专利级相似度")
+
+    def get_query_index(self):
+        raise UnsupportedInChunkedMode("分块模式不保存专利明细，无法浏览专利")
+
+    def get_chart_data(self):
+        raise UnsupportedInChunkedMode("分块模式不保存专利明细，无法按申请日期汇总")
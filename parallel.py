@@ -0,0 +1,205 @@
+# parallel.py
+"""多进程分片聚合：把专利按技术领域（或patent_id哈希）分片到进程池，
+各进程通过共享内存读取列数据并计算部分聚合量，由父进程合并"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from aggregates import AGGREGATE_COLUMNS, PatentAggregates
+from engine import PatentAnalyzer
+from out_of_core import OutOfCorePatentAnalyzer
+from taxonomy import get_taxonomy
+
+# 以分类编码写入共享内存的字符串列
+CATEGORICAL_COLUMNS = ['tech_area', 'applicant', 'tech_maturity']
+# 每个分片至少的行数：分片太小时进程启动和共享内存拷贝的开销超过并行收益
+DEFAULT_MIN_ROWS_PER_SHARD = 10_000
+
+
+def _default_workers():
+    return max(1, os.cpu_count() or 1)
+
+
+def assign_shards(df_patents, n_shards, partition='tech_area'):
+    """返回每行所属的分片编号
+
+    tech_area: 按领域分片，用最长处理时间优先的贪心算法平衡各分片行数（分片数不超过领域数）
+    hash: 按 patent_id 哈希分片，适合领域数少于CPU核数的情况
+    """
+    if partition == 'hash':
+        keys = df_patents['patent_id'].values if 'patent_id' in df_patents else np.arange(len(df_patents))
+        return (pd.util.hash_array(np.asarray(keys, dtype=object)) % np.uint64(n_shards)).astype(np.int64)
+    if partition != 'tech_area':
+        raise ValueError(f"未知的分片方式: {partition}")
+
+    codes, areas = pd.factorize(df_patents['tech_area'])
+    sizes = np.bincount(codes, minlength=len(areas))
+    loads = np.zeros(min(n_shards, max(len(areas), 1)), dtype=np.int64)
+    area_shard = np.empty(len(areas), dtype=np.int64)
+    for area in np.argsort(-sizes, kind='stable'):
+        shard = int(np.argmin(loads))
+        area_shard[area] = shard
+        loads[shard] += sizes[area]
+    return area_shard[codes]
+
+
+class SharedColumns:
+    """把DataFrame的列写入共享内存块（字符串列转为分类编码），供子进程零拷贝读取"""
+
+    def __init__(self, df):
+        self.rows = len(df)
+        self.specs = []
+        self.categories = {}
+        # 数值列的原dtype，子进程按此还原
+        self.dtypes = {}
+        self._blocks = []
+        for column in df.columns:
+            if column in CATEGORICAL_COLUMNS:
+                codes, uniques = pd.factorize(df[column])
+                # 缺失值编码为-1，正好索引到末尾追加的None
+                self.categories[column] = np.append(np.asarray(uniques, dtype=object), None)
+                values = codes.astype(np.int32)
+            else:
+                self.dtypes[column] = df[column].dtype
+                values = np.ascontiguousarray(df[column].to_numpy(dtype=np.float64, na_value=np.nan))
+            block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+            self._blocks.append(block)
+            self.specs.append((column, block.name, values.dtype.str))
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _aggregate_shard(specs, categories, dtypes, rows, start, stop):
+    """子进程：读取共享内存中 [start, stop) 行并计算部分聚合量"""
+    data = {}
+    for column, name, dtype in specs:
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            values = np.ndarray((rows,), dtype=np.dtype(dtype), buffer=block.buf)[start:stop]
+            # 关闭共享内存前必须复制出数据
+            data[column] = categories[column][values] if column in categories else values.copy()
+        finally:
+            block.close()
+    # 数值列按原dtype还原（year 等整数列共享时转成了 float64）；含缺失值的列原本就是浮点，
+    # 缺失的 year 与单进程路径一样在分组时被丢弃，不会被强转成 int64 的垃圾值
+    df = pd.DataFrame(data).astype(dtypes)
+    return PatentAggregates().update(df)
+
+
+def effective_shards(rows, workers, min_rows_per_shard=DEFAULT_MIN_ROWS_PER_SHARD):
+    """实际使用的分片数：不超过进程数，且每个分片至少 min_rows_per_shard 行"""
+    return min(workers, max(1, rows // max(1, min_rows_per_shard)))
+
+
+def build_aggregates_parallel(df_patents, workers=None, partition='tech_area',
+                              min_rows_per_shard=DEFAULT_MIN_ROWS_PER_SHARD):
+    """多进程计算专利聚合量，结果与 PatentAggregates().update(df_patents) 一致"""
+    workers = workers or _default_workers()
+    # 先统一领域名称，分片聚合量与调用方保留的明细使用同一套规范名称
+    df_patents = get_taxonomy().canonicalize_patents(df_patents)
+    columns = [c for c in AGGREGATE_COLUMNS if c in df_patents]
+    n_shards = effective_shards(len(df_patents), workers, min_rows_per_shard)
+    if n_shards <= 1:
+        if workers > 1:
+            print(f"并行聚合: {len(df_patents)} 行不足 2 × {min_rows_per_shard} 行，使用单进程聚合")
+        return PatentAggregates().update(df_patents[columns])
+    print(f"并行聚合: {n_shards} 个分片（{workers} 个进程，每片至少 {min_rows_per_shard} 行）")
+
+    shard_ids = assign_shards(df_patents, n_shards, partition)
+    order = np.argsort(shard_ids, kind='stable')
+    bounds = np.searchsorted(shard_ids[order], np.arange(shard_ids.max() + 2))
+    ordered = df_patents[columns].iloc[order]
+
+    aggregates = PatentAggregates()
+    with SharedColumns(ordered) as shared:
+        with ProcessPoolExecutor(max_workers=min(workers, len(bounds) - 1)) as pool:
+            futures = [
+                pool.submit(_aggregate_shard, shared.specs, shared.categories, shared.dtypes, shared.rows, start, stop)
+                for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start
+            ]
+            for future in futures:
+                aggregates.merge(future.result())
+
+    # 分片会打乱领域的首次出现顺序，按原数据恢复（排名并列时的顺序依赖于此）
+    aggregates.area_order = {area: i for i, area in enumerate(pd.unique(df_patents['tech_area']))}
+    return aggregates
+
+
+_worker_analyzer = None
+
+
+def _init_investor_worker(analyzer):
+    global _worker_analyzer
+    _worker_analyzer = analyzer
+
+
+def _recommend_investors_shard(areas, max_investors):
+    return {area: _worker_analyzer.recommend_investors(area, max_investors) for area in areas}
+
+
+class ParallelPatentAnalyzer(OutOfCorePatentAnalyzer):
+    """多进程模式的专利分析器：聚合量由进程池分片计算，投资者匹配按领域分片并行
+
+    专利明细仍保留在内存中，全文检索和专利级相似度照常可用
+    """
+
+    def __init__(self, df_patents, df_market, df_investors, workers=None, partition='tech_area',
+                 financial_provider=None, min_rows_per_shard=DEFAULT_MIN_ROWS_PER_SHARD):
+        self.workers = workers or _default_workers()
+        df_patents = get_taxonomy().canonicalize_patents(df_patents)
+        # 实际分片数（数据量小时可能为1，即单进程聚合）
+        self.shards = effective_shards(len(df_patents), self.workers, min_rows_per_shard)
+        aggregates = build_aggregates_parallel(df_patents, self.workers, partition, min_rows_per_shard)
+        super().__init__(None, df_market, df_investors, financial_provider=financial_provider, aggregates=aggregates)
+        self.df_patents = df_patents
+
+    def _keep_appended(self, df_batch):
+        self.df_patents = pd.concat([self.df_patents, df_batch], ignore_index=True)
+
+    def get_search_index(self):
+        return PatentAnalyzer.get_search_index(self)
+
+    def get_similarity_model(self):
+        return PatentAnalyzer.get_similarity_model(self)
+
+    def get_query_index(self):
+        return PatentAnalyzer.get_query_index(self)
+
+    def get_applicant_graph(self):
+        return PatentAnalyzer.get_applicant_graph(self)
+
+    def get_chart_data(self):
+        return PatentAnalyzer.get_chart_data(self)
+
+    def recommend_investors_batch(self, tech_areas=None, max_investors=8):
+        """并行为多个领域匹配投资者，返回 {领域: 推荐列表}"""
+        tech_areas = list(self.tech_areas if tech_areas is None else self.canonical_area(list(tech_areas)))
+        n_shards = min(self.workers, len(tech_areas))
+        if n_shards <= 1:
+            return {area: self.recommend_investors(area, max_investors) for area in tech_areas}
+
+        # 子进程只需要聚合量、市场和投资者数据，不传输专利明细
+        worker_analyzer = OutOfCorePatentAnalyzer(
+            None, self.df_market, self.df_investors, aggregates=self.aggregates
+        )
+        results = {}
+        with ProcessPoolExecutor(max_workers=n_shards, initializer=_init_investor_worker,
+                                 initargs=(worker_analyzer,)) as pool:
+            shards = [tech_areas[i::n_shards] for i in range(n_shards)]
+            for shard_result in pool.map(_recommend_investors_shard, shards, [max_investors] * n_shards):
+                results.update(shard_result)
+        return {area: results[area] for area in tech_areas}
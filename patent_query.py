@@ -0,0 +1,228 @@
+# patent_query.py
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# 可按取值筛选的分类列，以及可按区间筛选/排序的数值列
+CATEGORY_COLUMNS = ['tech_area', 'subcategory', 'legal_status', 'tech_maturity']
+RANGE_COLUMNS = ['year', 'quality_score', 'market_potential', 'commercial_viability',
+                 'investment_attractiveness', 'industry_impact', 'citations', 'technology_readiness']
+DISPLAY_COLUMNS = ['patent_id', 'title', 'tech_area', 'subcategory', 'year', 'applicant', 'legal_status',
+                   'tech_maturity', 'quality_score', 'market_potential', 'commercial_viability', 'citations']
+
+
+def _smallest_int_dtype(n):
+    return np.int32 if n < 2 ** 31 else np.int64
+
+
+class PatentQueryIndex:
+    """专利明细的筛选/排序/分页查询索引
+
+    分类列编码为整数并建立倒排行号表，数值列保存为连续数组（年份另建有序索引供二分查找）。
+    查询先用估计最选择性的条件生成候选行，再在候选行上向量化检查其余条件；
+    排序只对当前页之前的 top-k 做部分选择，翻页只取出当前页的行。
+    """
+
+    FILTER_CACHE_SIZE = 16
+    # 预先建立有序索引的数值列；其他数值列的选择性用抽样估计
+    SORTED_COLUMNS = ['year']
+    SAMPLE_SIZE = 20_000
+
+    def __init__(self, df_patents, dataset_version=None):
+        self.df = df_patents
+        self.dataset_version = dataset_version
+        self.size = len(df_patents)
+        self._row_dtype = _smallest_int_dtype(self.size)
+
+        self.codes = {}
+        self.categories = {}
+        self._postings = {}
+        for column in CATEGORY_COLUMNS:
+            if column not in df_patents:
+                continue
+            codes, uniques = pd.factorize(df_patents[column], sort=True)
+            codes = codes.astype(np.int32)
+            order = np.argsort(codes, kind='stable').astype(self._row_dtype)
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            self.codes[column] = codes
+            self.categories[column] = {value: i for i, value in enumerate(uniques)}
+            self._postings[column] = (order, bounds)
+
+        self.values = {
+            column: df_patents[column].to_numpy(dtype=np.float64)
+            for column in RANGE_COLUMNS if column in df_patents
+        }
+        self._sorted = {}
+        for column in self.SORTED_COLUMNS:
+            if column in self.values:
+                self._sorted_index(column)
+        rng = np.random.default_rng(0)
+        self._sample = rng.choice(self.size, size=min(self.size, self.SAMPLE_SIZE), replace=False) if self.size else np.arange(0)
+        # 索引随分析器在会话/API线程间共享，筛选缓存的查找和插入在锁内进行
+        self._lock = threading.Lock()
+        self._filter_cache = OrderedDict()
+        self._order_cache = None
+
+    def __getstate__(self):
+        # 锁不能序列化（查询索引可能随分析器传给进程池）
+        state = self.__dict__.copy()
+        state.pop('_lock', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def category_values(self, column):
+        return list(self.categories.get(column, {}))
+
+    def value_range(self, column):
+        values = self.values[column]
+        return float(np.nanmin(values)), float(np.nanmax(values))
+
+    def _sorted_index(self, column):
+        """数值列的有序行号和有序取值，用于区间筛选的二分查找"""
+        if column not in self._sorted:
+            order = np.argsort(self.values[column], kind='stable').astype(self._row_dtype)
+            self._sorted[column] = (order, self.values[column][order])
+        return self._sorted[column]
+
+    @staticmethod
+    def _normalize_filters(filters):
+        """把筛选条件转成可哈希的规范形式，空条件被忽略"""
+        normalized = []
+        for column, condition in sorted(filters.items()):
+            if condition is None:
+                continue
+            if column in CATEGORY_COLUMNS:
+                values = tuple(sorted(set(condition), key=str))
+                if values:
+                    normalized.append((column, 'in', values))
+            else:
+                low, high = condition
+                normalized.append((column, 'range', (
+                    -np.inf if low is None else float(low),
+                    np.inf if high is None else float(high)
+                )))
+        return tuple(normalized)
+
+    def _estimate(self, column, kind, arg):
+        """条件命中的行数：分类列和有序索引列为精确值，其他数值列按抽样估计"""
+        if kind == 'in':
+            _, bounds = self._postings[column]
+            codes = [self.categories[column][v] for v in arg if v in self.categories[column]]
+            return sum(int(bounds[c + 1] - bounds[c]) for c in codes)
+        low, high = arg
+        if column in self._sorted:
+            _, sorted_values = self._sorted[column]
+            return int(np.searchsorted(sorted_values, high, side='right') - np.searchsorted(sorted_values, low, side='left'))
+        if len(self._sample) == 0:
+            return 0
+        return int(self._mask(self._sample, column, kind, arg).mean() * self.size)
+
+    def _rows_for(self, column, kind, arg):
+        if kind == 'in':
+            order, bounds = self._postings[column]
+            codes = sorted(self.categories[column][v] for v in arg if v in self.categories[column])
+            rows = np.concatenate([order[bounds[c]:bounds[c + 1]] for c in codes]) if codes else order[:0]
+        elif column in self._sorted:
+            order, sorted_values = self._sorted[column]
+            low, high = arg
+            rows = order[np.searchsorted(sorted_values, low, side='left'):np.searchsorted(sorted_values, high, side='right')]
+        else:
+            return np.flatnonzero(self._mask(None, column, kind, arg)).astype(self._row_dtype)
+        return np.sort(rows)
+
+    def _mask(self, rows, column, kind, arg):
+        if kind == 'in':
+            allowed = np.zeros(len(self.categories[column]) + 1, dtype=bool)
+            for value in arg:
+                if value in self.categories[column]:
+                    allowed[self.categories[column][value]] = True
+            # 缺失值编码为-1，对应末尾恒为False的位置
+            codes = self.codes[column] if rows is None else self.codes[column][rows]
+            return allowed[codes]
+        values = self.values[column] if rows is None else self.values[column][rows]
+        low, high = arg
+        return (values >= low) & (values <= high)
+
+    def filter_rows(self, filters):
+        """返回满足所有条件的行号（升序），None 表示全部行"""
+        key = self._normalize_filters(filters)
+        if not key:
+            return None
+        with self._lock:
+            if key in self._filter_cache:
+                self._filter_cache.move_to_end(key)
+                return self._filter_cache[key]
+
+        for column, _, _ in key:
+            if column not in self.codes and column not in self.values:
+                raise KeyError(f"不支持筛选的列: {column}")
+        # 用命中行最少的条件生成候选，其余条件在候选上检查
+        estimates = [self._estimate(*condition) for condition in key]
+        first = int(np.argmin(estimates))
+        if estimates[first] > self.size // 4:
+            mask = np.ones(self.size, dtype=bool)
+            for condition in key:
+                mask &= self._mask(None, *condition)
+            rows = np.flatnonzero(mask).astype(self._row_dtype)
+        else:
+            rows = self._rows_for(*key[first])
+            for i, condition in enumerate(key):
+                if i != first and len(rows):
+                    rows = rows[self._mask(rows, *condition)]
+
+        with self._lock:
+            self._filter_cache[key] = rows
+            if len(self._filter_cache) > self.FILTER_CACHE_SIZE:
+                self._filter_cache.popitem(last=False)
+        return rows
+
+    def _top_k(self, rows, sort_by, ascending, k):
+        """候选行中按排序键的前k行（并列按行号），缺失值排在最后"""
+        if sort_by is None:
+            return (np.arange(min(k, self.size)) if rows is None else rows[:k]).astype(self._row_dtype)
+        values = self.values[sort_by] if rows is None else self.values[sort_by][rows]
+        key = values if ascending else -values
+        key = np.where(np.isnan(key), np.inf, key)
+        n = len(key)
+        if k < n:
+            part = np.argpartition(key, k - 1)[:k]
+            kth = key[part].max()
+            strict = np.flatnonzero(key < kth)
+            ties = np.flatnonzero(key == kth)[:k - len(strict)]
+            selected = np.concatenate([strict, ties])
+        else:
+            selected = np.arange(n)
+        selected = selected[np.lexsort((selected, key[selected]))]
+        return selected.astype(self._row_dtype) if rows is None else rows[selected]
+
+    def query(self, filters=None, sort_by='quality_score', ascending=False, page=1, page_size=50, columns=None):
+        """筛选、排序并返回指定页：{'total', 'page', 'pages', 'page_size', 'rows'}
+
+        filters: {分类列: 取值列表, 数值列: (下限, 上限)}，None 或空列表表示不限
+        """
+        if sort_by is not None and sort_by not in self.values:
+            raise KeyError(f"不支持排序的列: {sort_by}")
+        filters = filters or {}
+        rows = self.filter_rows(filters)
+        total = self.size if rows is None else len(rows)
+        pages = max(1, -(-total // page_size))
+        page = min(max(1, page), pages)
+        start, stop = (page - 1) * page_size, min(page * page_size, total)
+
+        # 缓存排好序的前缀，向后翻页时按倍数扩展，向前翻页直接切片
+        cache_key = (self._normalize_filters(filters), sort_by, ascending)
+        cached = self._order_cache
+        if cached is None or cached[0] != cache_key or len(cached[1]) < stop and len(cached[1]) < total:
+            k = max(stop, 2 * len(cached[1]) if cached is not None and cached[0] == cache_key else stop, page_size * 5)
+            self._order_cache = cached = (cache_key, self._top_k(rows, sort_by, ascending, min(k, total)))
+        page_rows = cached[1][start:stop]
+
+        columns = [c for c in (columns or DISPLAY_COLUMNS) if c in self.df.columns]
+        positions = [self.df.columns.get_loc(c) for c in columns]
+        result = self.df.iloc[page_rows, positions].reset_index(drop=True)
+        return {'total': total, 'page': page, 'pages': pages, 'page_size': page_size, 'rows': result}
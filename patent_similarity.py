@@ -0,0 +1,135 @@
+# patent_similarity.py
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from search_index import tokenize
+
+NUMERIC_FEATURES = [
+    'quality_score', 'market_potential', 'commercial_viability',
+    'citations', 'industry_impact', 'investment_attractiveness'
+]
+
+# 分块相似度计算中每个 (专利, 专利) 单元格的峰值字节数：数值特征是稠密的，分块乘积在稀疏格式下
+# 也几乎全部非零（float32 值 + int32 列号 8 字节），toarray 时再加稠密块 4 字节；
+# 之后的局部选择为稠密块 4 字节 + int64 下标 8 字节
+_BYTES_PER_CELL = 12
+
+
+class PatentSimilarityModel:
+    """专利级内容相似度：稀疏TF-IDF文本向量 + 标准化数值特征"""
+
+    def __init__(self, df_patents, numeric_weight=0.3, min_df=2, dataset_version=None):
+        self.numeric_weight = numeric_weight
+        self.min_df = min_df
+        self.dataset_version = dataset_version
+        self.patent_ids = df_patents['patent_id'].tolist()
+        self._id_to_row = {patent_id: row for row, patent_id in enumerate(self.patent_ids)}
+        self.vocabulary = {}
+        self.matrix = self._build_matrix(df_patents)
+        print(f"✓ 相似度模型构建完成: {self.matrix.shape[0]} 篇专利, {self.matrix.shape[1]} 维特征, {self.matrix.nnz} 个非零元素")
+
+    def _build_matrix(self, df_patents):
+        """构建行归一化的稀疏特征矩阵"""
+        titles = df_patents['title'].fillna('').astype(str).tolist()
+        abstracts = df_patents['abstract'].fillna('').astype(str).tolist() if 'abstract' in df_patents else [''] * len(titles)
+
+        indptr, indices, counts = [0], [], []
+        for title, abstract in zip(titles, abstracts):
+            doc_counts = Counter(tokenize(title))
+            doc_counts.update(tokenize(abstract))
+            for token, count in doc_counts.items():
+                indices.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+                counts.append(count)
+            indptr.append(len(indices))
+
+        n_docs = len(titles)
+        tf = sparse.csr_matrix(
+            (np.asarray(counts, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(n_docs, len(self.vocabulary))
+        )
+
+        # 过滤低频词项，计算平滑IDF并做次线性TF缩放
+        doc_freq = np.bincount(tf.indices, minlength=tf.shape[1])
+        keep = np.flatnonzero(doc_freq >= self.min_df) if n_docs >= self.min_df else np.arange(tf.shape[1])
+        tf = tf[:, keep]
+        self.vocabulary = {token: int(new) for new, token in enumerate(np.array(list(self.vocabulary), dtype=object)[keep])}
+        self.idf = np.log((1 + n_docs) / (1 + doc_freq[keep])).astype(np.float32) + 1
+        tf.data = 1 + np.log(tf.data)
+        text = _l2_normalize(tf @ sparse.diags(self.idf))
+
+        blocks = [text * np.sqrt(1 - self.numeric_weight)]
+        numeric_columns = [c for c in NUMERIC_FEATURES if c in df_patents]
+        if numeric_columns and self.numeric_weight > 0:
+            numeric = df_patents[numeric_columns].astype(np.float32).fillna(0).values
+            numeric = (numeric - numeric.mean(axis=0)) / (numeric.std(axis=0) + 1e-8)
+            norms = np.linalg.norm(numeric, axis=1, keepdims=True)
+            numeric = numeric / np.where(norms > 0, norms, 1)
+            blocks.append(sparse.csr_matrix(numeric * np.sqrt(self.numeric_weight)))
+
+        return sparse.hstack(blocks, format='csr', dtype=np.float32)
+
+    def most_similar(self, patent_id, top_k=10):
+        """查找与指定专利最相似的专利"""
+        row = self._id_to_row.get(patent_id)
+        if row is None:
+            return []
+        scores = (self.matrix @ self.matrix[row].T).toarray().ravel()
+        scores[row] = -np.inf
+        top_k = min(top_k, len(scores) - 1)
+        if top_k <= 0:
+            return []
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.patent_ids[i], float(scores[i])) for i in top]
+
+    def top_k_neighbors(self, top_k=10, chunk_size=None, memory_budget_mb=256, min_similarity=0.0):
+        """分块计算全部专利的top-k近邻，每块的相似度矩阵不超过内存预算"""
+        n_docs = self.matrix.shape[0]
+        top_k = min(top_k, n_docs - 1)
+        if top_k <= 0:
+            return pd.DataFrame(columns=['patent_id', 'similar_patent_id', 'similarity'])
+        if chunk_size is None:
+            chunk_size = max(1, int(memory_budget_mb * 1024 * 1024 // (_BYTES_PER_CELL * n_docs)))
+
+        matrix_t = self.matrix.T.tocsc()
+        patent_ids = np.array(self.patent_ids, dtype=object)
+        sources, targets, scores = [], [], []
+
+        for start in range(0, n_docs, chunk_size):
+            stop = min(start + chunk_size, n_docs)
+            block = (self.matrix[start:stop] @ matrix_t).toarray()
+            rows = np.arange(stop - start)
+            block[rows, rows + start] = -np.inf
+            # 原地取负（升序选择即取最相似），避免 argpartition(-block) 再复制一整块
+            np.negative(block, out=block)
+
+            # 每行只做局部选择，不做全排序
+            top = np.argpartition(block, top_k - 1, axis=1)[:, :top_k]
+            top_scores = -np.take_along_axis(block, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+            keep = top_scores > min_similarity
+            sources.append(np.repeat(rows + start, top_k)[keep.ravel()])
+            targets.append(top[keep])
+            scores.append(top_scores[keep])
+            # 释放本块，否则下一块计算乘积时上一块仍占着内存
+            del block, top
+
+        return pd.DataFrame({
+            'patent_id': patent_ids[np.concatenate(sources)],
+            'similar_patent_id': patent_ids[np.concatenate(targets)],
+            'similarity': np.round(np.concatenate(scores), 4)
+        })
+
+
+def _l2_normalize(matrix):
+    """稀疏矩阵按行L2归一化"""
+    matrix = matrix.tocsr()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
@@ -0,0 +1,291 @@
+# resilience.py
+"""数据源调用的容错机制：熔断器、重试预算、带抖动的指数退避、单次调用超时和对冲请求，
+并记录每个数据源的健康统计"""
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class SourceError(Exception):
+    """数据源调用失败（包括未返回数据）"""
+
+
+class SourceTimeoutError(SourceError):
+    """单次调用超过超时时间"""
+
+
+class CircuitOpenError(SourceError):
+    """熔断器打开，调用被直接拒绝"""
+
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后打开，冷却 reset_timeout 秒后半开放行一次试探调用"""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=3, reset_timeout=60.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """是否允许本次调用；半开状态下同一时间只放行一个试探调用"""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            # 试探失败或连续失败达到阈值时（重新）打开
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self._probing = False
+
+
+class RetryBudget:
+    """重试预算：滑动窗口内的重试次数不超过请求数的 ratio 加 min_retries，避免故障时重试放大流量"""
+
+    def __init__(self, ratio=0.2, min_retries=3, window=60.0, clock=time.monotonic):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self.clock = clock
+        self._requests = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now):
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def record_request(self):
+        with self._lock:
+            now = self.clock()
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_spend(self):
+        """申请一次重试，预算不足时返回 False"""
+        with self._lock:
+            now = self.clock()
+            self._trim(now)
+            if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+                return False
+            self._retries.append(now)
+            return True
+
+
+class SourceHealth:
+    """单个数据源的调用统计；对冲线程和调用线程会同时更新，计数都在锁内修改"""
+
+    def __init__(self, max_samples=200):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.short_circuited = 0
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.last_error = None
+        self.last_success = None
+        self.latencies = deque(maxlen=max_samples)
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def record_success(self, latency):
+        with self._lock:
+            self.latencies.append(latency)
+            self.successes += 1
+            self.last_success = time.time()
+
+    def record_failure(self, error, timeout=False):
+        with self._lock:
+            self.failures += 1
+            self.timeouts += int(timeout)
+            self.last_error = str(error)
+
+    def snapshot(self, breaker=None):
+        with self._lock:
+            return self._snapshot(breaker)
+
+    def _snapshot(self, breaker):
+        latencies = sorted(self.latencies)
+
+        def percentile(q):
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 4) if latencies else None
+
+        attempts = self.successes + self.failures
+        return {
+            'state': breaker.state if breaker is not None else None,
+            'calls': self.calls,
+            'successes': self.successes,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'short_circuited': self.short_circuited,
+            'retries': self.retries,
+            'hedged': self.hedged,
+            'hedge_wins': self.hedge_wins,
+            'success_rate': round(self.successes / attempts, 4) if attempts else None,
+            'latency_p50': percentile(0.5),
+            'latency_p95': percentile(0.95),
+            'last_error': self.last_error,
+            'last_success': self.last_success
+        }
+
+
+class SourceGuard:
+    """按数据源隔离的容错调用器
+
+    每个数据源有独立的熔断器和健康统计，所有数据源共享一个重试预算。
+    单次调用在工作线程中执行并受 timeout 限制；失败后在预算内按带全抖动的指数退避重试。
+    """
+
+    def __init__(self, timeout=5.0, max_retries=2, backoff_base=0.2, backoff_max=2.0,
+                 failure_threshold=3, reset_timeout=60.0, retry_ratio=0.2, hedge_delay=None, max_workers=16):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hedge_delay = hedge_delay
+        self.retry_budget = RetryBudget(ratio=retry_ratio)
+        self.breakers = {}
+        self.stats = {}
+        self._lock = threading.Lock()
+        # 超时的调用仍会占用线程直到返回，因此单次调用和对冲编排使用不同的线程池，避免互相阻塞
+        self._call_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='source-call')
+        self._hedge_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='source-hedge')
+
+    def _source(self, name):
+        with self._lock:
+            if name not in self.breakers:
+                self.breakers[name] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self.stats[name] = SourceHealth()
+            return self.breakers[name], self.stats[name]
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def call(self, name, func, *args, **kwargs):
+        """调用数据源 name；返回 None 视为失败（空结果是合法的增量）。全部尝试失败时抛出 SourceError"""
+        breaker, stats = self._source(name)
+        stats.increment('calls')
+        self.retry_budget.record_request()
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                if not self.retry_budget.try_spend():
+                    break
+                stats.increment('retries')
+                time.sleep(self._backoff(attempt - 1))
+            if not breaker.allow():
+                stats.increment('short_circuited')
+                raise CircuitOpenError(f"数据源 {name} 已熔断") if last_error is None else last_error
+            started = time.monotonic()
+            timed_out = False
+            future = self._call_pool.submit(func, *args, **kwargs)
+            try:
+                result = future.result(timeout=self.timeout)
+                if result is None:
+                    raise SourceError(f"数据源 {name} 未返回数据")
+            except FutureTimeoutError:
+                future.cancel()
+                timed_out = True
+                last_error = SourceTimeoutError(f"数据源 {name} 超时 ({self.timeout}s)")
+            except Exception as e:
+                last_error = e if isinstance(e, SourceError) else SourceError(f"数据源 {name} 调用失败: {e}")
+            else:
+                stats.record_success(time.monotonic() - started)
+                breaker.record_success()
+                return result
+            # 数据源内部的异常不在数据源里吞掉，统一在这里记录
+            print(f"数据源 {name} 第 {attempt + 1} 次调用失败: {last_error}")
+            stats.record_failure(last_error, timeout=timed_out)
+            breaker.record_failure()
+        raise last_error
+
+    def first_success(self, sources, *args, hedge_delay=None, **kwargs):
+        """按顺序尝试 [(名称, 函数), ...]，返回第一个成功的 (名称, 结果)
+
+        设置了 hedge_delay 时，当前数据源超过该时间仍未返回就并行向下一个数据源发起对冲请求，
+        取最先成功的结果；全部失败时抛出最后一个错误
+        """
+        hedge_delay = self.hedge_delay if hedge_delay is None else hedge_delay
+        if not sources:
+            raise SourceError("没有可用的数据源")
+        if hedge_delay is None:
+            last_error = None
+            for name, func in sources:
+                try:
+                    return name, self.call(name, func, *args, **kwargs)
+                except Exception as e:
+                    last_error = e
+            raise last_error
+
+        pending = {}
+        hedges = set()
+        remaining = list(sources)
+        last_error = None
+        while remaining or pending:
+            # 没有进行中的请求，或当前请求超过对冲延迟时，向下一个数据源发起请求
+            if remaining:
+                name, func = remaining.pop(0)
+                if pending:
+                    hedges.add(name)
+                    self._source(name)[1].increment('hedged')
+                pending[self._hedge_pool.submit(self.call, name, func, *args, **kwargs)] = name
+            done, _ = wait(pending, timeout=hedge_delay if remaining else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if name in hedges:
+                    self._source(name)[1].increment('hedge_wins')
+                return name, result
+        raise last_error
+
+    def health(self):
+        """各数据源的健康统计和熔断器状态"""
+        with self._lock:
+            names = list(self.stats)
+        return {name: self.stats[name].snapshot(self.breakers[name]) for name in names}
+
+    def shutdown(self):
+        self._call_pool.shutdown(wait=False, cancel_futures=True)
+        self._hedge_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,174 @@
+# retention.py
+"""实时专利库的保留策略：内存中只保留时间窗口/行数窗口内的专利明细，
+窗口外的专利写到磁盘（Parquet分片），其指标已累加在按 (领域, 年份) 的部分聚合量中，评分仍覆盖全部历史
+
+长时间运行时内存占用由窗口大小决定，不随运行时长增长；全部明细可用 iter_patent_chunks 读取溢写目录
+"""
+import itertools
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from aggregates import PatentAggregates, iter_patent_chunks
+from engine import PatentAnalyzer, synchronized
+from filing_dates import row_filing_dates
+from out_of_core import OutOfCorePatentAnalyzer
+from taxonomy import get_taxonomy
+
+
+class RetentionPolicy:
+    """明细保留窗口：申请日期在最近 max_age_days 天内、且为最新的 max_rows 条（None 表示不限）
+
+    过期专利至少累计 min_spill_rows 条才溢写一次，避免每次更新都写出很小的分片
+    """
+
+    def __init__(self, max_age_days=None, max_rows=None, min_spill_rows=1000):
+        self.max_age_days = max_age_days
+        self.max_rows = max_rows
+        self.min_spill_rows = min_spill_rows
+
+    def expired(self, df_patents, now=None):
+        """每行是否超出保留窗口（布尔数组）"""
+        expired = np.zeros(len(df_patents), dtype=bool)
+        if len(df_patents) == 0 or (self.max_age_days is None and self.max_rows is None):
+            return expired
+        dates = row_filing_dates(df_patents).reset_index(drop=True)
+        if self.max_age_days is not None:
+            cutoff = (pd.Timestamp.now() if now is None else pd.Timestamp(now)).normalize() \
+                - pd.Timedelta(days=self.max_age_days)
+            expired |= (dates < cutoff).to_numpy()
+        if self.max_rows is not None and (~expired).sum() > self.max_rows:
+            # 按申请日期保留最新的 max_rows 条；日期相同时保留靠后的行，没有日期的最先过期
+            order = np.lexsort((np.arange(len(dates)), dates.fillna(pd.Timestamp.min).to_numpy()))
+            order = order[~expired[order]]
+            expired[order[:len(order) - self.max_rows]] = True
+        return expired
+
+
+class PatentSpillStore:
+    """过期专利的磁盘存储：每次溢写为 path/<运行编号>/part-<序号>.parquet 一个分片
+
+    path 为 None 时写到系统临时目录下新建的目录；需要保留溢写明细（例如之后用 iter_patent_chunks 读取）时传入目录
+    """
+
+    def __init__(self, path=None, run_id=None):
+        self.path = path
+        self.run_id = run_id or pd.Timestamp.now().strftime('%Y%m%d-%H%M%S')
+        # 运行目录在第一次溢写时占用
+        self.run_dir = None
+        self.files = []
+        self.rows = 0
+
+    def _claim_run_dir(self):
+        """原子地占用一个新的运行目录：同一秒启动的分析器运行编号相同，
+        os.mkdir 在目录已存在时失败，换带序号的目录重试，不会写进其他分析器的目录覆盖其分片"""
+        if self.path is None:
+            self.run_dir = tempfile.mkdtemp(prefix=f'patent_archive-{self.run_id}-')
+            return self.run_dir
+        os.makedirs(self.path, exist_ok=True)
+        run_id, suffix = self.run_id, 2
+        while True:
+            try:
+                os.mkdir(os.path.join(self.path, run_id))
+                break
+            except FileExistsError:
+                run_id = f'{self.run_id}-{suffix}'
+                suffix += 1
+        self.run_id = run_id
+        self.run_dir = os.path.join(self.path, run_id)
+        return self.run_dir
+
+    def spill(self, df_patents):
+        """把一批专利写为新分片，返回文件路径"""
+        if self.run_dir is None:
+            self._claim_run_dir()
+        target = os.path.join(self.run_dir, f'part-{len(self.files):05d}.parquet')
+        df_patents.reset_index(drop=True).to_parquet(target, index=False)
+        self.files.append(target)
+        self.rows += len(df_patents)
+        return target
+
+    def iter_chunks(self, chunk_size=100_000, columns=None):
+        """分块读取本次运行溢写的全部专利"""
+        return iter_patent_chunks(self.files, chunk_size, columns=columns)
+
+
+class RetainedPatentAnalyzer(OutOfCorePatentAnalyzer):
+    """保留窗口模式的专利分析器：聚合量覆盖全部历史专利，内存中只保留窗口内的专利明细
+
+    增长指标、领域相似度、机会分数和投资者匹配由聚合量计算，与内存模式一致（去重申请人数为HyperLogLog估计值）；
+    全文检索、专利浏览、专利级相似度和申请趋势图只覆盖窗口内的专利
+    """
+
+    def __init__(self, df_patents, df_market, df_investors, policy=None, spill_store=None,
+                 financial_provider=None, chunk_size=100_000):
+        self.policy = policy if policy is not None else RetentionPolicy()
+        self.spill_store = spill_store if spill_store is not None else PatentSpillStore()
+        self.last_spilled = 0
+        df_patents = get_taxonomy().canonicalize_patents(df_patents)
+        aggregates = PatentAggregates().update(df_patents)
+        super().__init__(self.spill_store.files, df_market, df_investors, chunk_size=chunk_size,
+                         financial_provider=financial_provider, aggregates=aggregates)
+        self.df_patents = df_patents.reset_index(drop=True)
+        self.compact()
+
+    @synchronized
+    def append_patents(self, df_batch):
+        """累加新批次的聚合量和明细，再按保留策略溢写过期明细；返回被移出内存的专利号"""
+        df_batch = self.taxonomy.canonicalize_patents(df_batch)
+        self.df_patents = pd.concat([self.df_patents, df_batch], ignore_index=True)
+        super().append_patents(df_batch)
+        return self.compact()
+
+    def _keep_appended(self, df_batch):
+        # 明细已并入 df_patents，过期后由 compact 溢写到 spill_store
+        pass
+
+    @synchronized
+    def compact(self, now=None):
+        """把超出保留窗口的明细写到磁盘并移出内存，返回被移出的专利号（未达到溢写阈值时为空）"""
+        expired = self.policy.expired(self.df_patents, now)
+        count = int(expired.sum())
+        if count == 0 or count < self.policy.min_spill_rows:
+            self.last_spilled = 0
+            return np.empty(0, dtype=object)
+        spilled = self.df_patents[expired]
+        self.spill_store.spill(spilled)
+        self.last_spilled = count
+        self.df_patents = self.df_patents[~expired].reset_index(drop=True)
+        return spilled['patent_id'].to_numpy(dtype=object)
+
+    def retention_status(self):
+        return {
+            'live_rows': len(self.df_patents),
+            'spilled_rows': self.spill_store.rows,
+            'spill_files': len(self.spill_store.files),
+            'total_rows': self.aggregates.rows,
+            'last_spilled': self.last_spilled
+        }
+
+    @synchronized
+    def get_applicant_graph(self):
+        """由溢写分片和窗口内明细构建申请人共现图（覆盖全部历史）"""
+        from applicant_graph import GRAPH_COLUMNS, ApplicantGraph
+
+        version = self.dataset_version
+        if self._applicant_graph is None or self._applicant_graph_version != version:
+            chunks = itertools.chain(self.spill_store.iter_chunks(self.chunk_size, GRAPH_COLUMNS), [self.df_patents])
+            self._applicant_graph = ApplicantGraph.from_chunks(chunks)
+            self._applicant_graph_version = version
+        return self._applicant_graph
+
+    def get_search_index(self):
+        return PatentAnalyzer.get_search_index(self)
+
+    def get_similarity_model(self):
+        return PatentAnalyzer.get_similarity_model(self)
+
+    def get_query_index(self):
+        return PatentAnalyzer.get_query_index(self)
+
+    def get_chart_data(self):
+        return PatentAnalyzer.get_chart_data(self)
@@ -0,0 +1,247 @@
+# score_history.py
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from engine import SCORE_COMPONENTS
+
+COMPONENT_NAMES = [c[0] for c in SCORE_COMPONENTS]
+HISTORY_COLUMNS = ['run_id', 'run_at', 'dataset_version', 'tech_area', 'rank', 'opportunity_score'] + COMPONENT_NAMES + ['risk_level']
+
+_FILE_PATTERN = re.compile(r'^(run|compacted)-(\d+)(?:-(\d+))?\.parquet$')
+
+
+def _file_run_range(name):
+    """文件包含的运行编号区间 (首, 尾)"""
+    match = _FILE_PATTERN.match(name)
+    first = int(match.group(2))
+    return first, int(match.group(3) or first)
+
+
+def score_record(analyzer, weights=None):
+    """当前数据集的评分快照：每个领域的总分、加权分项分数和排名（保留完整精度）"""
+    table = analyzer.get_scoring_table()
+    components = analyzer.get_component_matrix()
+    weights = weights or {}
+    weight_vector = np.array([weights.get(name, weight) for name, *_, weight in SCORE_COMPONENTS], dtype=float)
+    weighted = components.to_numpy() * weight_vector
+    scores = weighted.sum(axis=1)
+    order = np.argsort(-scores, kind='stable')
+    ranks = np.empty(len(scores), dtype=np.int64)
+    ranks[order] = np.arange(1, len(scores) + 1)
+
+    record = pd.DataFrame(weighted, columns=COMPONENT_NAMES)
+    record.insert(0, 'tech_area', components.index.to_numpy())
+    record.insert(1, 'rank', ranks)
+    record.insert(2, 'opportunity_score', scores)
+    record['risk_level'] = table['risk_level'].to_numpy()
+    return record.iloc[order].reset_index(drop=True)
+
+
+class ScoreHistoryStore:
+    """追加写入的评分历史：每次评分运行写入一个Parquet文件，旧运行可合并压缩
+
+    查询使用内存中的 (运行 × 领域) 分数/排名矩阵，只在有新运行时重建
+    """
+
+    def __init__(self, directory='score_history'):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._files = set()
+        # 每个文件包含的运行编号，压缩时只合并全部为旧运行的文件
+        self._file_runs = {}
+        self._history = pd.DataFrame(columns=HISTORY_COLUMNS)
+        self._matrices = None
+
+    def _scan(self, claimed=False):
+        """目录中的运行文件；空文件是其他写入方已占用编号但尚未写完的运行，默认跳过"""
+        names = {name for name in os.listdir(self.directory) if _FILE_PATTERN.match(name)}
+        if claimed:
+            return names
+        return {name for name in names if os.path.getsize(os.path.join(self.directory, name)) > 0}
+
+    def refresh(self):
+        """加载其他进程新写入的运行文件（压缩后则整体重新加载）"""
+        with self._lock:
+            files = self._scan()
+            if files == self._files:
+                return self
+            if self._files - files:
+                new_files, frames = files, []
+                self._file_runs = {}
+            else:
+                new_files, frames = files - self._files, [self._history]
+            for name in sorted(new_files):
+                frame = pd.read_parquet(os.path.join(self.directory, name))
+                self._file_runs[name] = set(frame['run_id'].unique().tolist())
+                frames.append(frame)
+            frames = [frame for frame in frames if len(frame) > 0]
+            history = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=HISTORY_COLUMNS)
+            self._history = history.sort_values(['run_id', 'rank'], kind='stable').reset_index(drop=True)
+            self._files = files
+            self._matrices = None
+            return self
+
+    @property
+    def history(self):
+        return self.refresh()._history
+
+    def _claim_run_id(self):
+        """以独占创建 (O_EXCL) 空文件的方式占用下一个运行编号，返回 (编号, 路径)
+
+        进程内的锁管不到其他进程（批量评分和后台更新可能写同一目录），
+        编号已被占用时创建失败，换下一个编号重试，两个写入方不会拿到同一编号
+        """
+        run_id = max((_file_run_range(name)[1] for name in self._scan(claimed=True)), default=0) + 1
+        while True:
+            path = os.path.join(self.directory, f'run-{run_id:06d}.parquet')
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return run_id, path
+            except FileExistsError:
+                run_id += 1
+
+    def append_run(self, record, dataset_version=None, run_at=None):
+        """追加一次评分运行（record 来自 score_record），返回运行编号"""
+        with self._lock:
+            self.refresh()
+            run_id, path = self._claim_run_id()
+            frame = record[['tech_area', 'rank', 'opportunity_score'] + COMPONENT_NAMES + ['risk_level']].copy()
+            frame.insert(0, 'run_id', np.int64(run_id))
+            frame.insert(1, 'run_at', pd.Timestamp(run_at or datetime.now()))
+            frame.insert(2, 'dataset_version', dataset_version or '')
+
+            # 先写临时文件再替换占用的空文件，读取方不会看到写了一半的文件；临时文件名带进程号，避免写入方互相覆盖
+            tmp = f'{path}.{os.getpid()}.tmp'
+            frame.to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+
+            self._history = pd.concat([self._history, frame], ignore_index=True) if len(self._history) else frame
+            self._files.add(os.path.basename(path))
+            self._file_runs[os.path.basename(path)] = {run_id}
+            self._matrices = None
+            return run_id
+
+    def append_analyzer(self, analyzer, weights=None, run_at=None):
+        """对分析器当前数据集评分并追加到历史"""
+        return self.append_run(score_record(analyzer, weights), analyzer.dataset_version, run_at)
+
+    def runs(self):
+        """所有运行的编号、时间和数据集版本"""
+        history = self.history
+        if len(history) == 0:
+            return pd.DataFrame(columns=['run_id', 'run_at', 'dataset_version', 'areas'])
+        return (history.groupby('run_id', sort=True)
+                .agg(run_at=('run_at', 'first'), dataset_version=('dataset_version', 'first'), areas=('tech_area', 'size'))
+                .reset_index())
+
+    def _get_matrices(self):
+        """(运行 × 领域) 的分数和排名矩阵"""
+        self.refresh()
+        with self._lock:
+            if self._matrices is None:
+                history = self._history
+                self._matrices = {
+                    'score': history.pivot(index='run_id', columns='tech_area', values='opportunity_score').astype(float),
+                    'rank': history.pivot(index='run_id', columns='tech_area', values='rank').astype(float),
+                    'run_at': history.groupby('run_id')['run_at'].first()
+                }
+            return self._matrices
+
+    def _resolve_runs(self, run_id=None, baseline_run_id=None, since=None):
+        matrices = self._get_matrices()
+        run_ids = matrices['score'].index
+        if len(run_ids) == 0:
+            raise ValueError("评分历史为空")
+        run_id = run_ids[-1] if run_id is None else run_id
+        if baseline_run_id is None:
+            if since is not None:
+                since = datetime.now() - since if isinstance(since, timedelta) else pd.Timestamp(since)
+                candidates = matrices['run_at'][matrices['run_at'] >= since].index
+                baseline_run_id = candidates[0] if len(candidates) else run_id
+            else:
+                earlier = run_ids[run_ids < run_id]
+                baseline_run_id = earlier[-1] if len(earlier) else run_id
+        return run_id, baseline_run_id
+
+    def rank_changes(self, run_id=None, baseline_run_id=None, since=None):
+        """两次运行之间各领域的排名和分数变化（默认为最新一次与上一次）
+
+        rank_change 为正表示排名上升；新出现的领域 previous_rank 为空
+        """
+        matrices = self._get_matrices()
+        run_id, baseline_run_id = self._resolve_runs(run_id, baseline_run_id, since)
+        score, rank = matrices['score'], matrices['rank']
+        current = rank.loc[run_id].dropna().index
+        result = pd.DataFrame({
+            'tech_area': current,
+            'rank': rank.loc[run_id, current].astype(int).to_numpy(),
+            'previous_rank': rank.loc[baseline_run_id, current].to_numpy(),
+            'opportunity_score': score.loc[run_id, current].to_numpy(),
+            'previous_score': score.loc[baseline_run_id, current].to_numpy()
+        })
+        result['rank_change'] = result['previous_rank'] - result['rank']
+        result['score_change'] = result['opportunity_score'] - result['previous_score']
+        result.attrs.update(run_id=int(run_id), baseline_run_id=int(baseline_run_id))
+        return result.sort_values('rank').reset_index(drop=True)
+
+    def biggest_movers(self, n=5, by='score', run_id=None, baseline_run_id=None, since=None):
+        """变化幅度最大的领域，by 为 'score' 或 'rank'"""
+        changes = self.rank_changes(run_id, baseline_run_id, since)
+        column = 'score_change' if by == 'score' else 'rank_change'
+        magnitude = changes[column].abs().fillna(-1)
+        return changes.iloc[np.argsort(-magnitude.to_numpy(), kind='stable')[:n]].reset_index(drop=True)
+
+    def area_series(self, tech_area, columns=None):
+        """单个领域的分数时间序列（以运行时间为索引）"""
+        history = self.history
+        columns = columns or ['opportunity_score', 'rank'] + COMPONENT_NAMES
+        series = history[history['tech_area'] == tech_area]
+        return series.set_index('run_at')[['run_id'] + columns]
+
+    def score_matrix(self, value='opportunity_score'):
+        """(运行时间 × 领域) 的分数或排名矩阵，用于绘制多领域趋势图"""
+        matrices = self._get_matrices()
+        matrix = matrices['rank' if value == 'rank' else 'score'].copy()
+        matrix.index = matrices['run_at'].loc[matrix.index].to_numpy()
+        return matrix
+
+    def compact(self, keep_recent=timedelta(days=30), resolution='D', now=None):
+        """压缩旧运行：早于 keep_recent 的运行每个时间粒度只保留最后一次，并合并为单个文件
+
+        最近的运行保持原样（运行时间不一定随编号递增，例如补录的历史运行，因此按文件内的运行判断）；
+        只合并其中全部为旧运行的文件，返回 (压缩前运行数, 压缩后运行数)
+        """
+        with self._lock:
+            self.refresh()
+            cutoff = pd.Timestamp(now or datetime.now()) - keep_recent
+            history = self._history
+            old_runs = set(history.loc[history['run_at'] < cutoff, 'run_id'].unique().tolist())
+            merged_files = [name for name in self._files if self._file_runs[name] <= old_runs]
+            merged_runs = set().union(*(self._file_runs[name] for name in merged_files))
+            old = history[history['run_id'].isin(merged_runs)]
+            if len(old) == 0:
+                return (0, 0)
+
+            run_times = old.groupby('run_id')['run_at'].first()
+            keep = run_times.groupby(run_times.dt.floor(resolution)).tail(1).index
+            compacted = old[old['run_id'].isin(keep)]
+            first, last = int(run_times.index.min()), int(run_times.index.max())
+
+            path = os.path.join(self.directory, f'compacted-{first:06d}-{last:06d}.parquet')
+            compacted.to_parquet(path + '.tmp', index=False)
+            os.replace(path + '.tmp', path)
+            for name in merged_files:
+                if name != os.path.basename(path):
+                    os.remove(os.path.join(self.directory, name))
+
+            self._files = set()
+            self._file_runs = {}
+            self._history = pd.DataFrame(columns=HISTORY_COLUMNS)
+            self.refresh()
+            return (len(run_times), len(keep))
@@ -0,0 +1,301 @@
+# search_index.py
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# 常见英文停用词（模板化摘要中出现频率极高，对排序没有区分度）
+STOPWORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'into',
+    'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'with', 'while'
+])
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+|[一-鿿]+')
+
+# 检索结果的列（无结果时返回同样列的空表）
+RESULT_COLUMNS = ['patent_id', 'title', 'tech_area', 'year', 'applicant', 'score']
+
+
+@lru_cache(maxsize=65536)
+def _piece_tokens(piece):
+    """单个英文单词或中文片段的词项；按片段缓存，不缓存整段文本"""
+    if '一' <= piece[0] <= '鿿':
+        if len(piece) == 1:
+            return (piece,)
+        return tuple(piece[i:i + 2] for i in range(len(piece) - 1))
+    return () if piece in STOPWORDS else (piece,)
+
+
+def tokenize(text):
+    """分词：英文按单词切分，中文按字符二元组切分"""
+    if not text:
+        return ()
+    tokens = []
+    for piece in _TOKEN_PATTERN.findall(str(text).lower()):
+        tokens.extend(_piece_tokens(piece))
+    return tuple(tokens)
+
+
+def _smallest_uint(max_value):
+    """选择能容纳最大值的最小无符号整数类型"""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+
+class _PostingSegment:
+    """一段倒排记录：文档号差分编码后按最小整数类型存储"""
+    __slots__ = ('first_doc', 'gaps', 'tfs')
+
+    def __init__(self, doc_ids, tfs):
+        self.first_doc = int(doc_ids[0])
+        gaps = np.diff(doc_ids)
+        self.gaps = gaps.astype(_smallest_uint(gaps.max() if len(gaps) else 0))
+        self.tfs = tfs.astype(_smallest_uint(tfs.max()))
+
+    def decode(self):
+        doc_ids = np.empty(len(self.gaps) + 1, dtype=np.int64)
+        doc_ids[0] = self.first_doc
+        np.cumsum(self.gaps, out=doc_ids[1:])
+        doc_ids[1:] += self.first_doc
+        return doc_ids, self.tfs
+
+    @property
+    def nbytes(self):
+        return self.gaps.nbytes + self.tfs.nbytes
+
+
+class PatentSearchIndex:
+    """专利标题与摘要的全文倒排索引（BM25排序，支持短语和字段过滤）"""
+
+    FILTER_FIELDS = ['tech_area', 'year', 'applicant']
+    MAX_SEGMENTS = 8
+
+    def __init__(self, k1=1.2, b=0.75, title_weight=2):
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self.dataset_version = None
+        # 分析器在新数据到达时原地扩展共享的索引，而检索来自多个会话/API线程；
+        # 读取倒排表时也会合并分段，因此扩展和检索都在索引锁内进行
+        self._lock = threading.RLock()
+
+        self.vocabulary = {}
+        self._postings = []
+        self._doc_lengths = np.empty(0, dtype=np.int32)
+        self._patent_ids = []
+        self._titles = []
+        self._abstracts = []
+        self._id_to_doc = {}
+        self._fields = {field: np.empty(0, dtype=np.int32) for field in self.FILTER_FIELDS}
+        self._field_values = {'tech_area': {}, 'applicant': {}}
+
+    @classmethod
+    def from_dataframe(cls, df_patents, dataset_version=None, **kwargs):
+        """从专利数据构建索引"""
+        index = cls(**kwargs)
+        index.add_documents(df_patents)
+        index.dataset_version = dataset_version
+        return index
+
+    @property
+    def num_docs(self):
+        return len(self._patent_ids)
+
+    def contains(self, patent_id):
+        return patent_id in self._id_to_doc
+
+    def can_extend(self, df_patents):
+        """新数据是否包含全部已索引专利（是则可增量更新，否则需重建）"""
+        return set(df_patents['patent_id']).issuperset(self._id_to_doc)
+
+    def add_documents(self, df_patents):
+        """增量添加文档，已索引的专利号会被跳过"""
+        with self._lock:
+            if len(df_patents) == 0:
+                return 0
+
+            mask = ~df_patents['patent_id'].isin(self._id_to_doc.keys())
+            new_docs = df_patents[mask]
+            if len(new_docs) == 0:
+                return 0
+
+            start = self.num_docs
+            titles = new_docs['title'].fillna('').astype(str).tolist()
+            abstracts = new_docs['abstract'].fillna('').astype(str).tolist() if 'abstract' in new_docs else [''] * len(titles)
+
+            # 逐文档分词，收集 (term_id, doc_id, tf) 三元组
+            term_ids, doc_ids, tfs = [], [], []
+            doc_lengths = np.empty(len(new_docs), dtype=np.int32)
+            for offset, (title, abstract) in enumerate(zip(titles, abstracts)):
+                counts = Counter(tokenize(abstract))
+                for token in tokenize(title):
+                    counts[token] += self.title_weight
+                doc_lengths[offset] = sum(counts.values())
+                for token, tf in counts.items():
+                    term_id = self.vocabulary.get(token)
+                    if term_id is None:
+                        term_id = len(self.vocabulary)
+                        self.vocabulary[token] = term_id
+                        self._postings.append([])
+                    term_ids.append(term_id)
+                    doc_ids.append(start + offset)
+                    tfs.append(tf)
+
+            # 按词项分组生成新的倒排段
+            term_ids = np.asarray(term_ids, dtype=np.int64)
+            doc_ids = np.asarray(doc_ids, dtype=np.int64)
+            tfs = np.asarray(tfs, dtype=np.int64)
+            order = np.lexsort((doc_ids, term_ids))
+            term_ids, doc_ids, tfs = term_ids[order], doc_ids[order], tfs[order]
+            boundaries = np.flatnonzero(np.diff(term_ids)) + 1
+            starts = np.concatenate(([0], boundaries))
+            ends = np.concatenate((boundaries, [len(term_ids)]))
+            for s, e in zip(starts, ends):
+                segments = self._postings[term_ids[s]]
+                segments.append(_PostingSegment(doc_ids[s:e], tfs[s:e]))
+                if len(segments) > self.MAX_SEGMENTS:
+                    self._merge_segments(term_ids[s])
+
+            self._doc_lengths = np.concatenate((self._doc_lengths, doc_lengths))
+            self._titles.extend(titles)
+            self._abstracts.extend(abstracts)
+            for offset, patent_id in enumerate(new_docs['patent_id'].tolist()):
+                self._patent_ids.append(patent_id)
+                self._id_to_doc[patent_id] = start + offset
+
+            # 过滤字段统一存为整数编码
+            for field in self.FILTER_FIELDS:
+                if field not in new_docs:
+                    codes = np.full(len(new_docs), -1, dtype=np.int32)
+                elif field == 'year':
+                    codes = pd.to_numeric(new_docs[field], errors='coerce').fillna(-1).astype(np.int32).values
+                else:
+                    lookup = self._field_values[field]
+                    codes = np.array([lookup.setdefault(value, len(lookup)) for value in new_docs[field].tolist()], dtype=np.int32)
+                self._fields[field] = np.concatenate((self._fields[field], codes))
+
+            print(f"✓ 索引新增 {len(new_docs)} 篇专利，共 {self.num_docs} 篇，词表 {len(self.vocabulary)} 项")
+            return len(new_docs)
+
+    def _merge_segments(self, term_id):
+        """合并某个词项的多个倒排段"""
+        decoded = [segment.decode() for segment in self._postings[term_id]]
+        doc_ids = np.concatenate([d for d, _ in decoded])
+        tfs = np.concatenate([t for _, t in decoded])
+        self._postings[term_id] = [_PostingSegment(doc_ids, tfs)]
+
+    def _get_postings(self, token):
+        term_id = self.vocabulary.get(token)
+        if term_id is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        if len(self._postings[term_id]) > 1:
+            self._merge_segments(term_id)
+        return self._postings[term_id][0].decode()
+
+    def _filter_mask(self, tech_area=None, year=None, applicant=None):
+        """根据字段条件生成文档掩码"""
+        mask = np.ones(self.num_docs, dtype=bool)
+        for field, value in (('tech_area', tech_area), ('applicant', applicant)):
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            codes = [self._field_values[field][v] for v in values if v in self._field_values[field]]
+            mask &= np.isin(self._fields[field], codes)
+        if year is not None:
+            if isinstance(year, (tuple, list)):
+                mask &= (self._fields['year'] >= year[0]) & (self._fields['year'] <= year[1])
+            else:
+                mask &= self._fields['year'] == int(year)
+        return mask
+
+    @staticmethod
+    def parse_query(query):
+        """解析查询：双引号内为短语，其余为普通词项"""
+        phrases = [tokenize(p) for p in re.findall(r'"([^"]+)"', query)]
+        phrases = [p for p in phrases if p]
+        terms = list(tokenize(re.sub(r'"[^"]*"', ' ', query)))
+        for phrase in phrases:
+            terms.extend(phrase)
+        return terms, phrases
+
+    def _contains_phrase(self, doc_id, phrase):
+        for text in (self._titles[doc_id], self._abstracts[doc_id]):
+            tokens = tokenize(text)
+            n = len(phrase)
+            for i in range(len(tokens) - n + 1):
+                if tokens[i:i + n] == phrase:
+                    return True
+        return False
+
+    def search(self, query, top_k=20, tech_area=None, year=None, applicant=None):
+        """BM25检索，返回按相关度排序的结果"""
+        with self._lock:
+            terms, phrases = self.parse_query(query)
+            if not terms or self.num_docs == 0:
+                return pd.DataFrame(columns=RESULT_COLUMNS)
+
+            avgdl = self._doc_lengths.mean()
+            scores = np.zeros(self.num_docs, dtype=np.float64)
+            matched = np.zeros(self.num_docs, dtype=np.int32)
+
+            for token, query_tf in Counter(terms).items():
+                doc_ids, tfs = self._get_postings(token)
+                if len(doc_ids) == 0:
+                    continue
+                idf = np.log(1 + (self.num_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+                tfs = tfs.astype(np.float64)
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_ids] / avgdl)
+                scores[doc_ids] += query_tf * idf * tfs * (self.k1 + 1) / (tfs + norm)
+                matched[doc_ids] += 1
+
+            mask = (matched > 0) & self._filter_mask(tech_area, year, applicant)
+
+            # 短语条件：先要求包含全部短语词项，再在候选文档上校验相邻顺序
+            for phrase in phrases:
+                phrase_mask = np.ones(self.num_docs, dtype=bool)
+                for token in set(phrase):
+                    token_mask = np.zeros(self.num_docs, dtype=bool)
+                    token_mask[self._get_postings(token)[0]] = True
+                    phrase_mask &= token_mask
+                mask &= phrase_mask
+                if len(phrase) > 1:
+                    for doc_id in np.flatnonzero(mask):
+                        if not self._contains_phrase(doc_id, phrase):
+                            mask[doc_id] = False
+
+            candidates = np.flatnonzero(mask)
+            if len(candidates) > top_k:
+                top = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+                candidates = candidates[top]
+            candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+            tech_areas = {code: value for value, code in self._field_values['tech_area'].items()}
+            applicants = {code: value for value, code in self._field_values['applicant'].items()}
+            return pd.DataFrame({
+                'patent_id': [self._patent_ids[d] for d in candidates],
+                'title': [self._titles[d] for d in candidates],
+                'tech_area': [tech_areas.get(c) for c in self._fields['tech_area'][candidates]],
+                'year': self._fields['year'][candidates],
+                'applicant': [applicants.get(c) for c in self._fields['applicant'][candidates]],
+                'score': np.round(scores[candidates], 3)
+            })
+
+    def memory_usage(self):
+        """倒排表占用的字节数"""
+        with self._lock:
+            return sum(segment.nbytes for segments in self._postings for segment in segments)
+
+    def __getstate__(self):
+        # 锁不能序列化（索引可能随分析器传给进程池）
+        state = self.__dict__.copy()
+        state.pop('_lock', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
@@ -0,0 +1,193 @@
+# sketches.py
+import numpy as np
+import pandas as pd
+
+
+def _hash64(values):
+    """稳定的64位哈希（跨进程一致，可用于分片合并）"""
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+
+def _bit_length(values):
+    """向量化计算无符号整数的二进制位数"""
+    values = values.copy()
+    length = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = values >= (np.uint64(1) << np.uint64(shift))
+        length[mask] += shift
+        values[mask] >>= np.uint64(shift)
+    length[values > 0] += 1
+    return length
+
+
+class HyperLogLog:
+    """HyperLogLog基数估计，可合并"""
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.num_registers = 1 << precision
+        self.registers = np.zeros(self.num_registers, dtype=np.uint8)
+
+    def update(self, values):
+        if len(values) == 0:
+            return self
+        hashes = _hash64(values)
+        p = np.uint64(self.precision)
+        index = (hashes >> (np.uint64(64) - p)).astype(np.int64)
+        remainder = hashes & ((np.uint64(1) << (np.uint64(64) - p)) - np.uint64(1))
+        rank = (64 - self.precision) - _bit_length(remainder) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+        return self
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("只能合并精度相同的HyperLogLog")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = self.num_registers
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = np.count_nonzero(self.registers == 0)
+        if raw <= 2.5 * m and zeros > 0:
+            # 小基数时使用线性计数修正
+            return m * np.log(m / zeros)
+        return raw
+
+    def __len__(self):
+        return int(round(self.estimate()))
+
+
+class KLLSketch:
+    """KLL分位数草图，可合并，内存与数据量近似无关"""
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.count = 0
+        self.compactors = [np.empty(0, dtype=np.float64)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.compactors[0] = np.concatenate([self.compactors[0], values])
+        self.count += len(values)
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self.compactors):
+            items = self.compactors[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append(np.empty(0, dtype=np.float64))
+                # 排序后随机保留奇数位或偶数位，权重翻倍提升到上一层
+                items = np.sort(items)
+                keep_odd = len(items) % 2
+                if keep_odd:
+                    leftover, items = items[-1:], items[:-1]
+                else:
+                    leftover = items[:0]
+                promoted = items[self._rng.integers(2)::2]
+                self.compactors[level] = leftover
+                self.compactors[level + 1] = np.concatenate([self.compactors[level + 1], promoted])
+            level += 1
+
+    def merge(self, other):
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append(np.empty(0, dtype=np.float64))
+        for level, items in enumerate(other.compactors):
+            self.compactors[level] = np.concatenate([self.compactors[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """返回分位数，q可以是标量或数组"""
+        items = np.concatenate(self.compactors)
+        if len(items) == 0:
+            return np.nan if np.isscalar(q) else np.full(len(q), np.nan)
+        weights = np.concatenate([np.full(len(c), 2.0 ** level) for level, c in enumerate(self.compactors)])
+        order = np.argsort(items, kind='stable')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, np.asarray(q) * cumulative[-1], side='left')
+        return items[np.minimum(positions, len(items) - 1)]
+
+    @property
+    def size(self):
+        return sum(len(c) for c in self.compactors)
+
+
+class AreaStatisticsSketch:
+    """按技术领域维护的流式统计草图：申请人去重计数 + 指标分位数"""
+
+    QUANTILE_COLUMNS = ['quality_score', 'citations', 'market_potential']
+
+    def __init__(self, precision=12, k=200):
+        self.precision = precision
+        self.k = k
+        self.areas = {}
+
+    def _area(self, area):
+        if area not in self.areas:
+            self.areas[area] = {
+                'count': 0,
+                'applicants': HyperLogLog(self.precision),
+                **{column: KLLSketch(self.k) for column in self.QUANTILE_COLUMNS}
+            }
+        return self.areas[area]
+
+    def update(self, df_patents):
+        """增量更新一个批次的专利数据"""
+        for area, group in df_patents.groupby('tech_area', sort=False):
+            sketch = self._area(area)
+            sketch['count'] += len(group)
+            if 'applicant' in group:
+                sketch['applicants'].update(group['applicant'].values)
+            for column in self.QUANTILE_COLUMNS:
+                if column in group:
+                    sketch[column].update(group[column].values)
+        return self
+
+    def merge(self, other):
+        """合并另一个分片的草图"""
+        for area, other_sketch in other.areas.items():
+            sketch = self._area(area)
+            sketch['count'] += other_sketch['count']
+            sketch['applicants'].merge(other_sketch['applicants'])
+            for column in self.QUANTILE_COLUMNS:
+                sketch[column].merge(other_sketch[column])
+        return self
+
+    def distinct_applicants(self, area):
+        if area not in self.areas:
+            return 0
+        return len(self.areas[area]['applicants'])
+
+    def quantiles(self, area, column, qs=(0.5, 0.9)):
+        if area not in self.areas:
+            return [np.nan] * len(qs)
+        return list(self.areas[area][column].quantile(np.asarray(qs)))
+
+    def summary(self, qs=(0.5, 0.9)):
+        """汇总每个领域的计数、去重申请人数和分位数"""
+        rows = []
+        for area, sketch in self.areas.items():
+            row = {
+                'tech_area': area,
+                'patent_count': sketch['count'],
+                'distinct_applicants': len(sketch['applicants'])
+            }
+            for column in self.QUANTILE_COLUMNS:
+                for q, value in zip(qs, sketch[column].quantile(np.asarray(qs))):
+                    row[f'{column}_p{int(q * 100)}'] = value
+            rows.append(row)
+        return pd.DataFrame(rows)
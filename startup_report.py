@@ -0,0 +1,90 @@
+# startup_report.py
+"""冷启动导入耗时报告：在独立子进程中用 `python -X importtime` 测量各模块的导入耗时，
+并检查是否意外加载了重量级依赖
+
+示例:
+    python startup_report.py
+    python startup_report.py engine batch_scoring --repeat 5 --json startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+DEFAULT_MODULES = ['engine', 'data_generation', 'data_fetcher', 'batch_scoring', 'api_server', 'scenario', 'matching']
+
+# 只应在实际使用它们的代码路径中加载的依赖
+HEAVY_DEPENDENCIES = ['sklearn', 'faker', 'plotly', 'requests', 'bs4', 'streamlit', 'scipy']
+
+
+def measure_import(module, python=sys.executable):
+    """在新进程中导入模块，返回 (总耗时毫秒, {顶层包: 耗时毫秒})"""
+    result = subprocess.run(
+        [python, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr.strip().splitlines()[-1]}")
+
+    packages = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        self_us, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue  # 表头
+        # 按顶层包汇总各模块自身耗时，所有模块的自身耗时之和即为总耗时
+        top = name.strip().split('.')[0]
+        packages[top] = packages.get(top, 0) + int(self_us) / 1000
+        if name.strip() == module and not name[1:].startswith(' '):
+            total_us = int(cumulative)
+    return total_us / 1000, packages
+
+
+def build_report(modules, repeat=3):
+    """每个模块重复测量取最小值，降低磁盘缓存等噪声"""
+    report = []
+    for module in modules:
+        runs = [measure_import(module) for _ in range(repeat)]
+        total_ms, packages = min(runs, key=lambda run: run[0])
+        heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:5]
+        report.append({
+            'module': module,
+            'import_ms': round(total_ms, 1),
+            'heavy_dependencies_loaded': sorted(dep for dep in HEAVY_DEPENDENCIES if dep in packages),
+            'heaviest_imports': [{'package': name, 'ms': round(ms, 1)} for name, ms in heaviest]
+        })
+    return report
+
+
+def print_report(report):
+    print(f"{'模块':<18}{'导入耗时(ms)':>14}  已加载的重量级依赖")
+    print("-" * 60)
+    for row in report:
+        loaded = ', '.join(row['heavy_dependencies_loaded']) or '-'
+        print(f"{row['module']:<18}{row['import_ms']:>14.1f}  {loaded}")
+    print("\n最耗时的导入:")
+    for row in report:
+        items = ', '.join(f"{item['package']} {item['ms']:.0f}ms" for item in row['heaviest_imports'])
+        print(f"  {row['module']}: {items}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="IP机会发现平台 - 冷启动导入耗时报告")
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES, help="要测量的模块")
+    parser.add_argument('--repeat', type=int, default=3, help="每个模块的测量次数（取最小值）")
+    parser.add_argument('--json', help="把报告另存为JSON文件")
+    args = parser.parse_args(argv)
+
+    report = build_report(args.modules, args.repeat)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+# stub_server.py
+"""本地故障注入桩服务器：模拟 NoKeyDataFetcher 的HTTP数据源，可按数据源注入错误、延迟和挂起，
+用于验证熔断、重试和对冲请求
+
+    python stub_server.py --port 8765 --fault opendata:error_rate=0.5 --fault academic:latency=0.3
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+SOURCE_PATHS = {'opendata': '/opendata', 'academic': '/academic', 'statistics': '/statistics'}
+
+
+class FaultProfile:
+    """一个数据源的故障配置：error_rate 概率返回 status，hang_rate 概率挂起 hang_seconds 秒，其余请求延迟 latency 秒"""
+
+    def __init__(self, error_rate=0.0, latency=0.0, hang_rate=0.0, hang_seconds=30.0, status=503):
+        self.error_rate = error_rate
+        self.latency = latency
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.status = status
+
+
+class FaultInjectingStubServer:
+    """在后台线程中运行的桩服务器，数据由 NoKeyDataFetcher 的内置实现生成"""
+
+    def __init__(self, host='127.0.0.1', port=0, seed=None):
+        from data_fetcher import NoKeyDataFetcher
+
+        self.host = host
+        self.port = port
+        self.faults = {}
+        # 专利数据源的响应格式：json（默认）或 xml（批量XML）
+        self.formats = {}
+        self.requests = {name: 0 for name in SOURCE_PATHS}
+        self.random = random.Random(seed)
+        self._fetcher = NoKeyDataFetcher()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def set_fault(self, source, **profile):
+        self.faults[source] = FaultProfile(**profile)
+
+    def clear_faults(self):
+        self.faults = {}
+
+    def set_format(self, source, fmt):
+        self.formats[source] = fmt
+
+    @property
+    def base_url(self):
+        return f'http://{self.host}:{self.port}'
+
+    def source_urls(self):
+        """可直接传给 NoKeyDataFetcher(source_urls=...) 的数据源地址"""
+        return {name: self.base_url + path for name, path in SOURCE_PATHS.items()}
+
+    def _payload(self, source, params):
+        if source == 'statistics':
+            data = self._fetcher._fetch_public_statistics(params.get('industry', 'AI'))
+            data.pop('update_time', None)
+            return data
+        tech_area = params.get('tech_area', 'AI')
+        since = pd.Timestamp(params['since']) if 'since' in params else None
+        if source == 'opendata':
+            patents = self._fetcher._fetch_from_opendata(tech_area, since=since)
+        else:
+            patents = self._fetcher._fetch_from_academic_sources(tech_area, since=since)
+        patents['filing_date'] = pd.to_datetime(patents['filing_date']).dt.strftime('%Y-%m-%d')
+        return patents.to_dict(orient='records')
+
+    def _handle(self, handler):
+        url = urlparse(handler.path)
+        source = next((name for name, path in SOURCE_PATHS.items() if path == url.path), None)
+        if source is None:
+            handler.send_error(404)
+            return
+        with self._lock:
+            self.requests[source] += 1
+            draw = self.random.random()
+        fault = self.faults.get(source, FaultProfile())
+        if draw < fault.hang_rate:
+            time.sleep(fault.hang_seconds)
+        elif draw < fault.hang_rate + fault.error_rate:
+            handler.send_error(fault.status)
+            return
+        time.sleep(fault.latency)
+
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        payload = self._payload(source, params)
+        if self.formats.get(source) == 'xml' and source != 'statistics':
+            from io import BytesIO
+
+            from stream_parser import write_patent_xml
+
+            buffer = BytesIO()
+            write_patent_xml(pd.DataFrame(payload), buffer)
+            body, content_type = buffer.getvalue(), 'application/xml'
+        else:
+            body, content_type = json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json; charset=utf-8'
+        handler.send_response(200)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def start(self):
+        """启动服务器并返回 base_url（port=0 时自动分配端口）"""
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                try:
+                    stub._handle(self)
+                except (BrokenPipeError, ConnectionResetError):
+                    # 客户端已超时断开
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self._fetcher.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _parse_fault(text):
+    """'opendata:error_rate=0.5,latency=0.2' -> ('opendata', {...})"""
+    source, _, settings = text.partition(':')
+    profile = {}
+    for item in filter(None, settings.split(',')):
+        key, _, value = item.partition('=')
+        profile[key] = int(value) if key == 'status' else float(value)
+    return source, profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description='故障注入数据源桩服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--fault', action='append', default=[],
+                        help='数据源故障配置，如 opendata:error_rate=0.5,latency=0.2,hang_rate=0.1')
+    args = parser.parse_args()
+
+    server = FaultInjectingStubServer(args.host, args.port, seed=args.seed)
+    for text in args.fault:
+        source, profile = _parse_fault(text)
+        server.set_fault(source, **profile)
+    server.start()
+    print(f"桩服务器已启动: {server.base_url}")
+    for name, url in server.source_urls().items():
+        print(f"  {name}: {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
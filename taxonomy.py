@@ -0,0 +1,240 @@
+# taxonomy.py
+"""技术领域分类注册表：把各数据来源使用的领域名称（生成数据的 'AI and Machine Learning'、
+抓取器的 'AI'/'Biotech'、财务指标的 '区块链'/'生物科技' 等）统一映射到规范名称和稳定的整数编号
+
+领域编号和细分方向编号按 CANONICAL_AREAS 的顺序固定分配；别名可以指向领域，
+也可以指向某个细分方向（例如 'Blockchain' -> FinTech / Blockchain）。
+未登记的名称在入库（canonicalize_*）时按顺序追加编号（进程内稳定），不会被静默丢弃；
+查询接口（area_id、canonical_area 等）默认不注册新名称，拼写错误不会污染注册表。
+"""
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+# 规范领域名称 -> 细分方向（与 data_generation.DataGenerator.tech_hierarchy 一致）
+CANONICAL_AREAS = {
+    'FinTech': ['Digital Payments', 'Blockchain', 'WealthTech', 'InsurTech', 'RegTech'],
+    'AI and Machine Learning': ['Computer Vision', 'NLP', 'Predictive Analytics', 'Autonomous Systems', 'Deep Learning'],
+    'Biotechnology': ['Genomics', 'Drug Discovery', 'Medical Devices', 'Biomaterials', 'Bioinformatics'],
+    'Smart City': ['Smart Mobility', 'Energy Management', 'Urban Analytics', 'Public Safety', 'IoT Infrastructure'],
+    'HealthTech': ['Telemedicine', 'EHR Systems', 'Medical Imaging', 'Wearable Devices', 'Health Analytics'],
+    'Green Technology': ['Renewable Energy', 'Energy Storage', 'Carbon Capture', 'Waste Management', 'Sustainable Materials'],
+    'EdTech': ['Online Learning', 'Educational Games', 'Learning Analytics', 'VR Education', 'Adaptive Learning'],
+    'Logistics Technology': ['Supply Chain', 'Last-mile Delivery', 'Warehouse Automation', 'Fleet Management', 'Logistics Analytics'],
+    'Cybersecurity': ['Network Security', 'Data Protection', 'Threat Intelligence', 'Identity Management', 'Cloud Security'],
+    'Quantum Computing': ['Quantum Algorithms', 'Quantum Hardware', 'Quantum Cryptography', 'Quantum Simulation']
+}
+
+# 领域别名（大小写、空格、连字符不敏感）
+AREA_ALIASES = {
+    'FinTech': ['Financial Technology', '金融科技'],
+    'AI and Machine Learning': ['AI', 'Artificial Intelligence', 'Machine Learning', 'AI & ML', '人工智能'],
+    'Biotechnology': ['Biotech', '生物科技', '生物技术'],
+    'Smart City': ['智慧城市'],
+    'HealthTech': ['Health Technology', '医疗科技'],
+    'Green Technology': ['Green Tech', 'Cleantech', '绿色科技'],
+    'EdTech': ['Education Technology', '教育科技'],
+    'Logistics Technology': ['Logistics', '物流科技'],
+    'Cybersecurity': ['Cyber Security', '网络安全'],
+    'Quantum Computing': ['Quantum', '量子计算']
+}
+
+# 指向细分方向的别名：别名 -> (领域, 细分方向)
+SUBCATEGORY_ALIASES = {
+    'Blockchain': ('FinTech', 'Blockchain'),
+    '区块链': ('FinTech', 'Blockchain'),
+    'Energy': ('Green Technology', 'Renewable Energy'),
+    '新能源': ('Green Technology', 'Renewable Energy'),
+    'IoT': ('Smart City', 'IoT Infrastructure'),
+    '物联网': ('Smart City', 'IoT Infrastructure')
+}
+
+UNKNOWN = -1
+CODE_DTYPE = np.int16
+
+_SEPARATORS = re.compile(r'[\s_\-]+')
+
+
+def _key(name):
+    return _SEPARATORS.sub(' ', str(name).strip()).casefold()
+
+
+def _same_codes(df, column, expected):
+    """df 中已有的编号列是否与由名称推导出的编号一致"""
+    if column not in df:
+        return False
+    stored = df[column].to_numpy()
+    return len(stored) == len(expected) and not pd.isna(stored).any() and np.array_equal(stored.astype(np.int64), expected)
+
+
+class TaxonomyRegistry:
+    """别名 -> (领域编号, 细分方向编号) 的注册表；细分方向编号为全局编号，UNKNOWN 表示无"""
+
+    def __init__(self, areas=None, area_aliases=None, subcategory_aliases=None):
+        areas = CANONICAL_AREAS if areas is None else areas
+        self.area_names = []
+        self.subcategory_names = []
+        self.subcategory_area = []
+        self._aliases = {}
+        self._subcategories = {}
+        self._lock = threading.Lock()
+        for area, subcategories in areas.items():
+            area_id = self._add_area(area)
+            for subcategory in subcategories:
+                self._add_subcategory(area_id, subcategory)
+        for area, aliases in (AREA_ALIASES if area_aliases is None else area_aliases).items():
+            for alias in aliases:
+                self._aliases.setdefault(_key(alias), (self.area_id(area), UNKNOWN))
+        for alias, (area, subcategory) in (SUBCATEGORY_ALIASES if subcategory_aliases is None else subcategory_aliases).items():
+            self._aliases.setdefault(_key(alias), (self.area_id(area), self.subcategory_id(subcategory)))
+
+    def _add_area(self, name):
+        area_id = len(self.area_names)
+        self.area_names.append(name)
+        self._aliases[_key(name)] = (area_id, UNKNOWN)
+        return area_id
+
+    def _add_subcategory(self, area_id, name):
+        subcategory_id = len(self.subcategory_names)
+        self.subcategory_names.append(name)
+        self.subcategory_area.append(area_id)
+        self._subcategories[_key(name)] = subcategory_id
+        return subcategory_id
+
+    def resolve(self, name, register=False):
+        """名称 -> (领域编号, 细分方向编号)；未登记的名称返回 UNKNOWN（register=True 时按新领域注册）"""
+        if name is None or (isinstance(name, float) and np.isnan(name)):
+            return UNKNOWN, UNKNOWN
+        key = _key(name)
+        resolved = self._aliases.get(key)
+        if resolved is None:
+            if not register:
+                return UNKNOWN, UNKNOWN
+            with self._lock:
+                resolved = self._aliases.get(key)
+                if resolved is None:
+                    resolved = (self._add_area(str(name).strip()), UNKNOWN)
+        return resolved
+
+    def area_id(self, name, register=False):
+        return self.resolve(name, register)[0]
+
+    def subcategory_id(self, name):
+        """细分方向名称 -> 编号（也接受指向细分方向的领域别名），未知为 UNKNOWN"""
+        if name is None or (isinstance(name, float) and np.isnan(name)):
+            return UNKNOWN
+        subcategory_id = self._subcategories.get(_key(name))
+        if subcategory_id is None:
+            subcategory_id = self._aliases.get(_key(name), (UNKNOWN, UNKNOWN))[1]
+        return subcategory_id
+
+    def canonical_area(self, name, register=False):
+        """规范领域名称；空值和未登记的名称返回 None（register=True 时注册为新领域）"""
+        area_id = self.area_id(name, register)
+        return self.area_names[area_id] if area_id != UNKNOWN else None
+
+    def is_area_alias(self, name):
+        """名称是否指向整个领域（而不是某个细分方向）"""
+        area_id, subcategory_id = self.resolve(name)
+        return area_id != UNKNOWN and subcategory_id == UNKNOWN
+
+    def canonical_list(self, names, register=False):
+        """名称列表 -> 去重后的规范领域名称列表（保持顺序）"""
+        canonical = (self.canonical_area(name, register) for name in names)
+        return list(dict.fromkeys(name for name in canonical if name is not None))
+
+    def encode_areas(self, values, register=False):
+        """领域名称数组 -> 领域编号数组（int16）；只对去重后的取值查表"""
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+        lookup = np.fromiter((self.area_id(value, register) for value in uniques), dtype=CODE_DTYPE,
+                             count=len(uniques))
+        return np.append(lookup, CODE_DTYPE(UNKNOWN))[codes]
+
+    def canonicalize_patents(self, df, area_column='tech_area', subcategory_column='subcategory'):
+        """专利入库：领域名称换成规范名称，指向细分方向的别名补出细分方向，并添加整数编号列
+        area_id / subcategory_id；已经规范且编号与当前注册表一致的数据原样返回
+
+        非内置领域的编号按进程注册顺序分配，其他进程写出的快照中的编号不一定有效，因此总是由名称重新推导后再比较
+        """
+        if df is None or area_column not in df:
+            return df
+        codes, uniques = pd.factorize(df[area_column])
+        resolved = [self.resolve(value, register=True) for value in uniques]
+        area_lookup = np.array([r[0] for r in resolved] + [UNKNOWN], dtype=CODE_DTYPE)
+        canonical = [self.area_names[r[0]] for r in resolved]
+        renamed = any(name != value for name, value in zip(canonical, uniques))
+        alias_subcategories = np.array([r[1] for r in resolved] + [UNKNOWN], dtype=CODE_DTYPE)[codes]
+        area_ids = area_lookup[codes]
+
+        has_subcategory = subcategory_column in df
+        if has_subcategory:
+            sub_codes, sub_uniques = pd.factorize(df[subcategory_column])
+            sub_lookup = np.array([self.subcategory_id(value) for value in sub_uniques] + [UNKNOWN], dtype=CODE_DTYPE)
+            subcategory_ids = sub_lookup[sub_codes]
+        else:
+            subcategory_ids = np.full(len(df), UNKNOWN, dtype=CODE_DTYPE)
+        # 'Blockchain' 等细分方向别名：没有细分方向时由别名补出
+        missing = df[subcategory_column].isna().to_numpy() if has_subcategory else np.ones(len(df), dtype=bool)
+        fill = missing & (alias_subcategories != UNKNOWN)
+
+        if not renamed and not fill.any() and _same_codes(df, 'area_id', area_ids) \
+                and (not has_subcategory or _same_codes(df, 'subcategory_id', subcategory_ids)):
+            return df
+
+        columns = {'area_id': area_ids}
+        if renamed:
+            columns[area_column] = np.append(np.array(canonical, dtype=object), None)[codes]
+        if fill.any():
+            subcategory_ids = np.where(fill, alias_subcategories, subcategory_ids).astype(CODE_DTYPE)
+            names = df[subcategory_column].to_numpy(dtype=object).copy() if has_subcategory \
+                else np.full(len(df), None, dtype=object)
+            names[fill] = np.asarray(self.subcategory_names, dtype=object)[subcategory_ids[fill]]
+            columns[subcategory_column] = names
+        if has_subcategory or fill.any():
+            columns['subcategory_id'] = subcategory_ids
+        return df.assign(**columns)
+
+    def canonicalize_market(self, df, area_column='tech_area'):
+        """市场数据的领域名称换成规范名称（同一领域的多个别名行保留第一行）"""
+        if df is None or area_column not in df or len(df) == 0:
+            return df
+        canonical = df[area_column].map(lambda value: self.canonical_area(value, register=True))
+        if canonical.equals(df[area_column]):
+            return df
+        result = df.assign(**{area_column: canonical})
+        keys = [area_column, 'year'] if 'year' in df else [area_column]
+        return result.drop_duplicates(keys).reset_index(drop=True)
+
+    def canonicalize_investors(self, df, column='focus_areas'):
+        """投资者关注领域列表换成规范名称"""
+        if df is None or column not in df or len(df) == 0:
+            return df
+        original = df[column]
+        focus = original.map(lambda areas: self.canonical_list(areas, register=True)
+                             if isinstance(areas, (list, tuple, np.ndarray))
+                             else areas)
+        if all(not isinstance(new, list) or new == list(old) for new, old in zip(focus, original)):
+            return df
+        return df.assign(**{column: focus})
+
+    def to_frame(self):
+        """注册表内容：每个细分方向一行（没有细分方向的领域一行）"""
+        records = [(self.subcategory_area[i], self.area_names[self.subcategory_area[i]], i, name)
+                   for i, name in enumerate(self.subcategory_names)]
+        with_subcategories = set(self.subcategory_area)
+        records += [(i, name, UNKNOWN, None) for i, name in enumerate(self.area_names) if i not in with_subcategories]
+        return pd.DataFrame(records, columns=['area_id', 'tech_area', 'subcategory_id', 'subcategory']) \
+            .sort_values(['area_id', 'subcategory_id'], kind='stable').reset_index(drop=True)
+
+
+_DEFAULT_TAXONOMY = None
+
+
+def get_taxonomy():
+    """进程内共享的默认注册表"""
+    global _DEFAULT_TAXONOMY
+    if _DEFAULT_TAXONOMY is None:
+        _DEFAULT_TAXONOMY = TaxonomyRegistry()
+    return _DEFAULT_TAXONOMY
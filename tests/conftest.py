@@ -0,0 +1,19 @@
+# tests/conftest.py
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def dataset():
+    """固定随机种子生成的 (专利, 市场, 投资者) 数据"""
+    from data_generation import generate_patent_data
+
+    np.random.seed(0)
+    random.seed(0)
+    return generate_patent_data(3000)
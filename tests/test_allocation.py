@@ -0,0 +1,64 @@
+# tests/test_allocation.py
+import numpy as np
+import pytest
+
+from allocation import InvestorAllocator, investor_capacities, parse_investment_capacity
+from engine import PatentAnalyzer
+
+
+@pytest.fixture(scope='module')
+def analyzer(dataset):
+    return PatentAnalyzer(*dataset)
+
+
+@pytest.fixture(scope='module')
+def allocator(analyzer):
+    return InvestorAllocator(analyzer, chunk_size=4)
+
+
+def test_parse_investment_capacity():
+    assert parse_investment_capacity('10-50M HKD') == 50
+    assert parse_investment_capacity('<5M') == 5
+    assert parse_investment_capacity(12) == 12.0
+    assert np.isnan(parse_investment_capacity('undisclosed'))
+
+
+def test_match_scores_agree_with_recommend_investors(analyzer, allocator):
+    scores = allocator.match_scores()
+    names = analyzer.df_investors['name'].to_numpy()
+    for j, area in enumerate(allocator.areas):
+        recommended = {r['investor_name']: r['match_score'] for r in analyzer.recommend_investors(area, max_investors=len(names))}
+        expected = {name: round(float(score), 1) for name, score in zip(names, scores[:, j]) if score >= 40}
+        assert recommended == expected
+
+
+def test_allocation_respects_capacities_and_needs(analyzer, allocator):
+    result = allocator.allocate()
+    allocations = result['allocations']
+    capacities = investor_capacities(analyzer.df_investors)
+    by_investor = allocations.groupby('investor_id')['amount'].sum()
+    limits = dict(zip(analyzer.df_investors['investor_id'], capacities))
+    assert all(amount <= limits[investor] + 1e-9 for investor, amount in by_investor.items())
+
+    areas = result['areas'].set_index('tech_area')
+    by_area = allocations.groupby('tech_area')['amount'].sum().reindex(areas.index, fill_value=0)
+    np.testing.assert_allclose(by_area, areas['allocated'])
+    assert (areas['allocated'] <= areas['need'] + 1e-9).all()
+    assert (allocations['match_score'] >= 40).all()
+    assert result['total_score'] == pytest.approx((allocations['match_score'] * allocations['amount']).sum())
+
+
+def test_max_areas_per_investor(allocator):
+    allocations = allocator.allocate(max_areas_per_investor=1)['allocations']
+    assert allocations['investor_id'].value_counts().max() == 1
+    assert allocator.allocate()['allocations']['investor_id'].value_counts().max() > 1
+
+
+def test_ties_are_broken_by_investor_row_and_result_is_deterministic(analyzer, allocator):
+    # 三个同类型投资者对该领域的分数相同，按行号依次分配
+    result = allocator.allocate(needs={'AI and Machine Learning': 60})
+    allocations = result['allocations']
+    assert list(allocations['investor_id']) == ['VC_Firm_1_1', 'VC_Firm_1_2']
+    assert list(allocations['amount']) == [50, 10]
+    repeated = InvestorAllocator(analyzer, chunk_size=1000).allocate(needs={'AI and Machine Learning': 60})
+    assert repeated['allocations'].equals(allocations)
@@ -0,0 +1,123 @@
+# tests/test_api_server.py
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+import pytest
+
+from api_server import create_server
+from engine import PatentAnalyzer
+
+
+@pytest.fixture(scope='module')
+def analyzer(dataset):
+    return PatentAnalyzer(*dataset)
+
+
+@pytest.fixture(scope='module')
+def base_url(analyzer):
+    server = create_server(analyzer, port=0, quiet=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.api.shutdown()
+    server.server_close()
+
+
+def _get(url, headers=None):
+    try:
+        with urlopen(Request(url, headers=headers or {})) as response:
+            return response.status, dict(response.headers), response.read()
+    except HTTPError as e:
+        return e.code, dict(e.headers), e.read()
+
+
+def test_etag_and_not_modified(base_url):
+    status, headers, body = _get(base_url + '/opportunities?top_k=3')
+    assert status == 200
+    assert len(json.loads(body)['opportunities']) == 3
+    etag = headers['ETag']
+    status, headers, body = _get(base_url + '/opportunities?top_k=3', {'If-None-Match': etag})
+    assert status == 304
+    assert headers['ETag'] == etag
+    assert body == b''
+    status, _, _ = _get(base_url + '/opportunities?top_k=4', {'If-None-Match': etag})
+    assert status == 200
+
+
+def test_area_parameters_accept_aliases(base_url):
+    _, _, canonical = _get(base_url + '/investors?tech_area=AI%20and%20Machine%20Learning')
+    _, _, alias = _get(base_url + '/investors?tech_area=AI')
+    _, _, chinese = _get(base_url + '/investors?tech_area=' + quote('人工智能'))
+    assert json.loads(alias) == json.loads(canonical) == json.loads(chinese)
+    assert json.loads(alias)['tech_area'] == 'AI and Machine Learning'
+    status, _, body = _get(base_url + '/market-insights?tech_area=Biotech')
+    assert status == 200 and json.loads(body)['tech_area'] == 'Biotechnology'
+
+
+def test_docstring_investor_id_and_errors(base_url):
+    status, _, body = _get(base_url + '/recommendations?investor_id=VC_Firm_1_1&top_k=3')
+    assert status == 200 and len(json.loads(body)['recommendations']) == 3
+    assert _get(base_url + '/recommendations?investor_id=INV_0001')[0] == 404
+    assert _get(base_url + '/investors')[0] == 400
+    assert _get(base_url + '/nope')[0] == 404
+
+
+def test_lazy_caches_are_built_once_under_concurrency(dataset):
+    analyzer = PatentAnalyzer(*dataset)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        indexes = list(pool.map(lambda _: analyzer.get_query_index(), range(16)))
+        tables = list(pool.map(lambda _: analyzer.get_scoring_table(), range(16)))
+    assert all(index is indexes[0] for index in indexes)
+    assert all(table is tables[0] for table in tables)
+
+
+def test_health_with_out_of_core_analyzer(dataset, tmp_path):
+    from api_server import OpportunityApi
+    from out_of_core import OutOfCorePatentAnalyzer
+
+    df_patents, df_market, df_investors = dataset
+    path = tmp_path / 'patents.parquet'
+    df_patents.to_parquet(path)
+    api = OpportunityApi(OutOfCorePatentAnalyzer(str(path), df_market, df_investors, chunk_size=1000))
+    try:
+        assert api.health({})['patents'] == len(df_patents)
+    finally:
+        api.shutdown()
+
+
+def test_investor_changes_invalidate_cached_responses(dataset):
+    from api_server import OpportunityApi
+
+    df_patents, df_market, df_investors = dataset
+    analyzer = PatentAnalyzer(df_patents, df_market, df_investors)
+    api = OpportunityApi(analyzer)
+    try:
+        params = {'tech_area': 'AI', 'max_investors': '50'}
+        _, before = api.handle('/investors', params)
+        version = analyzer.dataset_version
+        analyzer.df_investors = df_investors.iloc[: len(df_investors) // 2]
+        assert analyzer.dataset_version == version
+        _, after = api.handle('/investors', params)
+        expected = analyzer.recommend_investors('AI and Machine Learning', 50)
+        assert len(json.loads(after)['investors']) == len(expected) < len(json.loads(before)['investors'])
+    finally:
+        api.shutdown()
+
+
+def test_nan_is_rendered_as_null(analyzer):
+    import numpy as np
+    from api_server import OpportunityApi
+
+    api = OpportunityApi(analyzer)
+    try:
+        api.routes['/nan'] = lambda params: {'value': float('nan'), 'values': [np.float64('nan'), float('inf'), 1.5]}
+        _, body = api.handle('/nan', {})
+        assert json.loads(body) == {'value': None, 'values': [None, None, 1.5]}
+        assert b'NaN' not in body
+    finally:
+        api.shutdown()
@@ -0,0 +1,62 @@
+# tests/test_applicant_graph.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from applicant_graph import ApplicantGraph
+
+
+def _patents():
+    # A、B 在 (X, x1, 2019-2021) 分桶共现，B、C 在 (X, x2) 共现；D 独自在 Y 领域
+    return pd.DataFrame({
+        'applicant': ['A', 'A', 'B', 'B', 'C', 'D', 'D', 'E'],
+        'tech_area': ['X', 'X', 'X', 'X', 'X', 'Y', 'Y', 'Y'],
+        'subcategory': ['x1', 'x1', 'x1', 'x2', 'x2', 'y1', 'y1', 'y2'],
+        'year': [2019, 2020, 2021, 2020, 2020, 2020, 2021, 2020],
+        'collaboration_level': ['Single Entity', 'Multi-organization', 'Single Entity', 'Cross-border',
+                                'Single Entity', 'Single Entity', 'Single Entity', 'Single Entity'],
+        'research_institution': [False, False, True, False, False, True, True, False]
+    })
+
+
+def test_components_and_concentration():
+    graph = ApplicantGraph().update(_patents())
+    n_components, labels = graph.connected_components('X')
+    assert n_components == 1 and set(labels.index) == {'A', 'B', 'C'}
+    n_components, labels = graph.connected_components()
+    # A-B-C 连通，D 与 E 不在同一细分方向
+    assert n_components == 3
+
+    table = graph.concentration()
+    assert table.loc['X', 'patents'] == 5 and table.loc['X', 'applicants'] == 3
+    assert table.loc['X', 'hhi'] == pytest.approx((2 / 5) ** 2 + (2 / 5) ** 2 + (1 / 5) ** 2)
+    assert table.loc['Y', 'top_applicant'] == 'D' and table.loc['Y', 'cr3'] == 1.0
+    assert table.loc['Y', 'research_share'] == pytest.approx(2 / 3)
+    assert graph.area_hhi('Y') == pytest.approx((2 / 3) ** 2 + (1 / 3) ** 2)
+    assert graph.area_hhi('Z') is None
+
+
+def test_pagerank_matches_dense_power_iteration():
+    graph = ApplicantGraph().update(_patents())
+    ranks = graph.pagerank(damping=0.85)
+    _, weights, _ = graph._matrices()
+    w = weights.toarray()
+    transition = (w / w.sum(axis=1, keepdims=True)) @ (w / w.sum(axis=0, keepdims=True)).T
+    n = len(w)
+    expected = np.full(n, 1 / n)
+    for _ in range(1000):
+        expected = 0.85 * transition.T @ expected + 0.15 / n
+    np.testing.assert_allclose(ranks.loc[graph.applicant_names()].to_numpy(), expected, atol=1e-8)
+    assert ranks.sum() == pytest.approx(1.0)
+
+
+def test_incremental_updates_match_single_batch(dataset):
+    df_patents = dataset[0]
+    whole = ApplicantGraph().update(df_patents)
+    incremental = ApplicantGraph()
+    for start in range(0, len(df_patents), 700):
+        incremental.update(df_patents.iloc[start:start + 700])
+        incremental.concentration()
+    assert incremental.rows == whole.rows == len(df_patents)
+    pd.testing.assert_frame_equal(incremental.concentration(), whole.concentration())
+    pd.testing.assert_series_equal(incremental.pagerank().sort_index(), whole.pagerank().sort_index())
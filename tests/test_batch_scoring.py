@@ -0,0 +1,60 @@
+# tests/test_batch_scoring.py
+import json
+
+import pandas as pd
+import pytest
+
+from batch_scoring import build_parser, load_dataset, run, save_snapshot
+
+
+@pytest.fixture(scope='module')
+def snapshot(dataset, tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('snapshot'))
+    save_snapshot(directory, *dataset)
+    return directory
+
+
+def _run(*argv):
+    return run(build_parser().parse_args(list(argv)))
+
+
+def test_snapshot_run_writes_outputs_and_stats(snapshot, tmp_path):
+    output = str(tmp_path / 'out')
+    stats = _run('--source', 'snapshot', '--snapshot', snapshot, '--output', output, '--top-k', '3')
+    with open(tmp_path / 'out' / 'run_stats.json', encoding='utf-8') as f:
+        assert json.load(f) == stats
+    assert stats['rows']['patents'] == 3000 and stats['out_of_core'] is False
+    opportunities = pd.read_parquet(stats['outputs']['opportunities'])
+    assert len(opportunities) == stats['rows']['opportunities'] == 10
+    recommendations = pd.read_parquet(stats['outputs']['investor_recommendations'])
+    assert recommendations.groupby('investor_id')['rank'].max().max() <= 3
+
+
+def test_out_of_core_run_matches_in_memory(snapshot, tmp_path):
+    common = ['--source', 'snapshot', '--snapshot', snapshot, '--format', 'json']
+    in_memory = _run(*common, '--output', str(tmp_path / 'memory'))
+    chunked = _run(*common, '--output', str(tmp_path / 'chunked'), '--out-of-core', '--chunk-size', '700')
+    assert chunked['rows']['patents'] == in_memory['rows']['patents']
+    columns = ['tech_area', 'opportunity_score', 'cagr', 'market_size', 'patent_count']
+    expected = pd.read_json(in_memory['outputs']['opportunities'])[columns]
+    pd.testing.assert_frame_equal(pd.read_json(chunked['outputs']['opportunities'])[columns], expected)
+    expected = pd.read_json(in_memory['outputs']['area_investors'])
+    pd.testing.assert_frame_equal(pd.read_json(chunked['outputs']['area_investors']), expected)
+
+
+def test_file_source_parses_list_and_date_columns(dataset, tmp_path):
+    df_patents, df_market, df_investors = dataset
+    paths = [str(tmp_path / 'patents.csv'), str(tmp_path / 'market.csv'), str(tmp_path / 'investors.csv')]
+    for df, path in zip(dataset, paths):
+        df.to_csv(path, index=False)
+    args = build_parser().parse_args(['--source', 'file', '--patents', paths[0], '--market', paths[1], '--investors', paths[2]])
+    patents, _, investors = load_dataset(args)
+    assert pd.api.types.is_datetime64_any_dtype(patents['filing_date'])
+    assert investors['focus_areas'].tolist() == df_investors['focus_areas'].apply(list).tolist()
+
+
+def test_missing_arguments_exit():
+    with pytest.raises(SystemExit):
+        load_dataset(build_parser().parse_args(['--source', 'snapshot']))
+    with pytest.raises(SystemExit):
+        _run('--source', 'generated', '--out-of-core')
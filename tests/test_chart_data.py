@@ -0,0 +1,92 @@
+# tests/test_chart_data.py
+import numpy as np
+import pandas as pd
+
+from chart_data import ChartDataLayer, downsample_series, lttb
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x = np.arange(10_000)
+    y = np.sin(x / 500.0)
+    y[4321] = 50.0
+    keep = lttb(x, y, 200)
+    assert len(keep) == 200
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert (np.diff(keep) > 0).all()
+    assert 4321 in keep
+
+
+def test_lttb_returns_all_points_when_under_budget():
+    np.testing.assert_array_equal(lttb(np.arange(50), np.ones(50), 100), np.arange(50))
+    np.testing.assert_array_equal(lttb(np.arange(50), np.ones(50), 2), np.arange(50))
+
+
+def test_downsample_series_on_dates():
+    index = pd.date_range('2020-01-01', periods=3_000, freq='D')
+    values = np.arange(3_000) % 97
+    kept_index, kept_values = downsample_series(index, values, max_points=300)
+    assert isinstance(kept_index, pd.DatetimeIndex) and len(kept_index) == 300
+    assert kept_index[0] == index[0] and kept_index[-1] == index[-1]
+    np.testing.assert_array_equal(kept_values, pd.Series(values, index=index)[kept_index].to_numpy())
+
+
+class _Figure:
+    def __init__(self, name):
+        self.name = name
+
+    def to_json(self):
+        return self.name
+
+
+def test_figure_cache_builds_once_and_evicts_oldest(dataset):
+    layer = ChartDataLayer(dataset[0], dataset[1])
+    layer.FIGURE_CACHE_SIZE = 2
+    calls = []
+
+    def builder(name):
+        return lambda: calls.append(name) or _Figure(name)
+
+    assert layer.figure_spec('a', builder('a')) == 'a'
+    assert layer.figure_spec('a', builder('a')) == 'a'
+    layer.figure_spec('b', builder('b'))
+    layer.figure_spec('c', builder('c'))
+    layer.figure_spec('a', builder('a'))
+    assert calls == ['a', 'b', 'c', 'a']
+
+
+def test_filing_counts_match_pandas_resample(dataset):
+    df_patents = dataset[0]
+    assert pd.api.types.is_datetime64_any_dtype(df_patents['filing_date'])
+    layer = ChartDataLayer(df_patents, dataset[1])
+    for granularity, freq in [('month', 'MS'), ('quarter', 'QS'), ('year', 'YS')]:
+        counts = layer.filing_counts(granularity)
+        expected = (df_patents.groupby([pd.Grouper(key='filing_date', freq=freq), 'tech_area']).size()
+                    .unstack(fill_value=0).asfreq(freq, fill_value=0))
+        expected = expected.reindex(columns=counts.columns)
+        np.testing.assert_array_equal(counts.index, expected.index)
+        np.testing.assert_array_equal(counts.to_numpy(), expected.to_numpy())
+        assert counts.to_numpy().sum() == len(df_patents)
+
+
+def test_filing_counts_fall_back_to_year_without_dates():
+    df = pd.DataFrame({'tech_area': ['A', 'A', 'B'], 'year': [2020, 2022, 2022],
+                       'filing_date': [None, '2022-05-03', 'not a date']})
+    counts = ChartDataLayer(df, None).filing_counts('year')
+    assert list(counts.index.year) == [2020, 2021, 2022]
+    assert counts['A'].tolist() == [1, 0, 1] and counts['B'].tolist() == [0, 0, 1]
+
+
+def test_filing_growth():
+    from chart_data import filing_growth
+
+    index = pd.date_range('2021-01-01', periods=36, freq='MS')
+    counts = pd.DataFrame({'A': np.arange(1, 37), 'B': np.r_[np.zeros(24, dtype=int), np.full(12, 5)]}, index=index)
+    growth = filing_growth(counts, 'month')
+    assert growth.loc['A', 'latest_count'] == 36
+    assert growth.loc['A', 'period_growth'] == 36 / 35 - 1
+    assert growth.loc['A', 'yoy_growth'] == 36 / 24 - 1
+    assert growth.loc['A', 'window_growth'] == counts['A'].iloc[24:].sum() / counts['A'].iloc[12:24].sum() - 1
+    # 前一窗口申请量为0时增长率无定义
+    assert np.isnan(growth.loc['B', 'window_growth'])
+    assert growth.loc['B', 'window_count'] == 60
+    assert growth['latest_period'].iloc[0] == index[-1]
@@ -0,0 +1,54 @@
+# tests/test_dedup.py
+import pandas as pd
+
+from dedup import PatentDeduplicator
+
+ABSTRACT = ("A method for training a convolutional neural network on distributed edge devices wherein each device "
+            "computes local gradients over sensor data compresses the gradients with adaptive quantization and "
+            "transmits them to a coordinator that aggregates the updates weights each contribution by data quality "
+            "and broadcasts the refined model so that inference latency drops while accuracy is preserved across "
+            "heterogeneous hardware with limited memory and intermittent network connectivity")
+
+
+def _patents(rows):
+    return pd.DataFrame(rows, columns=['patent_id', 'title', 'abstract', 'tech_area'])
+
+
+def test_exact_and_near_duplicates_are_dropped():
+    dedup = PatentDeduplicator()
+    dedup.add_corpus(_patents([('P1', 'Distributed edge training of neural networks', ABSTRACT, 'AI')]))
+    batch = _patents([
+        ('P1', 'Distributed edge training of neural networks', ABSTRACT, 'AI'),
+        ('Q7', 'Distributed edge training of neural networks', ABSTRACT.replace('limited', 'constrained'), 'AI'),
+        ('Q8', 'Solid state electrolyte for lithium batteries', 'A ceramic electrolyte layer with high ionic conductivity', 'AI'),
+    ])
+    kept = dedup.deduplicate(batch)
+    assert list(kept['patent_id']) == ['Q8']
+    assert dedup.last_report['exact_duplicates'] == 1
+    assert dedup.last_report['near_duplicates'] == 1
+    assert set(dedup.duplicate_log['duplicate_of']) == {'P1'}
+
+
+def test_near_duplicate_in_another_block_is_kept():
+    dedup = PatentDeduplicator()
+    dedup.add_corpus(_patents([('P1', 'Distributed edge training of neural networks', ABSTRACT, 'AI')]))
+    kept = dedup.deduplicate(_patents([('Q1', 'Distributed edge training of neural networks', ABSTRACT, 'IoT')]))
+    assert list(kept['patent_id']) == ['Q1']
+
+
+def test_empty_abstracts_do_not_count_as_matching():
+    # 标题的Jaccard相似度约为0.83：空摘要按相似度1.0计入时平均值会超过阈值0.9
+    base = 'adaptive beam forming antenna array for low earth orbit satellite ground station'
+    dedup = PatentDeduplicator()
+    dedup.add_corpus(_patents([('P1', base + ' terminals', '', 'AI')]))
+    kept = dedup.deduplicate(_patents([('Q1', base + ' gateways', '', 'AI'), ('Q2', '', None, 'AI')]))
+    assert list(kept['patent_id']) == ['Q1', 'Q2']
+    assert dedup.last_report['near_duplicates'] == 0
+
+
+def test_id_collision_with_different_content_is_renamed():
+    dedup = PatentDeduplicator()
+    dedup.add_corpus(_patents([('P1', 'Distributed edge training of neural networks', ABSTRACT, 'AI')]))
+    kept = dedup.deduplicate(_patents([('P1', 'Solid state electrolyte for lithium batteries', 'A ceramic electrolyte layer', 'AI')]))
+    assert list(kept['patent_id']) == ['P1-2']
+    assert dedup.last_report['id_collisions'] == 1
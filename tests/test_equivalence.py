@@ -0,0 +1,100 @@
+# tests/test_equivalence.py
+"""分块模式、多进程模式、保留窗口模式与内存模式的评分一致性"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import PatentAnalyzer
+from out_of_core import OutOfCorePatentAnalyzer
+from parallel import ParallelPatentAnalyzer, effective_shards
+
+# 去重申请人数在聚合模式下为HyperLogLog估计值，单独比较
+EXACT_COLUMNS = ['tech_area', 'opportunity_score', 'cagr', 'market_size', 'patent_count', 'trend_signal', 'risk_level']
+
+
+@pytest.fixture(scope='module')
+def reference(dataset):
+    analyzer = PatentAnalyzer(*dataset)
+    return analyzer, analyzer.rank_opportunities()
+
+
+def _assert_same_ranking(expected, actual):
+    pd.testing.assert_frame_equal(expected[EXACT_COLUMNS], actual[EXACT_COLUMNS], check_dtype=False)
+    np.testing.assert_allclose(actual['company_diversity'].astype(float),
+                               expected['company_diversity'].astype(float), rtol=0.02)
+
+
+def _assert_same_investors(expected, actual):
+    for area in expected.tech_areas:
+        assert actual.recommend_investors(area) == expected.recommend_investors(area)
+
+
+def test_out_of_core_matches_in_memory(dataset, reference, tmp_path):
+    df_patents, df_market, df_investors = dataset
+    path = tmp_path / 'patents.parquet'
+    df_patents.to_parquet(path)
+    analyzer = OutOfCorePatentAnalyzer(str(path), df_market, df_investors, chunk_size=700)
+    _assert_same_ranking(reference[1], analyzer.rank_opportunities())
+    _assert_same_investors(reference[0], analyzer)
+
+
+def test_parallel_matches_in_memory(dataset, reference):
+    df_patents, df_market, df_investors = dataset
+    analyzer = ParallelPatentAnalyzer(df_patents, df_market, df_investors, workers=2, min_rows_per_shard=500)
+    assert analyzer.shards == 2
+    _assert_same_ranking(reference[1], analyzer.rank_opportunities())
+    batch = analyzer.recommend_investors_batch()
+    for area in reference[0].tech_areas:
+        assert batch[area] == reference[0].recommend_investors(area)
+
+
+def test_parallel_keeps_canonical_details(dataset):
+    df_patents, df_market, df_investors = dataset
+    raw = df_patents.assign(tech_area=df_patents['tech_area'].replace({'AI and Machine Learning': 'AI'}))
+    analyzer = ParallelPatentAnalyzer(raw, df_market, df_investors, workers=2, min_rows_per_shard=500)
+    assert set(analyzer.df_patents['tech_area']) == set(analyzer.aggregates.tech_areas)
+    assert 'AI' not in set(analyzer.df_patents['tech_area'])
+
+
+def test_parallel_aggregates_skip_missing_years(dataset):
+    from aggregates import PatentAggregates
+    from parallel import build_aggregates_parallel
+
+    df_patents = dataset[0].copy()
+    df_patents['year'] = df_patents['year'].astype(float)
+    df_patents.loc[df_patents.index[::50], 'year'] = np.nan
+    expected = PatentAggregates().update(df_patents)
+    actual = build_aggregates_parallel(df_patents, workers=2, min_rows_per_shard=500)
+    assert actual.rows == expected.rows
+    assert actual.year_stats.index.get_level_values('year').min() >= df_patents['year'].min()
+    pd.testing.assert_frame_equal(actual.year_stats.sort_index(), expected.year_stats.sort_index())
+
+
+def test_effective_shards():
+    assert effective_shards(5_000, 4, 10_000) == 1
+    assert effective_shards(25_000, 4, 10_000) == 2
+    assert effective_shards(1_000_000, 4, 10_000) == 4
+
+
+def test_out_of_core_graph_includes_appended_batches(dataset, tmp_path):
+    df_patents, df_market, df_investors = dataset
+    path = tmp_path / 'patents.parquet'
+    df_patents.iloc[:2000].to_parquet(path)
+    analyzer = OutOfCorePatentAnalyzer(str(path), df_market, df_investors, chunk_size=700)
+    analyzer.append_patents(df_patents.iloc[2000:])
+    graph = analyzer.get_applicant_graph()
+    expected = PatentAnalyzer(*dataset).get_applicant_graph()
+    assert graph.rows == expected.rows == len(df_patents)
+    pd.testing.assert_frame_equal(graph.concentration(), expected.concentration())
+
+
+def test_out_of_core_without_tech_maturity(dataset, tmp_path):
+    df_patents, df_market, df_investors = dataset
+    path = tmp_path / 'patents.csv'
+    df_patents.drop(columns='tech_maturity').to_csv(path, index=False)
+    analyzer = OutOfCorePatentAnalyzer(str(path), df_market, df_investors, chunk_size=700)
+    expected = PatentAnalyzer(df_patents.drop(columns='tech_maturity'), df_market, df_investors).rank_opportunities()
+    _assert_same_ranking(expected, analyzer.rank_opportunities())
+    version = analyzer.dataset_version
+    analyzer.append_patents(df_patents.drop(columns='tech_maturity').head(10))
+    assert analyzer.dataset_version != version
@@ -0,0 +1,44 @@
+# tests/test_financials.py
+import pandas as pd
+
+from financials import (FINANCIAL_COLUMNS, FinancialMetricsProvider, calculate_financial_score,
+                        recommendation_category)
+
+AREAS = ['AI and Machine Learning', 'FinTech', 'Biotechnology', 'EdTech']
+
+
+def test_metrics_are_deterministic_and_independent_of_query_order():
+    table = FinancialMetricsProvider(seed=7).get_table(AREAS).set_index('tech_area')
+    other = FinancialMetricsProvider(seed=7)
+    # 先查询其他领域、再按相反顺序查询，结果不变
+    other.get_table(['Quantum Computing'])
+    reordered = other.get_table(AREAS[::-1]).set_index('tech_area')
+    pd.testing.assert_frame_equal(reordered.loc[AREAS], table)
+    assert not FinancialMetricsProvider(seed=8).get_table(AREAS).set_index('tech_area')[FINANCIAL_COLUMNS].equals(
+        table[FINANCIAL_COLUMNS])
+
+
+def test_metrics_fall_within_area_profiles():
+    metrics = FinancialMetricsProvider().get_metrics('FinTech')
+    # FinTech 使用 '区块链' 的区间
+    assert 60 <= metrics['gross_margin'] <= 90 and 25 <= metrics['net_margin'] <= 50
+    assert 40 <= metrics['roi'] <= 120 and 1 <= metrics['payback_period'] <= 4
+
+
+def test_save_and_load_round_trip(tmp_path):
+    provider = FinancialMetricsProvider()
+    table = provider.get_table(AREAS)
+    path = tmp_path / 'financials.json'
+    provider.save(path)
+    loaded = FinancialMetricsProvider.from_file(path)
+    pd.testing.assert_frame_equal(loaded.get_table(AREAS), table, check_dtype=False)
+    assert loaded.version.startswith('file-')
+    # 文件中没有的领域按默认区间补齐
+    assert len(loaded.get_table(AREAS + ['Smart City'])) == 5
+
+
+def test_score_and_recommendation_category():
+    df = pd.DataFrame({'gross_margin': [80, 50, 40, 20], 'net_margin': [40, 20, 12, 5],
+                       'roi': [120, 30, 22, 10], 'payback_period': [1, 5, 7, 9]})
+    assert list(calculate_financial_score(df)) == [50.6, 24.2, 17.6, 8.2]
+    assert list(recommendation_category(df)) == [0, 1, 2, 3]
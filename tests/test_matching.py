@@ -0,0 +1,27 @@
+# tests/test_matching.py
+import pandas as pd
+import pytest
+
+from engine import PatentAnalyzer
+
+
+@pytest.fixture(scope='module')
+def matcher(dataset):
+    return PatentAnalyzer(*dataset).get_preference_matcher()
+
+
+def test_cached_matches_are_not_shared_with_callers(matcher):
+    preferences = {'risk_tolerance': '适中', 'preferred_areas': ['FinTech']}
+    first = matcher.match(preferences, min_match=0)
+    expected = first['matches'].copy()
+    first['matches'].sort_values('tech_area', inplace=True)
+    first['matches']['match_percentage'] = 0
+    pd.testing.assert_frame_equal(matcher.match(preferences, min_match=0)['matches'], expected)
+
+
+def test_batch_agrees_with_single_match(matcher):
+    preferences = {'risk_tolerance': '积极', 'preferred_areas': ('Cybersecurity',)}
+    single = matcher.match(preferences, top_n=5, min_match=0)['matches']
+    batch = matcher.match_batch(pd.DataFrame([{'profile_id': 1, **preferences}]), top_n=5, min_match=0)
+    assert list(batch['tech_area']) == list(single['tech_area'])
+    assert list(batch['match_percentage']) == list(single['match_percentage'].round(1))
@@ -0,0 +1,43 @@
+# tests/test_memory_profile.py
+import json
+
+import numpy as np
+import pandas as pd
+
+from engine import PatentAnalyzer
+from memory_profile import MemoryMonitor, deep_sizeof, frame_memory
+
+
+def test_deep_sizeof_counts_shared_data_once():
+    array = np.zeros(100_000)
+    view = array[10:]
+    assert deep_sizeof(array) == array.nbytes
+    assert deep_sizeof(view) == array.nbytes
+    seen = set()
+    assert deep_sizeof(array, seen) == array.nbytes
+    assert deep_sizeof([array, view], seen) < 1_000
+    assert deep_sizeof({'a': array, 'b': array}) < array.nbytes + 1_000
+
+
+def test_frame_memory_matches_pandas():
+    df = pd.DataFrame({'x': np.arange(1_000), 'text': ['专利'] * 1_000})
+    memory = frame_memory(df)
+    assert memory['rows'] == 1_000
+    assert memory['bytes'] == int(df.memory_usage(deep=True).sum())
+    assert set(memory['columns']) == {'Index', 'x', 'text'}
+
+
+def test_report_covers_frames_caches_and_trend(dataset, tmp_path):
+    analyzer = PatentAnalyzer(*dataset)
+    analyzer.get_search_index()
+    monitor = MemoryMonitor(max_samples=3, report_path=str(tmp_path / 'memory.json'))
+    for _ in range(4):
+        monitor.record()
+    report = monitor.write_report(analyzer=analyzer, extra={'recent': dataset[0].head(10)})
+    with open(tmp_path / 'memory.json', encoding='utf-8') as f:
+        assert json.load(f) == report
+    assert report['frames']['df_patents']['rows'] == len(analyzer.df_patents)
+    assert report['frames']['recent']['rows'] == 10
+    assert report['structures']['_search_index'] > 0
+    assert report['process']['rss_mb'] > 0
+    assert report['process']['trend']['samples'] == 3
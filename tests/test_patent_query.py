@@ -0,0 +1,72 @@
+# tests/test_patent_query.py
+"""分页查询索引与 pandas 筛选 + 排序 + 切片的结果一致"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from patent_query import PatentQueryIndex
+
+
+@pytest.fixture(scope='module')
+def patents(dataset):
+    df = dataset[0].copy()
+    # 部分排序键缺失，缺失值应排在最后
+    df.loc[df.index[::37], 'quality_score'] = np.nan
+    return df
+
+
+def _expected_page(df, filters, sort_by, ascending, page, page_size):
+    mask = np.ones(len(df), dtype=bool)
+    for column, condition in filters.items():
+        if isinstance(condition, list):
+            mask &= df[column].isin(condition).to_numpy()
+        else:
+            mask &= df[column].between(*condition).to_numpy()
+    ranked = df[mask].sort_values(sort_by, ascending=ascending, kind='stable', na_position='last')
+    return list(ranked['patent_id'].iloc[(page - 1) * page_size:page * page_size]), int(mask.sum())
+
+
+@pytest.mark.parametrize('filters', [
+    {},
+    {'tech_area': ['FinTech', 'Cybersecurity']},
+    {'year': (2015, 2019), 'legal_status': ['Granted']},
+    {'quality_score': (50, 70), 'citations': (0, 20)},
+])
+@pytest.mark.parametrize('sort_by, ascending', [('quality_score', False), ('quality_score', True), ('citations', False)])
+def test_pages_match_pandas(patents, filters, sort_by, ascending):
+    index = PatentQueryIndex(patents)
+    _, total = _expected_page(patents, filters, sort_by, ascending, 1, 50)
+    pages = max(1, -(-total // 50))
+    # 第一页、中间页、跨过缓存前缀的页和最后一页（可能不满一页）
+    for page in sorted({1, 2, pages // 2 or 1, 6, pages}):
+        result = index.query(filters, sort_by=sort_by, ascending=ascending, page=page, page_size=50)
+        expected, expected_total = _expected_page(patents, filters, sort_by, ascending, result['page'], 50)
+        assert result['total'] == expected_total
+        assert list(result['rows']['patent_id']) == expected
+
+
+def test_ties_keep_row_order_and_nan_sorts_last(patents):
+    index = PatentQueryIndex(patents)
+    # citations 取值很少，几乎每个排序键都有并列
+    rows = index.query(sort_by='citations', ascending=False, page=1, page_size=len(patents))['rows']
+    expected = patents.sort_values('citations', ascending=False, kind='stable')
+    assert list(rows['patent_id']) == list(expected['patent_id'])
+    ranked = index.query(sort_by='quality_score', page=1, page_size=len(patents))['rows']['quality_score']
+    missing = int(patents['quality_score'].isna().sum())
+    assert missing > 0 and ranked.iloc[-missing:].isna().all() and ranked.iloc[:-missing].notna().all()
+
+
+def test_last_partial_page_and_out_of_range_page(patents):
+    index = PatentQueryIndex(patents)
+    result = index.query({'tech_area': ['FinTech']}, page=10_000, page_size=70)
+    total = int((patents['tech_area'] == 'FinTech').sum())
+    assert result['page'] == result['pages'] == -(-total // 70)
+    assert len(result['rows']) == total - (result['pages'] - 1) * 70
+
+
+def test_empty_result(patents):
+    index = PatentQueryIndex(patents)
+    result = index.query({'tech_area': ['No Such Area']}, page=3)
+    assert result['total'] == 0 and result['pages'] == 1 and result['page'] == 1
+    assert result['rows'].empty
+    assert index.query({'year': (2030, 2040)})['total'] == 0
@@ -0,0 +1,31 @@
+# tests/test_patent_similarity.py
+import tracemalloc
+
+import pytest
+
+from patent_similarity import PatentSimilarityModel
+
+
+@pytest.fixture(scope='module')
+def model(dataset):
+    return PatentSimilarityModel(dataset[0])
+
+
+def test_top_k_neighbors_match_most_similar(model):
+    neighbors = model.top_k_neighbors(top_k=5, memory_budget_mb=1)
+    for patent_id in model.patent_ids[:20]:
+        expected = model.most_similar(patent_id, top_k=5)
+        rows = neighbors[neighbors['patent_id'] == patent_id]
+        assert rows['similarity'].tolist() == pytest.approx([round(score, 4) for _, score in expected], abs=1e-4)
+        assert patent_id not in set(rows['similar_patent_id'])
+
+
+def test_top_k_neighbors_stays_within_memory_budget(model):
+    budget_mb = 16
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    model.top_k_neighbors(top_k=10, memory_budget_mb=budget_mb)
+    peak_mb = (tracemalloc.get_traced_memory()[1] - base) / 2 ** 20
+    tracemalloc.stop()
+    # 只允许转置矩阵和结果表这类与分块大小无关的少量额外占用
+    assert peak_mb < budget_mb * 1.25
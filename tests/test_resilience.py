@@ -0,0 +1,189 @@
+# tests/test_resilience.py
+"""熔断器、重试预算和对冲请求；端到端用例连接本地故障注入桩服务器"""
+import time
+
+import pytest
+
+from data_fetcher import NoKeyDataFetcher
+from resilience import CircuitBreaker, CircuitOpenError, RetryBudget, SourceError, SourceGuard
+from stub_server import FaultInjectingStubServer
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def stub():
+    with FaultInjectingStubServer(seed=0) as server:
+        yield server
+
+
+def _http_source(fetcher, stub, name):
+    return lambda tech_area: fetcher._fetch_http_patents(stub.source_urls()[name], tech_area)
+
+
+def test_breaker_opens_at_threshold_and_half_opens_after_timeout():
+    clock = _Clock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10.0, clock=clock)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    clock.now = 10.0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # 半开时只放行一个试探调用，试探失败后重新打开
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+
+def test_guard_short_circuits_failing_source(stub):
+    stub.set_fault('opendata', error_rate=1.0)
+    fetcher = NoKeyDataFetcher()
+    guard = SourceGuard(timeout=2.0, max_retries=0, failure_threshold=2, reset_timeout=30.0)
+    clock = _Clock()
+    guard._source('opendata')[0].clock = clock
+    source = _http_source(fetcher, stub, 'opendata')
+    try:
+        for _ in range(2):
+            with pytest.raises(SourceError):
+                guard.call('opendata', source, 'AI')
+        with pytest.raises(CircuitOpenError):
+            guard.call('opendata', source, 'AI')
+        assert stub.requests['opendata'] == 2
+
+        # 冷却后半开放行的试探调用成功，熔断器关闭
+        stub.clear_faults()
+        clock.now = 30.0
+        assert len(guard.call('opendata', source, 'AI')) > 0
+        assert guard.health()['opendata']['state'] == CircuitBreaker.CLOSED
+        assert stub.requests['opendata'] == 3
+    finally:
+        guard.shutdown()
+        fetcher.close()
+
+
+def test_builtin_source_errors_reach_the_guard(monkeypatch, capsys):
+    import data_fetcher
+
+    class _BrokenClock:
+        @staticmethod
+        def now():
+            raise ValueError('统计接口不可用')
+
+    fetcher = NoKeyDataFetcher(max_retries=0)
+    window_count = fetcher._window_count
+
+    def broken_window_count(name, since):
+        if name != 'generated':
+            raise ValueError(f'{name} 接口格式变化')
+        return window_count(name, since)
+
+    monkeypatch.setattr(fetcher, '_window_count', broken_window_count)
+    monkeypatch.setattr(data_fetcher, 'datetime', _BrokenClock)
+    monkeypatch.setattr(fetcher, '_generate_market_data', lambda industry: {'market_size': 100})
+    try:
+        # 内置数据源不再吞掉异常：由 SourceGuard 计入失败并记录，调用方退回模拟数据
+        assert fetcher.fetch_market_data('AI') == {'market_size': 100}
+        fetcher.fetch_patent_data('AI')
+        health = fetcher.source_health()
+        assert health[NoKeyDataFetcher.MARKET_SOURCE]['failures'] == 1
+        assert '统计接口不可用' in health[NoKeyDataFetcher.MARKET_SOURCE]['last_error']
+        assert health['opendata']['failures'] == 1 and health['academic']['failures'] == 1
+        output = capsys.readouterr().out
+        assert 'opendata 接口格式变化' in output and 'academic 接口格式变化' in output
+    finally:
+        fetcher.close()
+
+
+def test_retry_budget_caps_retries():
+    clock = _Clock()
+    budget = RetryBudget(ratio=0.5, min_retries=1, window=60.0, clock=clock)
+    for _ in range(4):
+        budget.record_request()
+    assert [budget.try_spend() for _ in range(4)] == [True, True, True, False]
+    clock.now = 61.0
+    assert budget.try_spend()
+
+
+def test_guard_retries_stop_when_budget_is_spent(stub):
+    stub.set_fault('academic', error_rate=1.0)
+    fetcher = NoKeyDataFetcher()
+    guard = SourceGuard(timeout=2.0, max_retries=5, backoff_base=0.0, failure_threshold=100, retry_ratio=0.0)
+    source = _http_source(fetcher, stub, 'academic')
+    try:
+        with pytest.raises(SourceError):
+            guard.call('academic', source, 'AI')
+        # 预算为 min_retries=3 次重试（ratio=0），而不是 max_retries=5 次
+        assert stub.requests['academic'] == 4
+        with pytest.raises(SourceError):
+            guard.call('academic', source, 'AI')
+        assert stub.requests['academic'] == 5
+        assert guard.health()['academic']['retries'] == 3
+    finally:
+        guard.shutdown()
+        fetcher.close()
+
+
+def test_hedge_wins_against_hanging_source(stub):
+    stub.set_fault('opendata', hang_rate=1.0, hang_seconds=2.0)
+    fetcher = NoKeyDataFetcher(source_urls=stub.source_urls(), timeout=5.0, max_retries=0, hedge_delay=0.1)
+    try:
+        started = time.monotonic()
+        patents = fetcher.fetch_patent_data('AI')
+        elapsed = time.monotonic() - started
+        health = fetcher.source_health()
+        assert len(patents) > 0
+        assert elapsed < 1.5
+        assert health['academic']['hedged'] == 1 and health['academic']['hedge_wins'] == 1
+        assert stub.requests['opendata'] == 1
+    finally:
+        fetcher.close()
+
+
+def test_updater_stop_closes_its_fetcher(dataset):
+    from data_updater import RealTimeUpdater
+    from engine import PatentAnalyzer
+
+    updater = RealTimeUpdater(PatentAnalyzer(*dataset), watermarks=None)
+    guard = updater.get_fetcher().guard
+    updater.stop()
+    assert updater.fetcher is None
+    with pytest.raises(RuntimeError):
+        guard.call('opendata', lambda: [])
+
+    # 调用方传入的获取器由调用方关闭
+    fetcher = NoKeyDataFetcher()
+    RealTimeUpdater(PatentAnalyzer(*dataset), watermarks=None, fetcher=fetcher).stop()
+    assert fetcher.guard.call('opendata', lambda: []) == []
+    fetcher.close()
+
+
+def test_updater_stop_waits_for_in_flight_update(dataset):
+    from data_updater import RealTimeUpdater
+    from engine import PatentAnalyzer
+
+    class _SlowUpdater(RealTimeUpdater):
+        def _init_incremental_state(self):
+            time.sleep(0.5)
+            super()._init_incremental_state()
+
+    updater = _SlowUpdater(PatentAnalyzer(*dataset), watermarks=None)
+    updater.start_background_update()
+    time.sleep(0.1)
+    updater.stop()
+    # 进行中的更新在获取器关闭前完成，而不是因线程池已关闭而失败
+    assert updater.update_count == 1
+    assert updater.fetcher is None
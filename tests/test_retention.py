@@ -0,0 +1,115 @@
+# tests/test_retention.py
+"""保留窗口模式：长时间增量更新时内存中的明细和去重语料有上界，评分仍覆盖全部历史"""
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from data_updater import RealTimeUpdater
+from dedup import PatentDeduplicator
+from engine import PatentAnalyzer
+from retention import PatentSpillStore, RetainedPatentAnalyzer, RetentionPolicy
+from taxonomy import get_taxonomy
+
+EXACT_COLUMNS = ['tech_area', 'opportunity_score', 'cagr', 'market_size', 'patent_count', 'trend_signal', 'risk_level']
+
+
+def _with_unique_text(df_patents, seed=0):
+    """模拟数据的标题/摘要按模板生成、彼此近重复，换成随机词组成的文本"""
+    rng = np.random.RandomState(seed)
+    words = np.array([f'term{i}' for i in range(5000)])
+    return df_patents.assign(
+        title=[' '.join(rng.choice(words, 8)) for _ in range(len(df_patents))],
+        abstract=[' '.join(rng.choice(words, 40)) for _ in range(len(df_patents))]
+    ).reset_index(drop=True)
+
+
+class _QueueFetcher:
+    """按顺序返回预先排好的专利批次的数据获取器"""
+
+    def __init__(self, df_market, batches):
+        self.taxonomy = get_taxonomy()
+        self.tech_areas = [df_market['tech_area'].iloc[0]]
+        self.market = df_market[df_market['tech_area'] == self.tech_areas[0]].iloc[-1]
+        self.batches = list(batches)
+
+    def fetch_patent_data(self, area):
+        return self.batches.pop(0)
+
+    def fetch_market_data(self, area):
+        return {column: self.market[column] for column in
+                ['growth_rate', 'market_size', 'competition_level', 'investment_heat', 'government_support', 'risk_level']}
+
+    def commit_watermarks(self):
+        pass
+
+    def discard_watermarks(self):
+        pass
+
+
+def test_evicted_ids_are_still_rejected():
+    dedup = PatentDeduplicator()
+    corpus = _with_unique_text(pd.DataFrame({'patent_id': [f'P{i}' for i in range(50)], 'tech_area': 'AI'}))
+    dedup.add_corpus(corpus)
+    assert dedup.evict(corpus['patent_id'][:30]) == 30
+    assert (dedup.corpus_size, dedup.archived_size) == (20, 30)
+
+    refetched = dedup.deduplicate(corpus.iloc[:30])
+    assert len(refetched) == 0
+    assert dedup.last_report['exact_duplicates'] == 30
+
+    # 同一专利号、内容不同：仍按编号冲突重新编号
+    collision = _with_unique_text(corpus.iloc[:1], seed=1)
+    assert list(dedup.deduplicate(collision)['patent_id']) == ['P0-2']
+
+
+def test_long_running_updates_stay_bounded(dataset, tmp_path):
+    df_patents, df_market, df_investors = dataset
+    df_patents = _with_unique_text(df_patents.sort_values('filing_date'))
+    initial, stream = df_patents.iloc[:1000], df_patents.iloc[1000:]
+    batches = [stream.iloc[i:i + 400] for i in range(0, len(stream), 400)]
+
+    policy = RetentionPolicy(max_rows=800, min_spill_rows=200)
+    analyzer = RetainedPatentAnalyzer(initial, df_market, df_investors, policy=policy,
+                                      spill_store=PatentSpillStore(str(tmp_path), run_id='test'))
+    updater = RealTimeUpdater(analyzer, watermarks=None, fetcher=_QueueFetcher(df_market, batches + [initial.iloc[:300]]))
+
+    for _ in batches:
+        updater.update_opportunity_scores()
+        status = analyzer.retention_status()
+        assert status['live_rows'] <= policy.max_rows + policy.min_spill_rows
+        assert updater.deduplicator.corpus_size == status['live_rows']
+        assert status['live_rows'] + status['spilled_rows'] == status['total_rows']
+    assert analyzer.aggregates.rows == len(df_patents)
+
+    # 已溢写到磁盘的旧专利被另一个数据源重新返回时不会再次计入
+    updater.update_opportunity_scores()
+    assert updater.last_delta_size == 0
+    assert analyzer.aggregates.rows == len(df_patents)
+
+    expected = PatentAnalyzer(df_patents, analyzer.df_market, df_investors).rank_opportunities()
+    actual = analyzer.rank_opportunities()
+    pd.testing.assert_frame_equal(expected[EXACT_COLUMNS], actual[EXACT_COLUMNS], check_dtype=False)
+    np.testing.assert_allclose(actual['company_diversity'].astype(float),
+                               expected['company_diversity'].astype(float), rtol=0.02)
+
+
+def test_spill_stores_started_together_do_not_share_a_run_dir(tmp_path):
+    first = PatentSpillStore(str(tmp_path), run_id='20260101-000000')
+    second = PatentSpillStore(str(tmp_path), run_id='20260101-000000')
+    first.spill(pd.DataFrame({'patent_id': ['A1', 'A2']}))
+    second.spill(pd.DataFrame({'patent_id': ['B1']}))
+    assert first.run_dir != second.run_dir
+    assert sorted(os.listdir(tmp_path)) == ['20260101-000000', '20260101-000000-2']
+    assert list(pd.concat(first.iter_chunks())['patent_id']) == ['A1', 'A2']
+    assert list(pd.concat(second.iter_chunks())['patent_id']) == ['B1']
+
+
+def test_default_spill_store_does_not_write_to_cwd(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = PatentSpillStore()
+    store.spill(pd.DataFrame({'patent_id': ['A1']}))
+    assert os.listdir(tmp_path) == []
+    assert os.path.commonpath([store.run_dir, str(tmp_path)]) != str(tmp_path)
+    shutil.rmtree(store.run_dir)
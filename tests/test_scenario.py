@@ -0,0 +1,48 @@
+# tests/test_scenario.py
+import numpy as np
+import pytest
+
+from engine import PatentAnalyzer
+from scenario import ScenarioEngine
+
+
+@pytest.fixture(scope='module')
+def analyzer(dataset):
+    return PatentAnalyzer(*dataset)
+
+
+@pytest.fixture(scope='module')
+def engine(analyzer):
+    return ScenarioEngine(analyzer.build_metric_matrix())
+
+
+def test_base_weights_reproduce_opportunity_scores(analyzer, engine):
+    base = dict(zip(engine.areas, engine.score(engine.base_weights)[0]))
+    ranked = analyzer.rank_opportunities()
+    for area, score in zip(ranked['tech_area'], ranked['opportunity_score']):
+        assert round(base[area], 1) == score
+
+
+def test_fixed_weights_without_noise_give_deterministic_ranks(engine):
+    weights = np.tile(engine.base_weights, (20, 1))
+    summary = engine.run(weights=weights, input_noise=0.0, top_k=3).set_index('tech_area')
+    assert (summary['rank_std'] == 0).all()
+    assert (summary['mean_score'] == summary['base_score']).all()
+    best = summary['base_score'].idxmax()
+    assert summary.loc[best, 'prob_rank_1'] == 1.0
+    assert summary['prob_rank_1'].sum() == 1.0
+    assert summary['prob_top_3'].sum() == 3.0
+
+
+def test_batched_noisy_run_is_seeded_and_consistent(engine):
+    first = engine.run(n_scenarios=1_000, seed=7, batch_size=300)
+    assert first.equals(engine.run(n_scenarios=1_000, seed=7, batch_size=300))
+    assert first['prob_rank_1'].sum() == pytest.approx(1.0)
+    assert (first['score_p5'] <= first['mean_score']).all() and (first['mean_score'] <= first['score_p95']).all()
+    assert first['mean_rank'].is_monotonic_increasing
+
+
+def test_sampled_weights_keep_total_weight(engine):
+    weights = engine.sample_weights(500, rng=np.random.default_rng(0))
+    np.testing.assert_allclose(weights.sum(axis=1), engine.base_weights.sum())
+    assert (weights >= 0).all()
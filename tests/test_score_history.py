@@ -0,0 +1,58 @@
+# tests/test_score_history.py
+import os
+from datetime import datetime, timedelta
+
+from data_updater import RealTimeUpdater
+from engine import PatentAnalyzer
+from score_history import ScoreHistoryStore, score_record
+
+
+def test_updater_does_not_create_history_by_default(dataset, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    updater = RealTimeUpdater(PatentAnalyzer(*dataset), watermarks=None)
+    assert updater.history is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_writers_sharing_a_directory_never_reuse_a_run_id(dataset, tmp_path):
+    record = score_record(PatentAnalyzer(*dataset))
+    first, second = ScoreHistoryStore(str(tmp_path)), ScoreHistoryStore(str(tmp_path))
+    # 两个实例都已加载目录状态，模拟两个进程各自持有过期的文件列表
+    first.refresh(), second.refresh()
+    run_ids = [first.append_run(record), second.append_run(record), first.append_run(record)]
+    assert run_ids == [1, 2, 3]
+    assert sorted(ScoreHistoryStore(str(tmp_path)).runs()['run_id']) == [1, 2, 3]
+
+
+def test_claimed_but_unwritten_run_is_skipped(dataset, tmp_path):
+    record = score_record(PatentAnalyzer(*dataset))
+    store = ScoreHistoryStore(str(tmp_path))
+    store.append_run(record)
+    # 其他写入方已占用编号 2 但还没写完
+    open(tmp_path / 'run-000002.parquet', 'wb').close()
+    assert list(ScoreHistoryStore(str(tmp_path)).runs()['run_id']) == [1]
+    assert store.append_run(record) == 3
+
+
+def test_compact_keeps_last_run_per_day(dataset, tmp_path):
+    record = score_record(PatentAnalyzer(*dataset))
+    store = ScoreHistoryStore(str(tmp_path))
+    start = datetime(2026, 1, 1)
+    for hours in (1, 5, 25, 26):
+        store.append_run(record, run_at=start + timedelta(hours=hours))
+    store.append_run(record, run_at=start + timedelta(days=60))
+    assert store.compact(keep_recent=timedelta(days=30), now=start + timedelta(days=60)) == (4, 2)
+    assert list(store.runs()['run_id']) == [2, 4, 5]
+
+
+def test_compact_keeps_recent_runs_with_lower_ids(dataset, tmp_path):
+    # 运行 2 是补录的历史运行：编号更大但时间更早，压缩时不能删除最近的运行 1
+    record = score_record(PatentAnalyzer(*dataset))
+    store = ScoreHistoryStore(str(tmp_path))
+    now = datetime(2026, 3, 1)
+    store.append_run(record, run_at=now)
+    store.append_run(record, run_at=now - timedelta(days=40))
+    assert store.compact(keep_recent=timedelta(days=30), now=now) == (1, 1)
+    assert list(store.runs()['run_id']) == [1, 2]
+    assert list(ScoreHistoryStore(str(tmp_path)).runs()['run_id']) == [1, 2]
+    assert sorted(os.listdir(tmp_path)) == ['compacted-000002-000002.parquet', 'run-000001.parquet']
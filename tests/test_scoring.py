@@ -0,0 +1,25 @@
+# tests/test_scoring.py
+import numpy as np
+
+from engine import PatentAnalyzer, SCORE_COMPONENTS
+
+
+def test_default_ranges_match_no_ranges(dataset):
+    analyzer = PatentAnalyzer(*dataset)
+    defaults = {name: (min_val, max_val) for name, _, _, _, min_val, max_val, _ in SCORE_COMPONENTS}
+    assert analyzer.rank_opportunities(ranges=defaults).equals(analyzer.rank_opportunities())
+
+
+def test_custom_range_rescales_only_that_component(dataset):
+    analyzer = PatentAnalyzer(*dataset)
+    base = analyzer.get_component_matrix()
+    narrowed = analyzer.get_component_matrix({'size_score': (0, 50)})
+    table = analyzer.get_scoring_table()
+    expected = np.clip(table['market_size'].astype(float).to_numpy() / 50, 0, 1)
+    np.testing.assert_allclose(narrowed['size_score'].to_numpy(), expected)
+    others = [name for name in base.columns if name != 'size_score']
+    assert narrowed[others].equals(base[others])
+
+    ranked = analyzer.rank_opportunities(ranges={'size_score': (0, 50)}).set_index('tech_area')
+    default = analyzer.rank_opportunities().set_index('tech_area')
+    assert (ranked['size_score'] >= default.loc[ranked.index, 'size_score']).all()
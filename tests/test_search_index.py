@@ -0,0 +1,96 @@
+# tests/test_search_index.py
+import pandas as pd
+
+from search_index import RESULT_COLUMNS, PatentSearchIndex, tokenize
+
+
+def _patents():
+    return pd.DataFrame({
+        'patent_id': ['P1', 'P2', 'P3', 'P4'],
+        'title': ['neural network accelerator', 'blockchain payment ledger',
+                  'network security gateway', 'graph neural network training'],
+        'abstract': ['a neural network chip for inference', 'distributed ledger for payments',
+                     'firewall for enterprise network traffic', 'training method for network of neural graphs'],
+        'tech_area': ['AI and Machine Learning', 'FinTech', 'Cybersecurity', 'AI and Machine Learning'],
+        'year': [2020, 2021, 2022, 2023],
+        'applicant': ['A', 'B', 'C', 'A']
+    })
+
+
+def test_tokenize_english_words_and_chinese_bigrams():
+    assert tokenize('The Neural network') == ('neural', 'network')
+    assert tokenize('区块链') == ('区块', '块链')
+    assert tokenize('') == ()
+
+
+def test_bm25_ranks_documents_matching_more_terms_first():
+    index = PatentSearchIndex.from_dataframe(_patents())
+    result = index.search('neural network', top_k=10)
+    assert list(result.columns) == RESULT_COLUMNS
+    assert set(result['patent_id']) == {'P1', 'P3', 'P4'}
+    assert result['patent_id'].iloc[0] in {'P1', 'P4'}
+    assert result['patent_id'].iloc[-1] == 'P3'
+    assert result['score'].is_monotonic_decreasing
+
+
+def test_phrase_query_requires_adjacent_terms():
+    index = PatentSearchIndex.from_dataframe(_patents())
+    result = index.search('"neural network"', top_k=10)
+    # P4 的摘要包含两个词但不相邻，标题 'graph neural network' 相邻
+    assert set(result['patent_id']) == {'P1', 'P4'}
+    result = index.search('"network security"', top_k=10)
+    assert list(result['patent_id']) == ['P3']
+
+
+def test_field_filters():
+    index = PatentSearchIndex.from_dataframe(_patents())
+    assert list(index.search('network', tech_area='Cybersecurity')['patent_id']) == ['P3']
+    assert set(index.search('network', year=(2022, 2023))['patent_id']) == {'P3', 'P4'}
+
+
+def test_empty_result_has_result_columns():
+    index = PatentSearchIndex.from_dataframe(_patents())
+    assert list(index.search('the').columns) == RESULT_COLUMNS
+    assert list(index.search('nonexistentterm').columns) == RESULT_COLUMNS
+
+
+def test_incremental_add_matches_full_build():
+    df = _patents()
+    full = PatentSearchIndex.from_dataframe(df)
+    incremental = PatentSearchIndex.from_dataframe(df.iloc[:2])
+    incremental.add_documents(df)
+    pd.testing.assert_frame_equal(full.search('network neural'), incremental.search('network neural'))
+
+
+def test_search_while_index_is_extended(dataset):
+    import pickle
+    import threading
+
+    df_patents = dataset[0]
+    index = PatentSearchIndex.from_dataframe(df_patents.iloc[:200])
+    errors = []
+
+    def search_loop(stop):
+        while not stop.is_set():
+            try:
+                result = index.search('"neural network" system', top_k=5)
+                assert result['patent_id'].map(index.contains).all()
+            except Exception as e:
+                errors.append(e)
+                return
+
+    stop = threading.Event()
+    threads = [threading.Thread(target=search_loop, args=(stop,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for end in range(300, len(df_patents) + 1, 100):
+        index.add_documents(df_patents.iloc[:end])
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert index.num_docs == len(df_patents)
+
+    # 索引随分析器传给进程池时可以序列化
+    restored = pickle.loads(pickle.dumps(index))
+    pd.testing.assert_frame_equal(restored.search('network', top_k=10), index.search('network', top_k=10))
@@ -0,0 +1,66 @@
+# tests/test_sketches.py
+import numpy as np
+
+from sketches import AreaStatisticsSketch, HyperLogLog, KLLSketch
+
+
+def _ids(start, stop):
+    return np.array([f'applicant-{i}' for i in range(start, stop)], dtype=object)
+
+
+def test_hll_merge_equals_union():
+    left, right = HyperLogLog().update(_ids(0, 30_000)), HyperLogLog().update(_ids(20_000, 50_000))
+    union = HyperLogLog().update(np.concatenate([_ids(0, 30_000), _ids(20_000, 50_000)]))
+    np.testing.assert_array_equal(left.merge(right).registers, union.registers)
+
+
+def test_hll_error_bounds():
+    # 精度12的标准误差约为 1.04 / sqrt(4096) ≈ 1.6%
+    for n in (100, 5_000, 200_000):
+        estimate = HyperLogLog(precision=12).update(_ids(0, n)).estimate()
+        assert abs(estimate - n) / n < 0.05
+    assert len(HyperLogLog().update(np.array(['a', 'a', 'b'], dtype=object))) == 2
+
+
+def _rank_error(sketch, values, qs):
+    values = np.sort(values)
+    estimates = sketch.quantile(qs)
+    ranks = np.searchsorted(values, estimates, side='right') / len(values)
+    return np.abs(ranks - qs).max()
+
+
+def test_kll_rank_error_and_bounded_size():
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(size=200_000)
+    sketch = KLLSketch(k=200, seed=0)
+    for chunk in np.array_split(values, 50):
+        sketch.update(chunk)
+    qs = np.linspace(0.01, 0.99, 99)
+    assert sketch.count == len(values)
+    assert sketch.size < 2_000
+    assert _rank_error(sketch, values, qs) < 0.02
+
+
+def test_kll_merge_keeps_count_and_accuracy():
+    rng = np.random.default_rng(1)
+    left_values, right_values = rng.normal(size=60_000), rng.normal(loc=3, size=40_000)
+    merged = KLLSketch(seed=0).update(left_values).merge(KLLSketch(seed=1).update(right_values))
+    assert merged.count == 100_000
+    qs = np.array([0.1, 0.5, 0.9])
+    assert _rank_error(merged, np.concatenate([left_values, right_values]), qs) < 0.02
+    assert np.isnan(KLLSketch().quantile(0.5))
+
+
+def test_area_sketch_merge_matches_single_pass(dataset):
+    df_patents = dataset[0]
+    whole = AreaStatisticsSketch().update(df_patents)
+    shards = [AreaStatisticsSketch().update(df_patents.iloc[start:start + 1000]) for start in (0, 1000, 2000)]
+    merged = shards[0].merge(shards[1]).merge(shards[2])
+    for area, sketch in whole.areas.items():
+        assert merged.areas[area]['count'] == sketch['count']
+        np.testing.assert_array_equal(merged.areas[area]['applicants'].registers, sketch['applicants'].registers)
+        assert merged.distinct_applicants(area) == whole.distinct_applicants(area)
+    exact = df_patents.groupby('tech_area')['applicant'].nunique()
+    summary = merged.summary().set_index('tech_area')
+    np.testing.assert_allclose(summary['distinct_applicants'], exact.reindex(summary.index), rtol=0.05)
+    assert summary['patent_count'].sum() == len(df_patents)
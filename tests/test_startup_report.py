@@ -0,0 +1,24 @@
+# tests/test_startup_report.py
+"""冷启动：无界面入口在新进程中导入时不加载重量级依赖"""
+import os
+import subprocess
+import sys
+
+from startup_report import HEAVY_DEPENDENCIES, measure_import
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_headless_entry_points_skip_heavy_dependencies():
+    code = ('import sys, engine, batch_scoring, api_server; '
+            f'print(",".join(sorted(dep for dep in {HEAVY_DEPENDENCIES!r} if dep in sys.modules)))')
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=ROOT)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ''
+
+
+def test_measure_import_reports_loaded_packages():
+    total_ms, packages = measure_import('engine')
+    assert total_ms > 0
+    assert 'pandas' in packages
+    assert not set(HEAVY_DEPENDENCIES) & set(packages)
@@ -0,0 +1,76 @@
+# tests/test_stream_parser.py
+import gzip
+
+import numpy as np
+import pandas as pd
+
+from aggregates import iter_patent_chunks
+from stream_parser import iter_record_batches, read_patent_xml, write_patent_xml
+
+
+def _frame(n=25):
+    dates = pd.date_range('2020-01-01', periods=n, freq='7D')
+    return pd.DataFrame({
+        'patent_id': [f'CN{i:06d}' for i in range(n)],
+        'title': [f'专利 <{i}> & 方法' for i in range(n)],
+        'tech_area': ['AI', 'FinTech'] * (n // 2) + ['AI'] * (n % 2),
+        'filing_date': dates,
+        'citations': np.arange(n),
+        'quality_score': np.linspace(40, 90, n).round(1)
+    })
+
+
+def test_xml_round_trip_in_batches(tmp_path):
+    df = _frame()
+    path = str(tmp_path / 'patents.xml.gz')
+    with gzip.open(path, 'wb') as f:
+        write_patent_xml(df, f)
+    batches = list(iter_record_batches(path, batch_size=10))
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    result = pd.concat(batches, ignore_index=True)
+    expected = df.assign(year=df['filing_date'].dt.year)
+    pd.testing.assert_frame_equal(result[expected.columns], expected, check_dtype=False)
+    assert result['citations'].dtype == np.int64
+    assert pd.api.types.is_datetime64_any_dtype(result['filing_date'])
+
+
+def test_namespaces_aliases_attributes_and_projection(tmp_path):
+    path = tmp_path / 'bulk.xml'
+    path.write_text(
+        '<?xml version="1.0"?><root xmlns="urn:patents">'
+        '<patent id="P1"><assignee>华为</assignee><application-date>2021-03-04</application-date>'
+        '<citations>x</citations><extra>1</extra></patent>'
+        '<patent id="P2"><assignee>腾讯</assignee></patent>'
+        '</root>', encoding='utf-8')
+    result = read_patent_xml(str(path))
+    assert list(result['patent_id']) == ['P1', 'P2']
+    assert list(result['applicant']) == ['华为', '腾讯']
+    assert result['filing_date'].iloc[0] == pd.Timestamp('2021-03-04') and pd.isna(result['filing_date'].iloc[1])
+    assert result['year'].iloc[0] == 2021
+    # 无法解析的整数字段保留为缺失值
+    assert result['citations'].isna().all()
+
+    projected = read_patent_xml(str(path), columns=['patent_id', 'applicant', 'quality_score'])
+    assert list(projected.columns) == ['patent_id', 'applicant']
+
+
+def test_html_listing_rows(tmp_path):
+    path = tmp_path / 'listing.html'
+    path.write_text(
+        '<html><head><meta charset="utf-8"></head><body><table>'
+        '<tr class="header"><td class="title">标题</td></tr>'
+        '<tr class="patent row"><td class="patent-id">P1</td><td class="title">一种<b>芯片</b></td></tr>'
+        '<tr class="patent"><td class="patent-id">P2</td><td class="title">算法</td></tr>'
+        '</table></body></html>', encoding='utf-8')
+    result = read_patent_xml(str(path), html=True, record_tag='tr', record_class='patent')
+    assert list(result['patent_id']) == ['P1', 'P2']
+    assert list(result['title']) == ['一种芯片', '算法']
+
+
+def test_iter_patent_chunks_reads_xml(tmp_path):
+    df = _frame(12)
+    path = str(tmp_path / 'patents.xml')
+    write_patent_xml(df, path)
+    chunks = list(iter_patent_chunks(path, chunk_size=5, columns=['patent_id', 'tech_area', 'year']))
+    assert [len(chunk) for chunk in chunks] == [5, 5, 2]
+    assert list(pd.concat(chunks)['patent_id']) == list(df['patent_id'])
@@ -0,0 +1,106 @@
+# tests/test_taxonomy.py
+import pandas as pd
+import pytest
+
+from engine import PatentAnalyzer
+from taxonomy import UNKNOWN, TaxonomyRegistry
+
+
+def test_aliases_resolve_to_canonical_areas_and_subcategories():
+    taxonomy = TaxonomyRegistry()
+    assert taxonomy.canonical_area('ai') == 'AI and Machine Learning'
+    assert taxonomy.canonical_area('人工智能') == 'AI and Machine Learning'
+    assert taxonomy.canonical_area('BIOTECH') == 'Biotechnology'
+    assert taxonomy.canonical_area('green_tech') == 'Green Technology'
+    assert taxonomy.resolve('Blockchain') == (taxonomy.area_id('FinTech'), taxonomy.subcategory_id('Blockchain'))
+    assert not taxonomy.is_area_alias('IoT')
+    assert taxonomy.is_area_alias('Fintech')
+
+
+def test_lookups_do_not_register_unknown_names():
+    taxonomy = TaxonomyRegistry()
+    areas = len(taxonomy.area_names)
+    assert taxonomy.canonical_area('Artifical Inteligence') is None
+    assert taxonomy.area_id('Artifical Inteligence') == UNKNOWN
+    assert len(taxonomy.area_names) == areas
+    # 入库路径才注册新领域
+    df = taxonomy.canonicalize_patents(pd.DataFrame({'tech_area': ['Space Tech', 'AI']}))
+    assert len(taxonomy.area_names) == areas + 1
+    assert list(df['tech_area']) == ['Space Tech', 'AI and Machine Learning']
+    assert df['area_id'].iloc[0] == areas
+
+
+def test_canonicalize_patents_fills_subcategory_from_alias():
+    taxonomy = TaxonomyRegistry()
+    df = taxonomy.canonicalize_patents(pd.DataFrame({'tech_area': ['Blockchain', 'FinTech'],
+                                                     'subcategory': [None, 'RegTech']}))
+    assert list(df['tech_area']) == ['FinTech', 'FinTech']
+    assert list(df['subcategory']) == ['Blockchain', 'RegTech']
+
+
+def test_canonicalize_patents_rederives_stale_area_ids():
+    # 另一进程写出的快照：非内置领域按不同顺序注册，编号与本进程的注册表不一致
+    writer, reader = TaxonomyRegistry(), TaxonomyRegistry()
+    snapshot = writer.canonicalize_patents(pd.DataFrame({'tech_area': ['Space Tech', 'Robotics', 'AI']}))
+    reader.canonicalize_patents(pd.DataFrame({'tech_area': ['Robotics', 'Space Tech']}))
+    df = reader.canonicalize_patents(snapshot)
+    assert list(df['area_id']) == [reader.area_id(area) for area in ['Space Tech', 'Robotics', 'AI']]
+    assert list(df['area_id']) != list(snapshot['area_id'])
+    # 编号与注册表一致时原样返回
+    assert reader.canonicalize_patents(df) is df
+
+
+def test_engine_ignores_out_of_range_area_ids(dataset):
+    df_patents, df_market, df_investors = dataset
+    stale = df_patents.assign(area_id=TaxonomyRegistry().encode_areas(df_patents['tech_area']) + 1000)
+    analyzer = PatentAnalyzer(stale, df_market, df_investors)
+    rows = analyzer.get_area_rows()
+    for area, positions in rows.items():
+        assert (analyzer.df_patents['tech_area'].iloc[positions] == area).all()
+    assert sum(len(positions) for positions in rows.values()) == len(df_patents)
+    # 直接替换 df_patents 也不信任其中的 area_id
+    analyzer.df_patents = stale
+    rows = analyzer.get_area_rows()
+    for area, positions in rows.items():
+        assert (stale['tech_area'].iloc[positions] == area).all()
+
+
+@pytest.fixture(scope='module')
+def analyzer(dataset):
+    return PatentAnalyzer(*dataset)
+
+
+def test_engine_queries_accept_aliases(analyzer):
+    canonical = analyzer.recommend_investors('AI and Machine Learning')
+    assert canonical
+    assert analyzer.recommend_investors('AI') == canonical
+    assert analyzer.recommend_investors('人工智能') == canonical
+    assert analyzer.get_market_insights('AI') == analyzer.get_market_insights('AI and Machine Learning')
+    assert analyzer.find_similar_areas('Biotech') == analyzer.find_similar_areas('Biotechnology')
+
+
+def test_financial_file_with_alias_area_names(tmp_path):
+    from financials import FINANCIAL_COLUMNS, FinancialMetricsProvider
+
+    path = tmp_path / 'financials.csv'
+    pd.DataFrame({'tech_area': ['AI', '区块链'], 'gross_margin': [91, 92], 'net_margin': [41, 42],
+                  'roi': [101, 102], 'payback_period': [1, 2]}).to_csv(path, index=False)
+    table = FinancialMetricsProvider.from_file(path).get_table(['AI and Machine Learning', 'FinTech'])
+    assert table.set_index('tech_area').loc[['AI and Machine Learning', 'FinTech'], FINANCIAL_COLUMNS].values.tolist() == \
+        [[91, 41, 101, 1], [92, 42, 102, 2]]
+
+
+def test_preferred_areas_accept_aliases(analyzer):
+    matcher = analyzer.get_preference_matcher()
+
+    def area_matches(preferred):
+        result = matcher.match({'preferred_areas': preferred}, top_n=20, min_match=0)['matches']
+        return set(result.loc[result['match_reasoning'].map(lambda r: '技术领域匹配' in r), 'tech_area'])
+
+    assert area_matches(['AI']) == area_matches(['AI and Machine Learning']) == {'AI and Machine Learning'}
+    assert area_matches(['Unknown Area']) == set()
+
+    profiles = pd.DataFrame({'profile_id': [1, 2], 'preferred_areas': [('人工智能',), ('AI and Machine Learning',)]})
+    batch = matcher.match_batch(profiles, top_n=20, min_match=0)
+    first, second = (batch[batch['profile_id'] == i].reset_index(drop=True) for i in (1, 2))
+    pd.testing.assert_frame_equal(first.drop(columns='profile_id'), second.drop(columns='profile_id'))
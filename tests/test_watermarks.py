@@ -0,0 +1,86 @@
+# tests/test_watermarks.py
+import pandas as pd
+import pytest
+
+from data_fetcher import NoKeyDataFetcher
+from data_updater import RealTimeUpdater
+from engine import PatentAnalyzer
+from watermarks import WatermarkStore
+
+
+def _rows(dates, ids):
+    return pd.DataFrame({'patent_id': ids, 'filing_date': pd.to_datetime(dates)})
+
+
+def test_take_filters_rows_at_or_before_the_mark():
+    store = WatermarkStore(path=None)
+    first = store.take('opendata', 'AI', _rows(['2025-01-01', '2025-01-02'], ['A1', 'A2']))
+    assert len(first) == 2
+    store.commit()
+    assert store.get('opendata', 'AI') == (pd.Timestamp('2025-01-02'), 'A2')
+    delta = store.take('opendata', 'AI', _rows(['2025-01-02', '2025-01-02', '2025-01-03'], ['A2', 'A3', 'A4']))
+    assert list(delta['patent_id']) == ['A3', 'A4']
+
+
+def test_discard_keeps_previous_mark_and_commit_persists(tmp_path):
+    path = str(tmp_path / 'marks.json')
+    store = WatermarkStore(path)
+    store.take('opendata', 'AI', _rows(['2025-01-01'], ['A1']))
+    store.discard()
+    assert store.get('opendata', 'AI') == (None, None)
+    store.take('opendata', 'AI', _rows(['2025-01-05'], ['A5']))
+    store.commit()
+    assert WatermarkStore(path).get('opendata', 'AI') == (pd.Timestamp('2025-01-05'), 'A5')
+
+
+class _FailingAnalyzer(PatentAnalyzer):
+    def calculate_opportunity_scores(self):
+        raise RuntimeError('merge failed')
+
+
+def test_updater_rolls_back_marks_on_failed_merge_and_persists_on_success(dataset, tmp_path):
+    path = str(tmp_path / 'fetch_watermarks.json')
+    deltas = str(tmp_path / 'deltas')
+    failing = RealTimeUpdater(_FailingAnalyzer(*dataset), history=None, watermarks=path, delta_store=deltas)
+    failing.update_opportunity_scores()
+    assert failing.fetcher.watermarks.to_frame().empty
+    assert not (tmp_path / 'fetch_watermarks.json').exists()
+
+    updater = RealTimeUpdater(PatentAnalyzer(*dataset), history=None, watermarks=path, delta_store=deltas)
+    updater.update_opportunity_scores()
+    assert updater.last_delta_size > 0
+    marks = updater.fetcher.watermarks.to_frame()
+    assert len(marks) > 0
+
+    # 重启后从持久化的水位继续，而不是从默认窗口起点重新抓取
+    restarted = NoKeyDataFetcher(watermarks=WatermarkStore(path))
+    pd.testing.assert_frame_equal(restarted.watermarks.to_frame(), marks, check_dtype=False)
+    source, area, date = marks[['source', 'tech_area', 'last_filing_date']].iloc[0]
+    window_start = pd.Timestamp('2000-01-01')
+    assert restarted.watermarks.since(source, area, window_start) == date
+
+
+def test_updater_keeps_marks_in_memory_by_default(dataset, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    updater = RealTimeUpdater(PatentAnalyzer(*dataset), history=None)
+    updater.update_opportunity_scores()
+    assert len(updater.fetcher.watermarks.to_frame()) > 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_persisted_marks_require_a_delta_store(dataset, tmp_path):
+    with pytest.raises(ValueError):
+        RealTimeUpdater(PatentAnalyzer(*dataset), watermarks=str(tmp_path / 'marks.json'))
+
+
+def test_restarted_updater_replays_deltas_before_the_mark(dataset, tmp_path):
+    path, deltas = str(tmp_path / 'marks.json'), str(tmp_path / 'deltas')
+    updater = RealTimeUpdater(PatentAnalyzer(*dataset), history=None, watermarks=path, delta_store=deltas)
+    updater.update_opportunity_scores()
+    fetched = set(updater.analyzer.df_patents['patent_id']) - set(dataset[0]['patent_id'])
+    assert len(fetched) == updater.last_delta_size > 0
+
+    # 分析器重启时由原始数据重建，水位之前抓到的专利从 delta_store 恢复
+    restarted = RealTimeUpdater(PatentAnalyzer(*dataset), history=None, watermarks=path, delta_store=deltas)
+    restarted.update_opportunity_scores()
+    assert fetched <= set(restarted.analyzer.df_patents['patent_id'])
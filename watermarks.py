@@ -0,0 +1,98 @@
+# watermarks.py
+"""增量抓取的高水位：每个 (数据源, 技术领域) 记录已获取的最新申请日期和该日期下最大的专利号，
+下次只请求并保留水位之后的专利
+
+抓取得到的新水位先暂存，调用方把增量数据成功合并后再 commit（并写入JSON文件），
+合并失败时 discard，下次从原水位重新抓取，不会丢数据
+"""
+import json
+import os
+import threading
+
+import pandas as pd
+
+from filing_dates import row_filing_dates
+
+
+class WatermarkStore:
+    """(数据源, 技术领域) -> (最新申请日期, 该日期下最大的专利号)；path 为 None 时只保存在内存中"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._marks = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for source, areas in json.load(f).items():
+                    for area, (date, patent_id) in areas.items():
+                        self._marks[(source, area)] = (pd.Timestamp(date), patent_id)
+
+    def get(self, source, tech_area):
+        """已提交的水位 (申请日期, 专利号)，没有时为 (None, None)"""
+        return self._marks.get((source, tech_area), (None, None))
+
+    def since(self, source, tech_area, default):
+        """下次抓取的起始日期：有水位时为水位日期，否则为 default"""
+        date, _ = self.get(source, tech_area)
+        return default if date is None else date
+
+    def new_rows(self, source, tech_area, df):
+        """df 中严格位于水位之后的行（申请日期更晚，或同一天且专利号更大）"""
+        date, patent_id = self.get(source, tech_area)
+        if date is None or len(df) == 0:
+            return df
+        dates = row_filing_dates(df)
+        newer = dates > date
+        if patent_id is not None:
+            newer |= (dates == date) & (df['patent_id'].astype(str) > patent_id)
+        return df[newer.to_numpy()]
+
+    def advance(self, source, tech_area, df):
+        """按 df 中最新的专利暂存新水位（commit 后生效）"""
+        if len(df) == 0:
+            return
+        dates = row_filing_dates(df)
+        latest = dates.max()
+        if pd.isna(latest):
+            return
+        patent_id = df['patent_id'].astype(str)[(dates == latest).to_numpy()].max()
+        with self._lock:
+            key = (source, tech_area)
+            current = self._pending.get(key, self._marks.get(key))
+            if current is None or (latest, patent_id) > current:
+                self._pending[key] = (latest, patent_id)
+
+    def take(self, source, tech_area, df):
+        """过滤出水位之后的行并暂存新水位，返回增量"""
+        delta = self.new_rows(source, tech_area, df)
+        self.advance(source, tech_area, delta)
+        return delta
+
+    def commit(self):
+        """提交暂存的水位并持久化"""
+        with self._lock:
+            self._marks.update(self._pending)
+            self._pending = {}
+            self.save()
+
+    def discard(self):
+        with self._lock:
+            self._pending = {}
+
+    def save(self):
+        if not self.path:
+            return
+        data = {}
+        for (source, area), (date, patent_id) in sorted(self._marks.items()):
+            data.setdefault(source, {})[area] = [date.isoformat(), patent_id]
+        # 先写临时文件再替换，避免中断时留下不完整的水位文件
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def to_frame(self):
+        """已提交水位的表格（数据源, 领域, 申请日期, 专利号）"""
+        records = [(source, area, date, patent_id) for (source, area), (date, patent_id) in sorted(self._marks.items())]
+        return pd.DataFrame(records, columns=['source', 'tech_area', 'last_filing_date', 'last_patent_id'])